@@ -0,0 +1,124 @@
+import json
+import logging
+from datetime import datetime
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+ADMIN_ACTIVITY_GROUP = 'admin_activity'
+PENDING_KEY = 'activity:pending'
+FLUSH_SCHEDULED_KEY = 'activity:flush_scheduled'
+
+ACTIONS = {
+    ActivityEvent.Kind.ROOM_CREATED: 'created a new room',
+    ActivityEvent.Kind.ROOM_REPORTED: 'reported',
+    ActivityEvent.Kind.SUBSCRIPTION_STARTED: 'upgraded to',
+}
+
+
+def event(kind, actor, target, fallback_name='Unknown'):
+    """An unsaved event; pass a list of them to record_events."""
+    return ActivityEvent(
+        kind=kind,
+        actor=actor,
+        actor_name=actor.username if actor else fallback_name,
+        target=target[:255],
+    )
+
+
+def record_events(events):
+    """
+    Append events with one insert inside the caller's transaction, then push
+    them to connected admins once it commits.
+    """
+    if not events:
+        return []
+    created = ActivityEvent.objects.bulk_create(events)
+    transaction.on_commit(lambda: broadcast(created))
+    return created
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def record(kind, actor, target, fallback_name='Unknown'):
+    """
+    Buffer an event for the next batch write once the caller's transaction
+    commits. It keeps the time it happened; flush_pending writes everything
+    buffered meanwhile with one insert. Without Redis it is written at once.
+    """
+    pending = event(kind, actor, target, fallback_name)
+    transaction.on_commit(lambda: enqueue(pending))
+
+
+def enqueue(pending):
+    from .tasks import flush_activity_events_task
+    try:
+        redis = _redis()
+        redis.rpush(PENDING_KEY, json.dumps({
+            'kind': pending.kind,
+            'actor_id': pending.actor_id,
+            'actor_name': pending.actor_name,
+            'target': pending.target,
+            'created_at': pending.created_at.isoformat(),
+        }))
+        if redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=60):
+            flush_activity_events_task.apply_async(countdown=settings.ACTIVITY_FLUSH_DELAY_SECONDS)
+    except Exception as e:
+        logger.warning("Could not buffer activity event, writing it directly: %s", e)
+        record_events([pending])
+
+
+def flush_pending(batch_size=None):
+    """Write the buffered events, one insert per batch. Returns the number written."""
+    batch_size = batch_size or settings.ACTIVITY_BATCH_SIZE
+    redis = _redis()
+    # Clear the flag first so events buffered while flushing schedule a new flush
+    redis.delete(FLUSH_SCHEDULED_KEY)
+    written = 0
+    while True:
+        raw = redis.lpop(PENDING_KEY, batch_size)
+        if not raw:
+            return written
+        events = []
+        for item in raw:
+            data = json.loads(item)
+            data['created_at'] = datetime.fromisoformat(data['created_at'])
+            events.append(ActivityEvent(**data))
+        try:
+            with transaction.atomic():
+                record_events(events)
+        except Exception:
+            # Put the batch back for the next flush
+            redis.lpush(PENDING_KEY, *reversed(raw))
+            raise
+        written += len(events)
+
+
+def event_payload(activity):
+    return {
+        'id': activity.id,
+        'kind': activity.kind,
+        'user': activity.actor_name,
+        'action': ACTIONS.get(activity.kind, activity.kind),
+        'target': activity.target,
+        'time': activity.created_at.strftime('%b %d, %H:%M'),
+        'created_at': activity.created_at.isoformat(),
+    }
+
+
+def broadcast(events):
+    try:
+        async_to_sync(get_channel_layer().group_send)(ADMIN_ACTIVITY_GROUP, {
+            'type': 'activity_events',
+            'events': [event_payload(activity) for activity in events],
+        })
+    except Exception as e:
+        # The feed endpoint still has them
+        logger.warning("Could not push activity events: %s", e)
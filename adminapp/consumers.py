@@ -0,0 +1,48 @@
+import json
+import logging
+from channels.generic.websocket import AsyncWebsocketConsumer
+from users.moderation import UserControlMixin
+
+logger = logging.getLogger(__name__)
+
+
+class AdminActivityConsumer(UserControlMixin, AsyncWebsocketConsumer):
+    """
+    Pushes new activity events to superusers as they are recorded, plus
+    status changes of the admin's own export jobs.
+    """
+
+    async def connect(self):
+        from .activity import ADMIN_ACTIVITY_GROUP
+        from .export_jobs import admin_group
+
+        user = self.scope['user']
+        if not getattr(user, 'is_superuser', False):
+            await self.close()
+            return
+        self.group_names = [ADMIN_ACTIVITY_GROUP, admin_group(user.id)]
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(group_name, self.channel_name)
+        await self.join_control_group()
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        for group_name in getattr(self, 'group_names', []):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+        await self.leave_control_group()
+
+    async def receive(self, text_data):
+        # The feed is push-only
+        pass
+
+    async def activity_events(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'activity',
+            'events': event['events'],
+        }))
+
+    async def export_job_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'export_job',
+            'job': event['job'],
+        }))
@@ -0,0 +1,70 @@
+import os
+import re
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+async def aiter_file(fileobj, length=None):
+    """
+    Read `fileobj` (up to `length` bytes) a chunk at a time in a worker
+    thread, closing it at the end. Under ASGI a sync file iterator would be
+    read into memory in full before the first byte is sent.
+    """
+    read = sync_to_async(fileobj.read, thread_sensitive=False)
+    try:
+        while length is None or length > 0:
+            data = await read(READ_CHUNK_SIZE if length is None else min(READ_CHUNK_SIZE, length))
+            if not data:
+                break
+            if length is not None:
+                length -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+
+async def _read(path, start, length):
+    fileobj = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    fileobj.seek(start)
+    async for data in aiter_file(fileobj, length):
+        yield data
+
+
+def ranged_file_response(request, path, content_type, filename):
+    """
+    Stream a file with single-range support (RFC 9110), so interrupted
+    downloads can resume. Multi-range requests and an If-Range that does not
+    match the current ETag get the whole file.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{size}"'
+    start, end = 0, size - 1
+
+    range_header = request.META.get('HTTP_RANGE', '').strip()
+    if_range = request.META.get('HTTP_IF_RANGE')
+    partial = bool(range_header) and ',' not in range_header and (not if_range or if_range == etag)
+    if partial:
+        match = RANGE_PATTERN.match(range_header)
+        if match and match[1]:
+            start = int(match[1])
+            end = min(int(match[2]), size - 1) if match[2] else size - 1
+        elif match and match[2]:
+            start = max(size - int(match[2]), 0)
+        if not match or not (match[1] or match[2]) or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_read(path, start, length), status=206 if partial else 200, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if partial:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
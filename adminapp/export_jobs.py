@@ -0,0 +1,163 @@
+import logging
+import os
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .exports import DATASETS, PERIOD_LABELS, stream_csv, stream_ndjson, write_pdf
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    ExportJob.Output.PDF: 'application/pdf',
+    ExportJob.Output.CSV: 'text/csv',
+    ExportJob.Output.NDJSON: 'application/x-ndjson',
+}
+
+
+def admin_group(user_id):
+    return f"admin_user_{user_id}"
+
+
+def job_path(job):
+    return os.path.join(settings.EXPORT_STORAGE_DIR, job.file_name)
+
+
+def create_job(user, dataset, period, output):
+    """Queue an export; the worker starts it once the job row is committed."""
+    from .tasks import run_export_job_task
+
+    job = ExportJob.objects.create(
+        requested_by=user,
+        dataset=dataset,
+        period=period,
+        output=output,
+        expires_at=timezone.now() + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS),
+    )
+    transaction.on_commit(lambda: run_export_job_task.delay(job.id))
+    return job
+
+
+def _write(job, fileobj):
+    dataset = DATASETS[job.dataset]
+    rows = dataset.rows(job.period)
+    if job.output == ExportJob.Output.PDF:
+        return write_pdf(fileobj, f"{dataset.title} - {PERIOD_LABELS.get(job.period, 'All Time')}", dataset.columns, rows)
+    render = stream_csv if job.output == ExportJob.Output.CSV else stream_ndjson
+    written = 0
+    for line in render(rows, dataset.columns):
+        fileobj.write(line.encode())
+        written += 1
+    # The CSV header is not a row
+    return written - 1 if job.output == ExportJob.Output.CSV else written
+
+
+def run_job(job_id):
+    """
+    Render one export to the store. The pending -> running transition is a
+    conditional update, so a duplicated task delivery renders it only once.
+    The file is written under a temporary name and renamed when complete.
+    """
+    if not ExportJob.objects.filter(id=job_id, status=ExportJob.Status.PENDING).update(
+        status=ExportJob.Status.RUNNING, started_at=timezone.now()
+    ):
+        return None
+    job = ExportJob.objects.get(id=job_id)
+    job.file_name = f"{job.dataset}-{job.period}-{job.id}.{job.output}"
+    path = job_path(job)
+    partial = f"{path}.part"
+    os.makedirs(settings.EXPORT_STORAGE_DIR, exist_ok=True)
+    try:
+        with open(partial, 'wb') as fileobj:
+            job.row_count = _write(job, fileobj)
+        os.replace(partial, path)
+        job.size = os.path.getsize(path)
+        job.status = ExportJob.Status.DONE
+    except Exception as e:
+        logger.exception("Export job %s failed", job.id)
+        if os.path.exists(partial):
+            os.remove(partial)
+        job.file_name = ''
+        job.status = ExportJob.Status.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+    job.save(update_fields=['file_name', 'row_count', 'size', 'status', 'error', 'finished_at', 'expires_at'])
+    push_update(job)
+    return job
+
+
+def push_update(job):
+    from .serializers import ExportJobSerializer
+    try:
+        async_to_sync(get_channel_layer().group_send)(admin_group(job.requested_by_id), {
+            'type': 'export_job_update',
+            'job': ExportJobSerializer(job).data,
+        })
+    except Exception as e:
+        # Admins can still poll the job
+        logger.warning("Could not push export job %s: %s", job.id, e)
+
+
+def fail_stalled(now=None):
+    """
+    Mark jobs running past EXPORT_JOB_TIMEOUT_MINUTES as failed; their worker
+    died mid-render. Returns the number of jobs failed.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(minutes=settings.EXPORT_JOB_TIMEOUT_MINUTES)
+    stalled = list(ExportJob.objects.filter(status=ExportJob.Status.RUNNING).filter(
+        # Jobs started before started_at existed fall back to their creation time
+        Q(started_at__lt=cutoff) | Q(started_at__isnull=True, created_at__lt=cutoff)
+    ))
+    for job in stalled:
+        # Conditional, in case the worker finishes right now
+        if not ExportJob.objects.filter(id=job.id, status=ExportJob.Status.RUNNING).update(
+            status=ExportJob.Status.FAILED,
+            error='Export did not finish in time.',
+            finished_at=now,
+            expires_at=now + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS),
+        ):
+            continue
+        job.refresh_from_db()
+        push_update(job)
+    return len(stalled)
+
+
+def remove_orphaned_parts(now=None):
+    """
+    Delete partial files a crashed worker left behind, once they are older
+    than any running job could be. Returns the number of files removed.
+    """
+    cutoff = (now or timezone.now()).timestamp() - settings.EXPORT_JOB_TIMEOUT_MINUTES * 60
+    removed = 0
+    try:
+        entries = list(os.scandir(settings.EXPORT_STORAGE_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith('.part') and entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def cleanup_expired(now=None):
+    """Delete expired jobs and their files. Returns the number of jobs removed."""
+    now = now or timezone.now()
+    expired = list(ExportJob.objects.filter(expires_at__lt=now).exclude(status=ExportJob.Status.RUNNING))
+    for job in expired:
+        if job.file_name:
+            try:
+                os.remove(job_path(job))
+            except FileNotFoundError:
+                pass
+    ExportJob.objects.filter(id__in=[job.id for job in expired]).delete()
+    return len(expired)
@@ -0,0 +1,234 @@
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.colors import blue
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+from rooms.models import ReportedRoom, Room
+from users.models import CustomUser, UserSubscription
+
+EXPORT_CHUNK_SIZE = 2000
+# Lines rendered per worker-thread hop when serving a stream over ASGI
+STREAM_LINES_PER_CHUNK = 500
+
+PERIOD_LABELS = {
+    'this_week': 'This Week',
+    'last_month': 'Last Month',
+    'all': 'All Time',
+}
+
+USER_COLUMNS = [
+    ('id', 'ID', 'id'),
+    ('username', 'Username', 'username'),
+    ('email', 'Email', 'email'),
+    ('date_joined', 'Joined Date', 'date_joined'),
+    ('status', 'Status', 'userprofile__status'),
+    ('level', 'Level', 'userprofile__level'),
+    ('is_premium', 'Premium', 'userprofile__is_premium'),
+    ('is_verified', 'Verified', 'is_verified'),
+]
+
+
+def start_of_day(day):
+    """Midnight at the start of `day` in the current time zone, as an aware datetime."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def in_period(queryset, field, period):
+    """
+    Narrow to rows whose `field` falls in the export period ('this_week',
+    'last_month' or 'all'). The bounds are datetimes rather than a __date
+    lookup, so the column's index serves the range.
+    """
+    today = timezone.localdate()
+    if period == 'this_week':
+        start_date = today - timedelta(days=today.weekday())
+        queryset = queryset.filter(**{f"{field}__gte": start_of_day(start_date)})
+    elif period == 'last_month':
+        end_date = today.replace(day=1)
+        start_date = (end_date - timedelta(days=1)).replace(day=1)
+        queryset = queryset.filter(**{f"{field}__gte": start_of_day(start_date), f"{field}__lt": start_of_day(end_date)})
+    return queryset
+
+
+class Dataset:
+    """An exportable table: a base queryset, the date field periods filter on and (key, label, field) columns."""
+
+    def __init__(self, title, queryset, date_field, columns):
+        self.title = title
+        self.queryset = queryset
+        self.date_field = date_field
+        self.columns = columns
+
+    def rows(self, period):
+        """Rows as tuples in column order, fetched a chunk at a time."""
+        fields = [field for _, _, field in self.columns]
+        return in_period(self.queryset(), self.date_field, period).order_by('id').values_list(
+            *fields
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+DATASETS = {
+    'users': Dataset('User Report', lambda: CustomUser.objects.filter(is_superuser=False), 'date_joined', USER_COLUMNS),
+    'rooms': Dataset('Room Report', lambda: Room.objects.filter(is_deleted=False), 'created_at', [
+        ('id', 'ID', 'id'),
+        ('title', 'Title', 'title'),
+        ('host', 'Host', 'host__username'),
+        ('language', 'Language', 'language__name'),
+        ('room_type', 'Type', 'room_type__name'),
+        ('status', 'Status', 'status'),
+        ('max_participants', 'Max', 'max_participants'),
+        ('created_at', 'Created', 'created_at'),
+    ]),
+    'reports': Dataset('Moderation Report', lambda: ReportedRoom.objects.all(), 'timestamp', [
+        ('id', 'ID', 'id'),
+        ('room', 'Room', 'room__title'),
+        ('reported_by', 'Reported By', 'reported_by__username'),
+        ('reported_user', 'Reported User', 'reported_user__username'),
+        ('reason', 'Reason', 'reason'),
+        ('status', 'Status', 'status'),
+        ('timestamp', 'Reported At', 'timestamp'),
+    ]),
+    'subscriptions': Dataset('Subscription Report', lambda: UserSubscription.objects.all(), 'start_date', [
+        ('id', 'ID', 'id'),
+        ('username', 'User', 'user__username'),
+        ('plan', 'Plan', 'plan__name'),
+        ('start_date', 'Start', 'start_date'),
+        ('end_date', 'End', 'end_date'),
+        ('payment_status', 'Payment', 'payment_status'),
+        ('is_active', 'Active', 'is_active'),
+    ]),
+}
+
+
+def user_rows(period):
+    return DATASETS['users'].rows(period)
+
+
+def _plain(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow([label for _, label, _ in columns])
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def stream_ndjson(rows, columns):
+    keys = [key for key, _, _ in columns]
+    for row in rows:
+        yield json.dumps(dict(zip(keys, row)), default=_json_default) + '\n'
+
+
+async def aiter_lines(lines, per_chunk=STREAM_LINES_PER_CHUNK):
+    """
+    Serve a sync line generator from an ASGI server. Given a sync iterator,
+    StreamingHttpResponse list()s all of it before sending a byte; here
+    each batch of lines is rendered in the request's worker thread (where
+    the database cursor lives) and sent as one chunk.
+    """
+    lines = iter(lines)
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, per_chunk)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+PDF_ROWS_PER_PAGE = 24
+PDF_MARGIN = 36
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+
+def _pdf_cell(value, max_chars):
+    if value is None:
+        return 'N/A'
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).strftime('%Y-%m-%d')
+    elif isinstance(value, date):
+        value = value.strftime('%Y-%m-%d')
+    text = str(value)
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '…'
+
+
+def write_pdf(fileobj, title, columns, rows):
+    """
+    Render rows to `fileobj` as one small table per page, drawn straight onto
+    the canvas. Layout cost and memory stay per page, where a single table
+    over every row grows quadratically. Returns the number of rows written.
+    """
+    pagesize = landscape(A4)
+    width, height = pagesize
+    pdf = canvas.Canvas(fileobj, pagesize=pagesize)
+    col_width = (width - 2 * PDF_MARGIN) / len(columns)
+    # Roughly what fits in a column at 9pt Helvetica
+    max_chars = max(int(col_width / 5), 4)
+    header = [label for _, label, _ in columns]
+
+    written = 0
+    page = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, PDF_ROWS_PER_PAGE))
+        if not chunk and page:
+            break
+        page += 1
+        top = height - PDF_MARGIN
+        if page == 1:
+            pdf.setFillColor(blue)
+            pdf.setFont('Helvetica-Bold', 20)
+            pdf.drawCentredString(width / 2, top - 20, 'TalkMate')
+            pdf.setFillColor(colors.black)
+            pdf.setFont('Helvetica-Bold', 16)
+            pdf.drawCentredString(width / 2, top - 44, title)
+            top -= 64
+        table = Table([header] + [[_pdf_cell(value, max_chars) for value in row] for row in chunk],
+                      colWidths=[col_width] * len(columns))
+        table.setStyle(PDF_TABLE_STYLE)
+        _, table_height = table.wrapOn(pdf, width - 2 * PDF_MARGIN, top - PDF_MARGIN)
+        table.drawOn(pdf, PDF_MARGIN, top - table_height)
+        pdf.setFont('Helvetica', 8)
+        pdf.drawRightString(width - PDF_MARGIN, PDF_MARGIN / 2, f"Page {page}")
+        pdf.showPage()
+        written += len(chunk)
+        if len(chunk) < PDF_ROWS_PER_PAGE:
+            break
+    pdf.save()
+    return written
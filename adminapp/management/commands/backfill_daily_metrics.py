@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from adminapp.metrics import METRICS, backfill, metric_today
+
+
+class Command(BaseCommand):
+    help = "Fill the daily metrics rollup for a range of past days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.DAILY_METRICS_BACKFILL_DAYS,
+            help=f"Days back from today to fill (default {settings.DAILY_METRICS_BACKFILL_DAYS})"
+        )
+        parser.add_argument('--since', type=date.fromisoformat, help="Fill from this date (YYYY-MM-DD) instead of --days")
+        parser.add_argument('--metric', action='append', dest='metrics', help="Only this metric; repeatable")
+
+    def handle(self, *args, **options):
+        unknown = set(options['metrics'] or ()) - set(METRICS)
+        if unknown:
+            raise CommandError(f"Unknown metrics: {', '.join(sorted(unknown))}. Known: {', '.join(METRICS)}")
+        today = metric_today()
+        start = options['since'] or today - timedelta(days=options['days'] - 1)
+        written = backfill(start, today, options['metrics'])
+        self.stdout.write(f"Wrote {written} daily metric rows from {start} to {today}")
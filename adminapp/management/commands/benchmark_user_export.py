@@ -0,0 +1,132 @@
+import time
+from urllib.parse import urlencode
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.tokens import AccessToken
+from adminapp.exports import USER_COLUMNS, stream_csv, stream_ndjson, user_rows
+from users.models import CustomUser
+
+SEED_PREFIX = 'bench_export_'
+EXPORT_PATH = '/api/admin/users/export/'
+
+
+def current_rss_mb():
+    """Resident set size of this process right now (Linux)."""
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * 4096 / (1024 * 1024)
+
+
+class Command(BaseCommand):
+    help = "Stream the user export and sample RSS along the way to check memory stays flat"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Insert this many scratch users first, removed afterwards")
+        parser.add_argument('--output', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--period', default='all')
+        parser.add_argument('--sample-every', type=int, default=10000, help="Rows between RSS samples")
+        parser.add_argument(
+            '--direct', action='store_true',
+            help="Iterate the generator in-process instead of requesting the export through Django's ASGI handler"
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        try:
+            if options['direct']:
+                self.run_direct(options)
+            else:
+                self.run_asgi(options)
+        finally:
+            deleted, _ = CustomUser.objects.filter(username__startswith=SEED_PREFIX).delete()
+            if deleted:
+                self.stdout.write(f"removed {deleted} scratch rows")
+
+    def seed(self, count):
+        password = make_password(None)
+        start = time.perf_counter()
+        for offset in range(0, count, 5000):
+            CustomUser.objects.bulk_create([
+                CustomUser(username=f"{SEED_PREFIX}{n}", email=f"{SEED_PREFIX}{n}@example.com", password=password)
+                for n in range(offset, min(offset + 5000, count))
+            ])
+        self.stdout.write(f"seeded {count} users in {time.perf_counter() - start:.2f} s")
+
+    def run_direct(self, options):
+        render = stream_csv if options['output'] == 'csv' else stream_ndjson
+        baseline = peak = current_rss_mb()
+        rows = size = 0
+        start = time.perf_counter()
+        for chunk in render(user_rows(options['period']), USER_COLUMNS):
+            size += len(chunk)
+            rows += 1
+            if rows % options['sample_every'] == 0:
+                peak = max(peak, self.sample(rows))
+        self.report(options, rows, size, time.perf_counter() - start, baseline, peak)
+
+    def run_asgi(self, options):
+        """
+        Request the export through Django's ASGI handler, the path Daphne
+        serves, and sample RSS as each body chunk arrives.
+        """
+        admin = CustomUser.objects.create(
+            username=f"{SEED_PREFIX}admin", email=f"{SEED_PREFIX}admin@example.com", is_superuser=True, is_staff=True
+        )
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host and host != '*'), 'localhost')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': EXPORT_PATH,
+            'raw_path': EXPORT_PATH.encode(),
+            'query_string': urlencode({'output': options['output'], 'period': options['period']}).encode(),
+            'headers': [
+                (b'host', host.encode()),
+                (b'authorization', f"Bearer {AccessToken.for_user(admin)}".encode()),
+            ],
+            'server': (host, 80),
+            'client': ('127.0.0.1', 0),
+        }
+
+        async def fetch():
+            baseline = peak = current_rss_mb()
+            rows = size = 0
+            next_sample = options['sample_every']
+            start = time.perf_counter()
+            communicator = ApplicationCommunicator(ASGIHandler(), scope)
+            await communicator.send_input({'type': 'http.request', 'body': b'', 'more_body': False})
+            response_start = await communicator.receive_output(timeout=60)
+            if response_start['status'] != 200:
+                raise RuntimeError(f"export returned HTTP {response_start['status']}")
+            while True:
+                message = await communicator.receive_output(timeout=60)
+                body = message.get('body', b'')
+                size += len(body)
+                rows += body.count(b'\n')
+                if rows >= next_sample:
+                    peak = max(peak, self.sample(rows))
+                    next_sample += options['sample_every']
+                if not message.get('more_body'):
+                    break
+            await communicator.wait()
+            return rows, size, time.perf_counter() - start, baseline, peak
+
+        self.report(options, *async_to_sync(fetch)())
+
+    def sample(self, rows):
+        rss = current_rss_mb()
+        self.stdout.write(f"{rows:>10} rows  rss {rss:8.1f} MB")
+        return rss
+
+    def report(self, options, lines, size, elapsed, baseline, peak):
+        self.stdout.write(
+            f"{options['output']}: {lines - (options['output'] == 'csv')} rows, {size / (1024 * 1024):.1f} MB "
+            f"in {elapsed:.2f} s; rss {baseline:.1f} MB at start, {peak:.1f} MB peak"
+        )
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rooms.models import Message, Room, UserActivity
+from users.models import CustomUser, UserSubscription
+from .models import DailyMetric
+
+
+# A month at a time keeps each GROUP BY and upsert small
+BACKFILL_CHUNK_DAYS = 31
+
+
+def metric_today():
+    """
+    Metric days are UTC days, the same days UserActivity rows are kept per
+    (see users.xp), so every series buckets on the same boundary.
+    """
+    return timezone.now().date()
+
+
+class Metric:
+    """A daily KPI: rows of `queryset` per UTC day of `field`, counted or summed with `aggregate`."""
+
+    def __init__(self, queryset, field, aggregate=None):
+        self.queryset = queryset
+        self.field = field
+        self.aggregate = aggregate or Count('pk')
+
+    def daily(self, start, end):
+        """Values per day from `start` to `end` inclusive, for days that have any rows."""
+        queryset = self.queryset()
+        if queryset.model._meta.get_field(self.field).get_internal_type() == 'DateField':
+            rows = queryset.filter(**{f"{self.field}__range": (start, end)}).values(day=F(self.field))
+        else:
+            rows = queryset.filter(**{
+                f"{self.field}__gte": datetime.combine(start, time.min, tzinfo=dt_timezone.utc),
+                f"{self.field}__lt": datetime.combine(end + timedelta(days=1), time.min, tzinfo=dt_timezone.utc),
+            }).annotate(day=TruncDate(self.field, tzinfo=dt_timezone.utc)).values('day')
+        return {row['day']: row['value'] or 0 for row in rows.annotate(value=self.aggregate).order_by()}
+
+
+METRICS = {
+    'signups': Metric(lambda: CustomUser.objects.filter(is_superuser=False), 'date_joined'),
+    'subscriptions': Metric(lambda: UserSubscription.objects.all(), 'start_date'),
+    'rooms_created': Metric(lambda: Room.objects.all(), 'created_at'),
+    'messages_sent': Metric(lambda: Message.objects.exclude(message_type='system'), 'sent_at'),
+    # UserActivity rows are already per day
+    'practice_minutes': Metric(lambda: UserActivity.objects.all(), 'date', Sum('practice_minutes')),
+    'xp_earned': Metric(lambda: UserActivity.objects.all(), 'date', Sum('xp_earned')),
+}
+
+
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def rollup(start, end, names=None):
+    """
+    Recompute the given metrics (default all) for every day from `start` to
+    `end` and upsert them, zero-filling quiet days. Idempotent, so refreshing
+    a window again absorbs late writes. Returns the number of rows written.
+    """
+    written = 0
+    for name in names or METRICS:
+        values = METRICS[name].daily(start, end)
+        rows = [DailyMetric(metric=name, date=day, value=values.get(day, 0)) for day in _days(start, end)]
+        DailyMetric.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['metric', 'date'],
+            update_fields=['value', 'updated_at'],
+        )
+        written += len(rows)
+    return written
+
+
+def backfill(start, end, names=None):
+    """Roll up a long range a chunk of days at a time. Returns the number of rows written."""
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=BACKFILL_CHUNK_DAYS - 1), end)
+        written += rollup(chunk_start, chunk_end, names)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def refresh_recent(days=None):
+    """
+    Roll up the trailing days, today included. The periodic task calls this;
+    on its first run, with no history rolled up yet, it backfills
+    DAILY_METRICS_BACKFILL_DAYS first.
+    """
+    days = days or settings.DAILY_METRICS_REFRESH_DAYS
+    today = metric_today()
+    start = today - timedelta(days=days - 1)
+    written = 0
+    if not DailyMetric.objects.filter(date__lt=start).exists():
+        written += backfill(today - timedelta(days=settings.DAILY_METRICS_BACKFILL_DAYS - 1), start - timedelta(days=1))
+    return written + rollup(start, today)
+
+
+def read_daily(names, start, end):
+    """
+    {metric: {date: value}} from `start` to `end`. Past days come from the
+    rollup in one query; today, which is still filling up, is counted live.
+    """
+    today = metric_today()
+    values = defaultdict(dict)
+    for metric, day, value in DailyMetric.objects.filter(
+        metric__in=names, date__gte=start, date__lte=min(end, today - timedelta(days=1))
+    ).values_list('metric', 'date', 'value'):
+        values[metric][day] = value
+    if start <= today <= end:
+        for name in names:
+            values[name].update(METRICS[name].daily(today, today))
+    return {name: values[name] for name in names}
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_activity(apps, schema_editor):
+    """Seed the stream from existing rooms, reports and subscriptions."""
+    ActivityEvent = apps.get_model('adminapp', 'ActivityEvent')
+    Room = apps.get_model('rooms', 'Room')
+    ReportedRoom = apps.get_model('rooms', 'ReportedRoom')
+    UserSubscription = apps.get_model('users', 'UserSubscription')
+
+    sources = [
+        (Room.objects.select_related('host'), lambda room: (
+            'room_created', room.host, room.title, room.created_at, 'Unknown'
+        )),
+        (ReportedRoom.objects.select_related('reported_by', 'room'), lambda report: (
+            'room_reported', report.reported_by, f'message in {report.room.title}', report.timestamp, 'System'
+        )),
+        (UserSubscription.objects.select_related('user', 'plan'), lambda sub: (
+            'subscription_started', sub.user, sub.plan.name if sub.plan else '', sub.start_date, 'Unknown'
+        )),
+    ]
+    batch = []
+    for queryset, describe in sources:
+        for row in queryset.iterator(chunk_size=2000):
+            kind, actor, target, created_at, fallback = describe(row)
+            batch.append(ActivityEvent(
+                kind=kind,
+                actor=actor,
+                actor_name=actor.username if actor else fallback,
+                target=target[:255],
+                created_at=created_at,
+            ))
+            if len(batch) >= 2000:
+                ActivityEvent.objects.bulk_create(batch)
+                batch = []
+    ActivityEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminapp', '0001_dailymetric'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rooms', '0012_room_search_vector'),
+        ('users', '0015_userstatssnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('room_created', 'Room Created'), ('room_reported', 'Room Reported'), ('subscription_started', 'Subscription Started')], max_length=30)),
+                ('actor_name', models.CharField(blank=True, max_length=150)),
+                ('target', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'id'], name='activityevent_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
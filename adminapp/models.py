@@ -1,3 +1,79 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
+class DailyMetric(models.Model):
+    """
+    One value of a dashboard KPI for one local day, filled by the rollup
+    task in adminapp.metrics so dashboards never scan the source tables.
+    """
+    metric = models.CharField(max_length=50)
+    date = models.DateField()
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'date'], name='unique_daily_metric'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} on {self.date}: {self.value}"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only stream of notable user actions for the admin activity feed.
+    Names are copied in when the event is written, so reading the feed needs
+    no joins.
+    """
+    class Kind(models.TextChoices):
+        ROOM_CREATED = 'room_created', 'Room Created'
+        ROOM_REPORTED = 'room_reported', 'Room Reported'
+        SUBSCRIPTION_STARTED = 'subscription_started', 'Subscription Started'
+
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    actor_name = models.CharField(max_length=150, blank=True)
+    target = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='activityevent_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_name} {self.kind} {self.target}"
+
+
+class ExportJob(models.Model):
+    """An admin export rendered in the background to the local export store."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    class Output(models.TextChoices):
+        PDF = 'pdf', 'PDF'
+        CSV = 'csv', 'CSV'
+        NDJSON = 'ndjson', 'NDJSON'
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs')
+    dataset = models.CharField(max_length=20)
+    period = models.CharField(max_length=20, default='all')
+    output = models.CharField(max_length=10, choices=Output.choices, default=Output.PDF)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    size = models.BigIntegerField(default=0)
+    row_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.dataset} export #{self.id} ({self.status})"
@@ -1,5 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 class AdminDefaultPagination(PageNumberPagination):
     page_size = 5
-    page_size_query_param = 'page_size'
\ No newline at end of file
+    page_size_query_param = 'page_size'
+
+class AdminActivityCursorPagination(CursorPagination):
+    """Keyset pagination over the activity stream, newest first."""
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class AdminReportCursorPagination(CursorPagination):
+    """Keyset pagination for the moderation queue, opted into with ?pagination=cursor."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-timestamp', '-id')
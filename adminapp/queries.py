@@ -0,0 +1,23 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rooms.models import ReportedRoom
+
+
+def _report_count(**filters):
+    reports = ReportedRoom.objects.filter(reported_user=OuterRef('reported_user'), **filters).order_by()
+    return Coalesce(
+        Subquery(reports.values('reported_user').annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+        0,
+    )
+
+
+def reported_user_counts():
+    """
+    Annotations with how often each report's reported user has been reported
+    in total and how many of those are still pending, evaluated in the same
+    query as the page of reports.
+    """
+    return {
+        'reported_user_report_count': _report_count(),
+        'reported_user_pending_count': _report_count(status='pending'),
+    }
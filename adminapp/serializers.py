@@ -2,9 +2,13 @@ from rest_framework import serializers
 from users.models import CustomUser, UserProfile, UserLanguage, SubscriptionPlan,UserSubscription,Notification
 from rooms.models import *
 from rooms.serializers import TagSerializer, RoomParticipantSerializer
+from rooms.queries import room_members
 from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils.timesince import timesince
+from django.urls import reverse
+from .exports import DATASETS, PERIOD_LABELS
+from .models import ExportJob
 
 class AdminLoginSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -90,6 +94,9 @@ class RoomListSerializer(serializers.ModelSerializer):
         ]
         
     def get_activeUsers(self, obj):
+        # annotated by the admin room views
+        if hasattr(obj, 'active_participant_count'):
+            return obj.active_participant_count
         return obj.participants.filter(left_at__isnull=True).count()
     
 
@@ -112,17 +119,13 @@ class RoomDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_activeUsers(self, obj):
+        # annotated by the admin room views
+        if hasattr(obj, 'active_participant_count'):
+            return obj.active_participant_count
         return obj.participants.filter(left_at__isnull=True).count()
     
     def get_members(self, obj):
-        
-        seen = set()
-        unique_participants = []
-        for participant in obj.participants.order_by('-joined_at'):
-            if participant.user.id not in seen:
-                unique_participants.append(participant)
-                seen.add(participant.user.id)
-        return RoomParticipantSerializer(unique_participants, many=True).data
+        return RoomParticipantSerializer(room_members(obj), many=True).data
             
     
 class AdminRoomEditSerializer(serializers.ModelSerializer):
@@ -159,12 +162,14 @@ class AdminReportedRoomSerializer(serializers.ModelSerializer):
     reporterId = serializers.IntegerField(source='reported_by.id', read_only=True)
     reportedId = serializers.IntegerField(source='reported_user.id', read_only=True)
     reasonLabel = serializers.SerializerMethodField()
+    reportedUserReportCount = serializers.SerializerMethodField()
+    reportedUserPendingCount = serializers.SerializerMethodField()
 
     class Meta:
         model = ReportedRoom
         fields = [
             'id', 'reason','reasonLabel', 'reporter','reporterAvatar', 'reported','reportedAvatar', 'roomName', 'roomId',
-            'reporterId', 'reportedId', 'timestamp', 'status'
+            'reporterId', 'reportedId', 'timestamp', 'status', 'reportedUserReportCount', 'reportedUserPendingCount'
         ]
 
     def get_reporterAvatar(self, obj):
@@ -180,6 +185,21 @@ class AdminReportedRoomSerializer(serializers.ModelSerializer):
     def get_reasonLabel(self, obj):
         return obj.get_reason_display()
 
+    # Counts are annotated by adminapp.queries.reported_user_counts on the queue
+    def get_reportedUserReportCount(self, obj):
+        if hasattr(obj, 'reported_user_report_count'):
+            return obj.reported_user_report_count
+        if not obj.reported_user_id:
+            return 0
+        return ReportedRoom.objects.filter(reported_user_id=obj.reported_user_id).count()
+
+    def get_reportedUserPendingCount(self, obj):
+        if hasattr(obj, 'reported_user_pending_count'):
+            return obj.reported_user_pending_count
+        if not obj.reported_user_id:
+            return 0
+        return ReportedRoom.objects.filter(reported_user_id=obj.reported_user_id, status='pending').count()
+
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = SubscriptionPlan
@@ -221,4 +241,25 @@ class AdminNotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'type', 'title', 'message', 'is_read', 'created_at', 'link', 'time']
 
     def get_time(self, obj):
-        return timesince(obj.created_at) + ' ago'
\ No newline at end of file
+        return timesince(obj.created_at) + ' ago'
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'dataset', 'period', 'output', 'status', 'size', 'row_count', 'error',
+            'created_at', 'finished_at', 'expires_at', 'download_url',
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.Status.DONE:
+            return None
+        return reverse('admin_export_job_download', args=[obj.id])
+
+
+class CreateExportJobSerializer(serializers.Serializer):
+    dataset = serializers.ChoiceField(choices=list(DATASETS))
+    period = serializers.ChoiceField(choices=list(PERIOD_LABELS), default='all')
+    output = serializers.ChoiceField(choices=ExportJob.Output.choices, default=ExportJob.Output.PDF)
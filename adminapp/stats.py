@@ -0,0 +1,75 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from rooms.models import Room, ReportedRoom
+from users.models import CustomUser, UserProfile
+from .metrics import metric_today, read_daily
+
+DASHBOARD_STATS_CACHE_KEY = 'admin:dashboard_stats'
+
+MONTHS = 12
+WEEKS = 6
+DAYS = 31
+
+
+def month_starts(today, count):
+    """The first day of the last `count` months, oldest first, using calendar months."""
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(count):
+        starts.append(today.replace(year=year, month=month, day=1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return starts[::-1]
+
+
+def bucketed(daily, buckets, bucket_of):
+    """Sum daily values into the given bucket starts, zero-filled."""
+    totals = defaultdict(int)
+    for day, value in daily.items():
+        totals[bucket_of(day)] += value
+    return [totals.get(bucket, 0) for bucket in buckets]
+
+
+def week_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def build_dashboard_stats():
+    today = metric_today()
+    months = month_starts(today, MONTHS)
+    weeks = [week_of(today) - timedelta(weeks=i) for i in range(WEEKS - 1, -1, -1)]
+    days = [today - timedelta(days=i) for i in range(DAYS - 1, -1, -1)]
+
+    daily = read_daily(['signups', 'subscriptions'], months[0], today)
+    signups, subscriptions = daily['signups'], daily['subscriptions']
+
+    return {
+        'total_users': CustomUser.objects.filter(is_superuser=False).count(),
+        'active_rooms': Room.objects.filter(status='live', is_deleted=False).count(),
+        'premium_users': UserProfile.objects.filter(is_premium=True).count(),
+        'flagged_content': ReportedRoom.objects.filter(status='pending').count(),
+        'user_growth': bucketed(signups, months, month_of),
+        'months': [month.strftime('%b %Y') for month in months],
+        'week_growth': bucketed(signups, weeks, week_of),
+        'weeks': [week.isocalendar()[1] for week in weeks],
+        'day_growth': bucketed(signups, days, lambda day: day),
+        'days': [day.strftime('%Y-%m-%d') for day in days],
+        'subscription_growth': bucketed(subscriptions, months, month_of),
+        'subscription_months': [month.strftime('%b %Y') for month in months],
+        'week_subscription_growth': bucketed(subscriptions, weeks, week_of),
+        'week_subscription_labels': [f'W{week.isocalendar()[1]}' for week in weeks],
+        'day_subscription_growth': bucketed(subscriptions, days, lambda day: day),
+        'day_subscription_labels': [day.strftime('%m/%d') for day in days],
+    }
+
+
+def get_dashboard_stats():
+    """Dashboard stats, cached briefly and shared by every admin."""
+    return cache.get_or_set(
+        DASHBOARD_STATS_CACHE_KEY, build_dashboard_stats, timeout=settings.ADMIN_STATS_CACHE_SECONDS
+    )
@@ -0,0 +1,38 @@
+import logging
+from celery import shared_task
+from .metrics import refresh_recent
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rollup_daily_metrics_task():
+    """Recompute the trailing days of every dashboard metric."""
+    written = refresh_recent()
+    logger.info("Rolled up %d daily metric rows", written)
+
+
+@shared_task
+def flush_activity_events_task():
+    """Write the admin activity events buffered since the last flush."""
+    from .activity import flush_pending
+    written = flush_pending()
+    if written:
+        logger.debug("Wrote %d activity events", written)
+
+
+@shared_task
+def run_export_job_task(job_id):
+    from .export_jobs import run_job
+    run_job(job_id)
+
+
+@shared_task
+def cleanup_export_jobs_task():
+    """Fail stalled export jobs, then remove jobs past their TTL and leftover partial files."""
+    from .export_jobs import cleanup_expired, fail_stalled, remove_orphaned_parts
+    failed = fail_stalled()
+    removed = cleanup_expired()
+    parts = remove_orphaned_parts()
+    if failed or removed or parts:
+        logger.info("Export cleanup: %d stalled jobs failed, %d expired jobs and %d partial files removed", failed, removed, parts)
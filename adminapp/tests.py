@@ -1,3 +1,221 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+import fakeredis
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rooms.models import Room, RoomParticipant
+from rooms.queries import room_members
+from users.models import CustomUser
+from . import activity
+from .exports import in_period, start_of_day
+from .models import ActivityEvent, DailyMetric
+from .metrics import METRICS, metric_today, read_daily, refresh_recent
+from .stats import DASHBOARD_STATS_CACHE_KEY, build_dashboard_stats, get_dashboard_stats
 
-# Create your tests here.
+SESSIONS_PER_USER = 20
+MEMBER_COUNT = 50
+
+
+class AdminRoomQueryTests(TestCase):
+    """Admin room endpoints cost the same number of queries however long a room's history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(username='admin', email='admin@example.com', is_superuser=True, is_staff=True)
+        cls.members = [
+            CustomUser.objects.create(username=f"member{n}", email=f"member{n}@example.com") for n in range(MEMBER_COUNT)
+        ]
+        cls.room = Room.objects.create(host=cls.members[0], title='Busy room', status='live')
+        for n in range(4):
+            Room.objects.create(host=cls.members[n], title=f"Room {n}", status='live')
+
+        # 1,000 historical participations: every member joined SESSIONS_PER_USER times
+        base = timezone.now() - timedelta(days=30)
+        for session in range(SESSIONS_PER_USER):
+            created = RoomParticipant.objects.bulk_create([
+                RoomParticipant(room=cls.room, user=member) for member in cls.members
+            ])
+            for offset, participant in enumerate(created):
+                participant.joined_at = base + timedelta(hours=session, minutes=offset)
+                participant.left_at = participant.joined_at + timedelta(minutes=30)
+            RoomParticipant.objects.bulk_update(created, ['joined_at', 'left_at'])
+        # The first ten members are in the room right now
+        RoomParticipant.objects.filter(
+            room=cls.room, user__in=cls.members[:10], joined_at__gte=base + timedelta(hours=SESSIONS_PER_USER - 1)
+        ).update(left_at=None)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_room_list_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/admin/rooms/', {'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        busy = next(room for room in response.data['results'] if room['id'] == self.room.id)
+        self.assertEqual(busy['activeUsers'], 10)
+
+    def test_room_detail_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/admin/rooms/{self.room.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['activeUsers'], 10)
+        self.assertEqual(len(response.data['members']), MEMBER_COUNT)
+
+    def assert_latest_participations(self, members):
+        self.assertEqual(len(members), MEMBER_COUNT)
+        self.assertEqual({participant.user_id for participant in members}, {member.id for member in self.members})
+        latest = RoomParticipant.objects.filter(room=self.room).order_by('-joined_at')[:MEMBER_COUNT]
+        self.assertEqual([participant.id for participant in members], [participant.id for participant in latest])
+        self.assertEqual(sum(participant.left_at is None for participant in members), 10)
+
+    def test_room_members_fallback(self):
+        with mock.patch.object(connection, 'vendor', 'sqlite'):
+            with self.assertNumQueries(1):
+                members = room_members(self.room)
+                # user and profile come joined
+                [participant.user.userprofile.level for participant in members]
+        self.assert_latest_participations(members)
+
+    @skipUnless(connection.vendor == 'postgresql', "DISTINCT ON needs PostgreSQL")
+    def test_room_members_distinct_on(self):
+        with self.assertNumQueries(1):
+            members = room_members(self.room)
+            [participant.user.userprofile.level for participant in members]
+        self.assert_latest_participations(members)
+
+
+class DashboardStatsQueryTests(TestCase):
+    """The dashboard reads a fixed number of queries whatever the history it covers."""
+
+    def setUp(self):
+        cache.delete(DASHBOARD_STATS_CACHE_KEY)
+        today = metric_today()
+        DailyMetric.objects.bulk_create([
+            DailyMetric(metric=metric, date=today - timedelta(days=offset), value=offset % 7)
+            for metric in ('signups', 'subscriptions')
+            for offset in range(1, 365)
+        ])
+        for n in range(3):
+            CustomUser.objects.create(username=f"newcomer{n}", email=f"newcomer{n}@example.com")
+
+    def tearDown(self):
+        cache.delete(DASHBOARD_STATS_CACHE_KEY)
+
+    def test_build_queries(self):
+        # four KPI counts, one rollup read, today's signups and subscriptions
+        with self.assertNumQueries(7):
+            stats = build_dashboard_stats()
+        self.assertEqual(stats['total_users'], 3)
+        self.assertEqual(stats['day_growth'][-1], 3)
+        self.assertEqual(stats['day_growth'][-2], 1)
+        self.assertEqual(len(stats['user_growth']), 12)
+
+    def test_cached_read_skips_database(self):
+        get_dashboard_stats()
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+
+class DailyMetricRollupTests(TestCase):
+    def test_first_refresh_backfills_history(self):
+        with self.settings(DAILY_METRICS_BACKFILL_DAYS=60, DAILY_METRICS_REFRESH_DAYS=2):
+            refresh_recent()
+            self.assertEqual(DailyMetric.objects.filter(metric='signups').count(), 60)
+            # Later runs only refresh the trailing days
+            with self.assertNumQueries(1 + 2 * len(METRICS)):
+                refresh_recent()
+
+    def test_signups_bucket_on_utc_days(self):
+        yesterday = metric_today() - timedelta(days=1)
+        late = datetime.combine(yesterday, time(23, 30), tzinfo=dt_timezone.utc)
+        user = CustomUser.objects.create(username='latecomer', email='latecomer@example.com')
+        CustomUser.objects.filter(id=user.id).update(date_joined=late)
+        refresh_recent()
+        self.assertEqual(read_daily(['signups'], yesterday, yesterday)['signups'], {yesterday: 1})
+
+
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('django_redis.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.admin = CustomUser.objects.create(username='admin', email='admin@example.com', is_superuser=True, is_staff=True)
+        self.member = CustomUser.objects.create(username='member', email='member@example.com')
+
+    def test_events_are_buffered_and_written_in_one_insert(self):
+        with mock.patch('adminapp.tasks.flush_activity_events_task.apply_async') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                for n in range(3):
+                    activity.record(ActivityEvent.Kind.ROOM_CREATED, self.member, f"Room {n}")
+        schedule.assert_called_once()
+        self.assertFalse(ActivityEvent.objects.exists())
+
+        with mock.patch('adminapp.activity.broadcast') as broadcast:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(activity.flush_pending(), 3)
+        self.assertEqual(list(ActivityEvent.objects.order_by('id').values_list('target', flat=True)), ['Room 0', 'Room 1', 'Room 2'])
+        # One push for the whole batch
+        broadcast.assert_called_once()
+        self.assertEqual(activity.flush_pending(), 0)
+
+    def test_event_is_written_directly_without_redis(self):
+        with mock.patch('adminapp.activity._redis', side_effect=ConnectionError('redis is down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                activity.record(ActivityEvent.Kind.ROOM_REPORTED, self.member, 'message in Lobby')
+        self.assertEqual(ActivityEvent.objects.get().target, 'message in Lobby')
+
+    def test_feed_pages_across_months_in_time_order(self):
+        # Month names sort out of order ('Dec' < 'Jan' < 'Nov') and two events share a timestamp
+        moments = [
+            datetime(2025, 11, 30, 23, 59, tzinfo=dt_timezone.utc),
+            datetime(2025, 12, 1, 0, 0, tzinfo=dt_timezone.utc),
+            datetime(2025, 12, 1, 0, 0, tzinfo=dt_timezone.utc),
+            datetime(2025, 12, 31, 12, 0, tzinfo=dt_timezone.utc),
+            datetime(2026, 1, 1, 8, 0, tzinfo=dt_timezone.utc),
+            datetime(2026, 1, 15, 9, 30, tzinfo=dt_timezone.utc),
+            datetime(2026, 2, 1, 10, 0, tzinfo=dt_timezone.utc),
+        ]
+        ActivityEvent.objects.bulk_create([
+            ActivityEvent(kind=ActivityEvent.Kind.ROOM_CREATED, actor=self.member, actor_name='member', target=f"Room {n}", created_at=moment)
+            for n, moment in enumerate(moments)
+        ])
+        expected = list(ActivityEvent.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        seen, url, params = [], '/api/admin/recent-activity/', {'page_size': 2}
+        while url:
+            response = client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(event['id'] for event in response.data['recent_activity'])
+            url, params = response.data['next'], None
+        self.assertEqual(seen, expected)
+
+
+class ExportPeriodTests(TestCase):
+    def test_last_month_bounds_are_local_midnights(self):
+        end = timezone.localdate().replace(day=1)
+        start = (end - timedelta(days=1)).replace(day=1)
+        joined = {
+            'before': start_of_day(start) - timedelta(seconds=1),
+            'first': start_of_day(start),
+            'last': start_of_day(end) - timedelta(seconds=1),
+            'after': start_of_day(end),
+        }
+        for name, moment in joined.items():
+            user = CustomUser.objects.create(username=name, email=f"{name}@example.com")
+            CustomUser.objects.filter(id=user.id).update(date_joined=moment)
+
+        exported = in_period(CustomUser.objects.all(), 'date_joined', 'last_month')
+        self.assertCountEqual(exported.values_list('username', flat=True), ['first', 'last'])
+
+    def test_period_filter_compares_the_raw_column(self):
+        # No date cast around the column, so its index can serve the range
+        sql = str(in_period(CustomUser.objects.all(), 'date_joined', 'this_week').query).lower()
+        self.assertNotIn('cast', sql)
+        self.assertIn('"users_customuser"."date_joined" >=', sql)
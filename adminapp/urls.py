@@ -34,8 +34,12 @@ urlpatterns = [
     
     #dashboard
     path('stats/', AdminStatsView.as_view(), name='admin_stats'),
+    path('metrics/', AdminDailyMetricsView.as_view(), name='admin_daily_metrics'),
     path('recent-activity/', AdminRecentActivityView.as_view(), name='admin_recent_activity'),
     path('users/export/', AdminUserExportView.as_view(),name='admin_user_export'),
+    path('exports/', AdminExportJobListView.as_view(), name='admin_export_jobs'),
+    path('exports/<int:job_id>/', AdminExportJobDetailView.as_view(), name='admin_export_job_detail'),
+    path('exports/<int:job_id>/download/', AdminExportJobDownloadView.as_view(), name='admin_export_job_download'),
     #notifications
     path('notifications/', AdminNotificationListView.as_view(),name='admin-notifications'),
 ]
@@ -1,27 +1,35 @@
-from io import BytesIO
 from .serializers import *
 from datetime import timedelta
-from reportlab.lib import colors
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count, Q
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from tempfile import SpooledTemporaryFile
 from users.models import Notification
-from reportlab.lib.units import inch
-from reportlab.lib.colors import blue
 from datetime import datetime, timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from reportlab.lib.pagesizes import letter, A4
-from .pagination import AdminDefaultPagination
+from .pagination import AdminDefaultPagination, AdminActivityCursorPagination, AdminReportCursorPagination
+from rooms.queries import active_count_annotation
+from rooms.search import search_rooms
+from users.moderation import ban_user, unban_user
+from users.search import search_users
+from .activity import event_payload
+from .exports import DATASETS, PERIOD_LABELS, USER_COLUMNS, aiter_lines, stream_csv, stream_ndjson, user_rows, write_pdf
+from .downloads import aiter_file, ranged_file_response
+from .export_jobs import CONTENT_TYPES, create_job, job_path
+from .metrics import METRICS, metric_today, read_daily
+from .models import ActivityEvent, ExportJob
+from .queries import reported_user_counts
+from .stats import get_dashboard_stats
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from users.utils import set_auth_cookies, clear_auth_cookies
 from rest_framework import status, permissions,generics,viewsets
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rooms.models import Room, RoomParticipant, Message, Tag, RoomType,ReportedRoom
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from rooms import lobby
+from rooms.models import Room, Message, Tag, RoomType,ReportedRoom
 from users.models import CustomUser, UserProfile, Language, SubscriptionPlan,UserSubscription
 
 class AdminLoginView(TokenObtainPairView):
@@ -100,10 +108,7 @@ class AdminUserListView(APIView):
 
         # Searching by username or email
         if search_param:
-            users = users.filter(
-                Q(username__icontains=search_param) |
-                Q(email__icontains=search_param)
-            )
+            users = search_users(users, search_param)
 
         paginator = PageNumberPagination()
         paginator.page_size = 5 
@@ -133,63 +138,16 @@ class AdminUserStatusUpdateView(APIView):
         action = request.data.get('action')
         
         if action == 'banned':
-            # Ban the user
-            user_profile.status = 'banned'
-            user.is_active = False
-            user_profile.save()
-            user.save()
-            
-            # NEW: Cleanup room participations
-            self.cleanup_room_participations(user)
-            
+            # Ban the user, settle their room sessions and close their sockets
+            ban_user(user)
             return Response({"detail": "User banned."}, status=status.HTTP_200_OK)
             
         elif action == 'active':
             # Unban the user
-            user_profile.status = 'active'
-            user.is_active = True
-            user_profile.save()
-            user.save()
-            
+            unban_user(user)
             return Response({"detail": "User unbanned."}, status=status.HTTP_200_OK)
         else:
             return Response({"detail": "Invalid action."}, status=status.HTTP_400_BAD_REQUEST)
-    
-    def cleanup_room_participations(self, user):
-        """Cleanup all active room participations for banned user"""
-
-        
-        # Find all active participations
-        active_participations = RoomParticipant.objects.filter(
-            user=user,
-            left_at__isnull=True
-        )
-        
-        for participation in active_participations:
-            # Set leave time
-            participation.left_at = timezone.now()
-            participation.save()
-            
-            # Calculate session duration
-            duration = (participation.left_at - participation.joined_at).total_seconds()
-            minutes = max(1, int(duration // 60))
-            
-            # Update user profile stats
-            profile = user.userprofile
-            profile.total_speak_time = (profile.total_speak_time or timedelta()) + timedelta(minutes=minutes)
-            profile.xp += minutes * 20
-            profile.level = profile.xp // 1000 + 1
-            profile.save()
-            
-            # Update daily activity
-            from rooms.models import UserActivity
-            activity, _ = UserActivity.objects.get_or_create(
-                user=user, 
-                date=timezone.now().date()
-            )
-            activity.xp_earned += minutes * 20
-            activity.practice_minutes += minutes
-            activity.save()
 
 
 class AdminRoomListView(APIView):
@@ -199,7 +157,9 @@ class AdminRoomListView(APIView):
         if not request.user.is_superuser:
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
-        rooms = Room.objects.filter(is_deleted=False).select_related('host', 'room_type', 'language').prefetch_related('participants', 'tags')
+        rooms = Room.objects.filter(is_deleted=False).select_related('host', 'room_type', 'language').annotate(
+            active_participant_count=active_count_annotation()
+        )
 
         # Filters
         search = request.query_params.get('search')
@@ -208,9 +168,10 @@ class AdminRoomListView(APIView):
         status_param = request.query_params.get('status')
 
         if search:
+            matching_hosts = search_users(CustomUser.objects.all(), search).values('id')
             rooms = rooms.filter(
-                Q(title__icontains=search) |
-                Q(host__username__icontains=search)
+                Q(id__in=search_rooms(Room.objects.all(), search).values('id')) |
+                Q(host_id__in=matching_hosts)
             )
         if language and language != 'all':
             rooms = rooms.filter(language__name=language)
@@ -236,7 +197,9 @@ class AdminRoomDetailView(APIView):
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
         room = get_object_or_404(
-            Room.objects.select_related('host', 'room_type', 'language').prefetch_related('tags', 'participants'),
+            Room.objects.select_related('host', 'room_type', 'language').prefetch_related('tags').annotate(
+                active_participant_count=active_count_annotation()
+            ),
             id=room_id
         )
         serializer = RoomDetailSerializer(room)
@@ -251,15 +214,18 @@ class AdminRoomDetailView(APIView):
         room.status = 'ended'
         room.ended_at = timezone.now()
         room.save()
+        lobby.room_ended(room)
         return Response({"detail": "Room deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
     
     def patch(self, request, room_id):
         if not request.user.is_superuser:
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
         room = get_object_or_404(Room, id=room_id)
+        previous = (room.language_id, room.room_type_id)
         serializer = AdminRoomEditSerializer(room, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            lobby.room_updated(room, previous)
             # Return updated details
             detail_serializer = RoomDetailSerializer(room)
             return Response(detail_serializer.data, status=status.HTTP_200_OK)
@@ -291,29 +257,52 @@ class TagListView(APIView):
 
 
 class AdminReportedRoomListView(generics.ListAPIView):
+    """
+    Moderation queue. Filters: ?status=, ?reason=, ?search=. Page numbers by
+    default; ?pagination=cursor switches to keyset pages for deep scrolling.
+    """
     serializer_class = AdminReportedRoomSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = AdminDefaultPagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = AdminReportCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         # Only allow superusers
         if not self.request.user.is_superuser:
             return ReportedRoom.objects.none()
     
-        queryset = ReportedRoom.objects.select_related('reported_by', 'reported_user','room').order_by('-timestamp')
+        queryset = ReportedRoom.objects.select_related(
+            'reported_by__userprofile', 'reported_user__userprofile', 'room'
+        ).annotate(**reported_user_counts()).order_by('-timestamp', '-id')
         
         search = self.request.query_params.get('search')
         reason = self.request.query_params.get('reason')
+        status_param = self.request.query_params.get('status')
         
         if search:
+            matching_users = search_users(CustomUser.objects.all(), search).values('id')
+            matching_reasons = [
+                code for code, label in ReportedRoom.REASON_CHOICES
+                if search.lower() in code or search.lower() in label.lower()
+            ]
             queryset = queryset.filter(
-                Q(reported_by__username__icontains=search) |
-                Q(reported_user__username__icontains=search)|
-                Q(room__title__icontains=search)|
-                Q(reason__icontains=search)
+                Q(reported_by_id__in=matching_users) |
+                Q(reported_user_id__in=matching_users) |
+                Q(room_id__in=search_rooms(Room.objects.all(), search).values('id')) |
+                Q(reason__in=matching_reasons)
             )
         if reason:
             queryset = queryset.filter(reason=reason)
+        if status_param and status_param != 'all':
+            queryset = queryset.filter(status=status_param)
         
         return queryset
     
@@ -337,13 +326,10 @@ class AdminReportedRoomStatusUpdateView(generics.UpdateAPIView):
         
         if status_value == "suspend":
             user_profile = get_object_or_404(UserProfile,user=report.reported_user)
-            user = user_profile.user
-            user_profile.status = 'banned'
-            user.is_active = False
-            report.status = 'resolved'
-            user_profile.save()
-            user.save()
-            report.save()
+            with transaction.atomic():
+                ban_user(user_profile.user)
+                report.status = 'resolved'
+                report.save()
              
         else:            
             report.status = status_value
@@ -407,150 +393,55 @@ class AdminStatsView(APIView):
     def get(self, request):
         if not request.user.is_superuser:
             return Response({'error': 'Unauthorized'}, status=403)
-        
-        total_users = CustomUser.objects.filter(is_superuser=False).count()
-        active_rooms = Room.objects.filter(status='live', is_deleted=False).count()
-        premium_users = UserProfile.objects.filter(is_premium=True).count()
-        flagged_content = ReportedRoom.objects.filter(status='pending').count()
-        today = timezone.now().date()
-
-        # Monthly (last 12 months)
-        months = []
-        user_growth = []
-        subscription_growth = []
-        subscription_months = []
-        
-        for i in range(11, -1, -1):
-            month_start = (today.replace(day=1) - timedelta(days=30*i)).replace(day=1)
-            month_end = (month_start + timedelta(days=32)).replace(day=1)
-            
-            # User registrations
-            user_count = CustomUser.objects.filter(
-                is_superuser=False,
-                date_joined__gte=month_start,
-                date_joined__lt=month_end
-            ).count()
-            
-            # Premium subscriptions
-            subscription_count = UserSubscription.objects.filter(
-                start_date__gte=month_start,
-                start_date__lt=month_end
-            ).count()
-            
-            months.append(month_start.strftime('%b %Y'))
-            user_growth.append(user_count)
-            subscription_growth.append(subscription_count)
-            subscription_months.append(month_start.strftime('%b %Y'))
-
-        # Weekly (last 6 weeks)
-        weeks = []
-        week_growth = []
-        week_subscription_growth = []
-        week_subscription_labels = []
-        
-        for i in range(5, -1, -1):
-            week_start = today - timedelta(days=today.weekday() + 7*i)
-            week_end = week_start + timedelta(days=7)
-            
-            # User registrations
-            user_count = CustomUser.objects.filter(
-                is_superuser=False,
-                date_joined__gte=week_start,
-                date_joined__lt=week_end
-            ).count()
-            
-            # Premium subscriptions
-            subscription_count = UserSubscription.objects.filter(
-                start_date__gte=week_start,
-                start_date__lt=week_end
-            ).count()
-            
-            weeks.append(week_start.isocalendar()[1])
-            week_growth.append(user_count)
-            week_subscription_growth.append(subscription_count)
-            week_subscription_labels.append(f'W{week_start.isocalendar()[1]}')
-
-        # Daily (last 31 days)
-        days = []
-        day_growth = []
-        day_subscription_growth = []
-        day_subscription_labels = []
-        
-        for i in range(30, -1, -1):
-            day = today - timedelta(days=i)
-            next_day = day + timedelta(days=1)
-            
-            # User registrations
-            user_count = CustomUser.objects.filter(
-                is_superuser=False,
-                date_joined__gte=day,
-                date_joined__lt=next_day
-            ).count()
-            
-            # Premium subscriptions
-            subscription_count = UserSubscription.objects.filter(
-                start_date__gte=day,
-                start_date__lt=next_day
-            ).count()
-            
-            days.append(day.strftime('%Y-%m-%d'))
-            day_growth.append(user_count)
-            day_subscription_growth.append(subscription_count)
-            day_subscription_labels.append(day.strftime('%m/%d'))
+        return Response(get_dashboard_stats())
+
+class AdminDailyMetricsView(APIView):
+    """Daily KPI series read from the rollup, e.g. ?metric=signups&metric=rooms_created&days=90."""
+    permission_classes = [IsAuthenticated]
+    MAX_DAYS = 400
 
+    def get(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Unauthorized'}, status=403)
+        names = request.GET.getlist('metric') or list(METRICS)
+        unknown = [name for name in names if name not in METRICS]
+        if unknown:
+            return Response({'error': f"Unknown metrics: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = min(max(int(request.GET.get('days', 30)), 1), self.MAX_DAYS)
+        except ValueError:
+            return Response({'error': 'days must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = metric_today()
+        dates = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+        values = read_daily(names, dates[0], today)
         return Response({
-            'total_users': total_users,
-            'active_rooms': active_rooms,
-            'premium_users': premium_users,
-            'flagged_content': flagged_content,
-            'user_growth': user_growth,
-            'months': months,
-            'week_growth': week_growth,
-            'weeks': weeks,
-            'day_growth': day_growth,
-            'days': days,
-            'subscription_growth': subscription_growth,
-            'subscription_months': subscription_months,
-            'week_subscription_growth': week_subscription_growth,
-            'week_subscription_labels': week_subscription_labels,
-            'day_subscription_growth': day_subscription_growth,
-            'day_subscription_labels': day_subscription_labels,
+            'days': [day.isoformat() for day in dates],
+            'metrics': {name: [values[name].get(day, 0) for day in dates] for name in names},
         })
 
+
 class AdminRecentActivityView(APIView):
+    """Admin activity feed, newest first. Follow `next` for older events; new ones arrive over ws/admin/activity/."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         if not request.user.is_superuser:
             return Response({'error': 'Unauthorized'}, status=403)
-        activities = []
-        # Room creations
-        for room in Room.objects.order_by('-created_at')[:5]:
-            activities.append({
-                'user': room.host.username if room.host else 'Unknown',
-                'action': 'created a new room',
-                'target': room.title,
-                'time': room.created_at.strftime('%b %d, %H:%M')
-            })
-        # Reports
-        for report in ReportedRoom.objects.order_by('-timestamp')[:5]:
-            activities.append({
-                'user': report.reported_by.username if report.reported_by else 'System',
-                'action': 'reported',
-                'target': f'message in {report.room.title}',
-                'time': report.timestamp.strftime('%b %d, %H:%M')
-            })
-        # Premium upgrades
-        for sub in UserSubscription.objects.order_by('-start_date')[:5]:
-            activities.append({
-                'user': sub.user.username,
-                'action': 'upgraded to',
-                'target': sub.plan.name,
-                'time': sub.start_date.strftime('%b %d, %H:%M')
-            })
-        # Sort by time descending
-        activities = sorted(activities, key=lambda x: x['time'], reverse=True)[:10]
-        return Response({'recent_activity': activities})
+        paginator = AdminActivityCursorPagination()
+        page = paginator.paginate_queryset(ActivityEvent.objects.all(), request, view=self)
+        return Response({
+            'recent_activity': [event_payload(activity) for activity in page],
+            'next': paginator.get_next_link(),
+        })
+
+
+PDF_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+STREAMING_FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+}
 
 
 class AdminUserExportView(APIView):
@@ -561,107 +452,73 @@ class AdminUserExportView(APIView):
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
         
         period = request.GET.get('period', 'all')
-        
-        # Filter users based on period
-        queryset = CustomUser.objects.filter(is_superuser=False)
-        
-        if period == 'this_week':
-            start_date = timezone.now().date() - timedelta(days=timezone.now().weekday())
-            queryset = queryset.filter(date_joined__date__gte=start_date)
-        elif period == 'last_month':
-            last_month = timezone.now().date().replace(day=1) - timedelta(days=1)
-            start_date = last_month.replace(day=1)
-            end_date = timezone.now().date().replace(day=1)
-            queryset = queryset.filter(date_joined__date__gte=start_date, date_joined__date__lt=end_date)
-        
-        # Get user data with related profile info
-        users_data = []
-        for user in queryset.select_related('userprofile'):
-            profile = getattr(user, 'userprofile', None)
-            users_data.append([
-                user.id,
-                user.username,
-                user.email,
-                user.date_joined.strftime('%Y-%m-%d') if user.date_joined else 'N/A',
-                profile.status if profile else 'N/A',
-                profile.level if profile else 'N/A',
-                'Yes' if profile and profile.is_premium else 'No',
-                'Yes' if user.is_verified else 'No'
-            ])
-        
-        # Generate PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-
-        #project name heading in blue
-        styles = getSampleStyleSheet()
-        project_heading_style = ParagraphStyle(
-            'ProjectHeading',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=blue,
-            alignment=1,
-            spaceAfter=10,
-        )
-        project_heading = Paragraph('TalkMate',project_heading_style)
-        elements.append(project_heading)
-
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        
-        period_text = {
-            'this_week': 'This Week',
-            'last_month': 'Last Month',
-            'all': 'All Time'
-        }.get(period, 'All Time')
-        
-        title = Paragraph(f"User Report - {period_text}", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 20))
-        
-        # Table data
-        table_data = [
-            ['ID', 'Username', 'Email', 'Joined Date', 'Status', 'Level', 'Premium', 'Verified']
-        ] + users_data
-        
-        # Create table
-        table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        
-        # Build PDF
-        doc.build(elements)
+        output = request.GET.get('output', 'pdf')
+        if output in STREAMING_FORMATS:
+            return self.stream(period, output)
+
+        # Rendered page by page into a spooled file; large sets belong in an export job
+        buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+        dataset = DATASETS['users']
+        write_pdf(buffer, f"{dataset.title} - {PERIOD_LABELS.get(period, 'All Time')}", dataset.columns, dataset.rows(period))
+        size = buffer.tell()
         buffer.seek(0)
-        
-        # Create response
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        response = StreamingHttpResponse(aiter_file(buffer), content_type='application/pdf')
+        response['Content-Length'] = str(size)
         response['Content-Disposition'] = f'attachment; filename="users-{period}-{datetime.now().strftime("%Y-%m-%d")}.pdf"'
-        
         return response
 
+    def stream(self, period, output):
+        """CSV or NDJSON, streamed a chunk of rows at a time so memory stays flat."""
+        content_type, render = STREAMING_FORMATS[output]
+        response = StreamingHttpResponse(aiter_lines(render(user_rows(period), USER_COLUMNS)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="users-{period}-{datetime.now().strftime("%Y-%m-%d")}.{output}"'
+        return response
+
+
+class AdminExportJobListView(APIView):
+    """POST queues an export of users, rooms, reports or subscriptions; GET lists your recent jobs."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Unauthorized'}, status=403)
+        jobs = ExportJob.objects.filter(requested_by=request.user).order_by('-created_at')[:20]
+        return Response(ExportJobSerializer(jobs, many=True).data)
+
+    def post(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Unauthorized'}, status=403)
+        serializer = CreateExportJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = create_job(request.user, **serializer.validated_data)
+        return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AdminExportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        if not request.user.is_superuser:
+            return Response({'error': 'Unauthorized'}, status=403)
+        job = get_object_or_404(ExportJob, id=job_id, requested_by=request.user)
+        return Response(ExportJobSerializer(job).data)
+
+
+class AdminExportJobDownloadView(APIView):
+    """The finished file, with Range support so interrupted downloads resume."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        if not request.user.is_superuser:
+            return Response({'error': 'Unauthorized'}, status=403)
+        job = get_object_or_404(ExportJob, id=job_id, requested_by=request.user)
+        if job.status != ExportJob.Status.DONE:
+            return Response({'error': 'Export is not ready.', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        try:
+            return ranged_file_response(request, job_path(job), CONTENT_TYPES[job.output], job.file_name)
+        except FileNotFoundError:
+            return Response({'error': 'Export has expired.'}, status=status.HTTP_410_GONE)
+
 
 class AdminNotificationListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -18,8 +18,9 @@ from rooms.middleware import JWTAuthMiddleware
 from channels.security.websocket import AllowedHostsOriginValidator
 from rooms.routing import websocket_urlpatterns as room_websocket_urlpatterns
 from users.routing import websocket_urlpatterns as user_websocket_urlpatterns
+from adminapp.routing import websocket_urlpatterns as admin_websocket_urlpatterns
 
-websocket_urlpatterns = room_websocket_urlpatterns + user_websocket_urlpatterns
+websocket_urlpatterns = room_websocket_urlpatterns + user_websocket_urlpatterns + admin_websocket_urlpatterns
 
 
 application = ProtocolTypeRouter({
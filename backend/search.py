@@ -0,0 +1,60 @@
+from functools import reduce
+from operator import or_
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+# Full-text config used for the room search_vector column and its trigger
+SEARCH_CONFIG = 'simple'
+
+
+def uses_postgres_search():
+    return connection.vendor == 'postgresql'
+
+
+def text_search(queryset, term, fields, vector_field=None, rank=False):
+    """
+    Filter `queryset` to rows where any of `fields` contains `term`, or where
+    `vector_field` matches it as a full-text query.
+
+    On PostgreSQL the substring matches are served by pg_trgm GIN indexes and
+    the full-text match by the tsvector GIN index. Other databases (SQLite in
+    tests) fall back to plain icontains.
+
+    With rank=True the best matches come first: on PostgreSQL by full-text
+    rank, then by trigram similarity to `fields`; elsewhere by the first of
+    `fields` that matches. The queryset's own ordering breaks ties.
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+
+    matches = [Q(**{f"{field}__icontains": term}) for field in fields]
+    condition = reduce(or_, matches)
+    if not uses_postgres_search():
+        queryset = queryset.filter(condition)
+        if rank:
+            queryset = queryset.annotate(search_rank=Case(
+                *[When(match, then=Value(len(fields) - n)) for n, match in enumerate(matches)],
+                default=Value(0), output_field=IntegerField(),
+            ))
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+    if vector_field:
+        condition |= Q(**{vector_field: query})
+    queryset = queryset.filter(condition)
+
+    if rank:
+        similarities = [TrigramSimilarity(field, term) for field in fields]
+        queryset = queryset.annotate(
+            search_similarity=similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        )
+        ordering = ['-search_similarity']
+        if vector_field:
+            queryset = queryset.annotate(search_rank=SearchRank(F(vector_field), query))
+            ordering.insert(0, '-search_rank')
+        queryset = queryset.order_by(*ordering, *queryset.query.order_by)
+    return queryset
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt', 
     'rest_framework_simplejwt.token_blacklist',
@@ -191,6 +192,12 @@ USE_L10N = True
 
 # Static files
 STATIC_URL = 'static/'
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Avatar processing
+AVATAR_STAGING_DIR = config('AVATAR_STAGING_DIR', default=str(BASE_DIR / 'media' / 'avatar_staging'))
+AVATAR_STORAGE_BACKEND = config('AVATAR_STORAGE_BACKEND', default='users.avatars.CloudinaryAvatarStorage')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # JWT Configuration
@@ -203,6 +210,12 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
 }
 
+# Google login
+# Required: every Google ID token is checked against this audience
+GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
+# Point at users/testdata/google_certs.json to verify tokens offline in tests
+GOOGLE_CERTS_FILE = config('GOOGLE_CERTS_FILE', default=None)
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -211,6 +224,19 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='TalkMate <noreply@talkmate.com>')
+# Used by django.core.mail.backends.filebased.EmailBackend for offline runs
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'sent_emails'))
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_DELAY_SECONDS = 1
+# Queued messages not sent within this long are dropped
+EMAIL_QUEUE_TTL_SECONDS = 24 * 3600
+EMAIL_MAX_ATTEMPTS = 5
+
+# One-time passwords
+OTP_STORE_BACKEND = config('OTP_STORE_BACKEND', default='users.otp.RedisOTPStore')
+OTP_TTL_SECONDS = 120
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_COOLDOWN_SECONDS = 60
 
 
 AUTH_COOKIE_SECURE = True           
@@ -245,6 +271,58 @@ CHANNEL_LAYERS = {
 }
 
 
+# Lobby deltas are coalesced and pushed once per tick
+LOBBY_TICK_SECONDS = 1
+
+# Room sockets send a heartbeat every interval (any inbound frame also
+# counts); participations silent for longer than the timeout are closed by
+# the reaper
+ROOM_HEARTBEAT_INTERVAL_SECONDS = 20
+ROOM_HEARTBEAT_TIMEOUT_SECONDS = 90
+ROOM_REAPER_INTERVAL_SECONDS = 60
+
+# Scheduled rooms go live and empty live rooms end on this tick
+ROOM_LIFECYCLE_INTERVAL_SECONDS = 30
+ROOM_IDLE_GRACE_SECONDS = 300
+
+# XP ledger events are folded into profiles in batches shortly after they land,
+# with a periodic pass as a safety net
+XP_AGGREGATE_DELAY_SECONDS = 2
+XP_AGGREGATE_BATCH_SIZE = 500
+XP_AGGREGATE_INTERVAL_SECONDS = 60
+LEADERBOARD_BACKEND = config('LEADERBOARD_BACKEND', default='users.leaderboards.RedisLeaderboard')
+LEADERBOARD_PAGE_SIZE = 50
+
+# Live rooms returned by SuggestedRoomsView
+ROOM_SUGGESTION_LIMIT = 5
+
+# User directory autocomplete
+USER_SEARCH_MIN_PREFIX = 2
+USER_SEARCH_LIMIT = 10
+
+# Admin dashboard stats are computed once per window and shared by all admins
+ADMIN_STATS_CACHE_SECONDS = 60
+
+# Dashboard KPIs are rolled up per day; each run recomputes the trailing days
+DAILY_METRICS_INTERVAL_SECONDS = 3600
+DAILY_METRICS_REFRESH_DAYS = 2
+# History the first run fills in when the rollup is still empty
+DAILY_METRICS_BACKFILL_DAYS = 400
+
+# Admin activity events are buffered in Redis and written in batches
+ACTIVITY_FLUSH_DELAY_SECONDS = 2
+ACTIVITY_BATCH_SIZE = 500
+
+# Background admin exports are written here and removed after the TTL. The
+# Celery worker writes the files and the web process serves them, so in a
+# multi-container deployment this must be a volume both of them mount.
+EXPORT_STORAGE_DIR = config('EXPORT_STORAGE_DIR', default=str(BASE_DIR / 'media' / 'exports'))
+EXPORT_JOB_TTL_HOURS = 24
+# A job running longer than this is taken as a dead worker and marked failed
+EXPORT_JOB_TIMEOUT_MINUTES = 60
+EXPORT_CLEANUP_INTERVAL_SECONDS = 3600
+
+
 #razorpay setttings
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET')
@@ -264,4 +342,26 @@ CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
\ No newline at end of file
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'reap-ghost-participants': {
+        'task': 'rooms.tasks.reap_ghost_participants_task',
+        'schedule': ROOM_REAPER_INTERVAL_SECONDS,
+    },
+    'room-lifecycle': {
+        'task': 'rooms.tasks.room_lifecycle_task',
+        'schedule': ROOM_LIFECYCLE_INTERVAL_SECONDS,
+    },
+    'aggregate-xp-events': {
+        'task': 'users.tasks.aggregate_xp_events_task',
+        'schedule': XP_AGGREGATE_INTERVAL_SECONDS,
+    },
+    'rollup-daily-metrics': {
+        'task': 'adminapp.tasks.rollup_daily_metrics_task',
+        'schedule': DAILY_METRICS_INTERVAL_SECONDS,
+    },
+    'cleanup-export-jobs': {
+        'task': 'adminapp.tasks.cleanup_export_jobs_task',
+        'schedule': EXPORT_CLEANUP_INTERVAL_SECONDS,
+    },
+}
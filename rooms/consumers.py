@@ -1,12 +1,18 @@
+import asyncio
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
+from users.moderation import UserControlMixin
+from . import lobby, presence
 import logging
 
 logger = logging.getLogger(__name__)
 
-class RoomConsumer(AsyncWebsocketConsumer):
+class RoomConsumer(UserControlMixin, AsyncWebsocketConsumer):
     async def connect(self):
         from django.contrib.auth.models import AnonymousUser
         self.room_id = self.scope['url_route']['kwargs']['room_id']
@@ -32,9 +38,14 @@ class RoomConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        await self.join_control_group()
         await self.accept()
         # Add user as participant
         await self.add_participant()
+        await self.mark_alive(force=True)
+        # Clients that predate the heartbeat protocol never send one; keep
+        # their participation alive from here until the first heartbeat frame
+        self.keepalive = asyncio.create_task(self.keep_alive())
         # Notify others about new participant
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -50,6 +61,8 @@ class RoomConsumer(AsyncWebsocketConsumer):
         # Request audio connections with existing participants
         await self.request_audio_connections()
     async def disconnect(self, close_code):
+        if getattr(self, 'keepalive', None):
+            self.keepalive.cancel()
         if hasattr(self, 'room_group_name'):
             
             #handle if the user is host
@@ -74,13 +87,18 @@ class RoomConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 self.channel_name
             )
+        await self.leave_control_group()
 
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
             message_type = data.get('type')
+            # Any frame shows the socket is alive
+            await self.mark_alive()
             
-            if message_type == 'chat_message':
+            if message_type == 'heartbeat':
+                await self.handle_heartbeat()
+            elif message_type == 'chat_message':
                 await self.handle_chat_message(data)
             elif message_type == 'webrtc_offer':
                 await self.handle_webrtc_offer(data)
@@ -110,6 +128,14 @@ class RoomConsumer(AsyncWebsocketConsumer):
             }))
 
     # Message Handlers
+    async def handle_heartbeat(self):
+        if self.keepalive:
+            # The client speaks the protocol, so its own heartbeats decide
+            self.keepalive.cancel()
+            self.keepalive = None
+        await self.mark_alive(force=True)
+        await self.send(text_data=json.dumps({'type': 'heartbeat_ack'}))
+
     async def handle_chat_message(self, data):
         message_content = data.get('message', '').strip()
         if not message_content:
@@ -344,6 +370,25 @@ class RoomConsumer(AsyncWebsocketConsumer):
         except Room.DoesNotExist:
             return False
 
+    async def mark_alive(self, force=False):
+        """Refresh the heartbeat, at most once per interval unless forced."""
+        now = time.monotonic()
+        if force or now - self.last_heartbeat >= settings.ROOM_HEARTBEAT_INTERVAL_SECONDS:
+            self.last_heartbeat = now
+            try:
+                await self.touch_heartbeat()
+            except Exception as e:
+                logger.warning(f"Could not record heartbeat in room {self.room_id}: {e}")
+
+    async def keep_alive(self):
+        while True:
+            await asyncio.sleep(settings.ROOM_HEARTBEAT_INTERVAL_SECONDS)
+            await self.mark_alive()
+
+    @sync_to_async
+    def touch_heartbeat(self):
+        presence.touch_heartbeat(self.room_id, self.user.id)
+
     @database_sync_to_async
     def add_participant(self):
         from .models import Room, RoomParticipant
@@ -382,19 +427,22 @@ class RoomConsumer(AsyncWebsocketConsumer):
             participant.role = 'host'
             participant.save()
 
+        lobby.participants_changed(room.id)
         return participant
 
 
     @database_sync_to_async
     def remove_participant(self):
         from .models import Room, RoomParticipant
+        from .sessions import settle_participation
         try:
             participant = RoomParticipant.objects.get(
                 user=self.user,
                 room_id=self.room_id,
                 left_at__isnull=True
             )
-            self.calculate_stats_on_leave(participant)
+            settle_participation(participant)
+            presence.clear_heartbeat(self.room_id, self.user.id)
         except RoomParticipant.DoesNotExist:
             pass
 
@@ -481,7 +529,8 @@ class RoomConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'room_state',
             'participants': participants,
-            'room_id': self.room_id
+            'room_id': self.room_id,
+            'heartbeat_interval': settings.ROOM_HEARTBEAT_INTERVAL_SECONDS
         }))
         
 
@@ -518,27 +567,77 @@ class RoomConsumer(AsyncWebsocketConsumer):
                 room.status = 'ended'
                 room.ended_at = timezone.now()
                 room.save()
+                lobby.room_ended(room)
             
 
+
+
+class LobbyConsumer(UserControlMixin, AsyncWebsocketConsumer):
+    """
+    Live lobby stream. Subscribers pick a lobby with ?language=<id> or
+    ?room_type=<id> (or neither for every live room), get a snapshot on
+    connect and then compact deltas once per lobby tick.
+    """
+    async def connect(self):
+        from django.contrib.auth.models import AnonymousUser
+        from urllib.parse import parse_qs
+        from .lobby import LOBBY_GROUP, language_group, room_type_group
+
+        self.user = self.scope['user']
+        if isinstance(self.user, AnonymousUser):
+            await self.close()
+            return
+
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.language_id = params.get('language', [None])[0]
+        self.room_type_id = params.get('room_type', [None])[0]
+        if (self.language_id and not self.language_id.isdigit()) or (self.room_type_id and not self.room_type_id.isdigit()):
+            await self.close()
+            return
+
+        if self.language_id:
+            self.lobby_group_name = language_group(self.language_id)
+        elif self.room_type_id:
+            self.lobby_group_name = room_type_group(self.room_type_id)
+        else:
+            self.lobby_group_name = LOBBY_GROUP
+
+        await self.channel_layer.group_add(self.lobby_group_name, self.channel_name)
+        await self.join_control_group()
+        await self.accept()
+
+        rooms = await self.get_snapshot()
+        await self.send(text_data=json.dumps({
+            'type': 'lobby_snapshot',
+            'rooms': rooms
+        }))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'lobby_group_name'):
+            await self.channel_layer.group_discard(self.lobby_group_name, self.channel_name)
+        await self.leave_control_group()
+
+    async def receive(self, text_data):
+        # The lobby is push-only
+        pass
+
+    async def lobby_delta(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'lobby_delta',
+            'deltas': event['deltas']
+        }))
+
     @database_sync_to_async
-    def calculate_stats_on_leave(self, participant):
-        from .models import UserActivity
-        from datetime import timedelta
-
-        now = timezone.now()
-        participant.left_at = now
-        participant.save()
-
-        duration = (participant.left_at - participant.joined_at).total_seconds()
-        minutes = max(1, int(duration // 60))
-
-        profile = participant.user.userprofile
-        profile.total_speak_time = (profile.total_speak_time or timedelta()) + timedelta(minutes=minutes)
-        profile.xp += minutes * 20
-        profile.level = profile.xp // 1000 + 1
-        profile.save()
-
-        activity, _ = UserActivity.objects.get_or_create(user=participant.user, date=now.date())
-        activity.xp_earned += minutes * 20
-        activity.practice_minutes += minutes
-        activity.save()
+    def get_snapshot(self):
+        from .models import Room
+        from .queries import room_list_queryset
+        from .serializers import RoomSerializer
+        from .pagination import RoomCursorPagination
+
+        queryset = Room.objects.filter(status='live', is_deleted=False)
+        if self.language_id:
+            queryset = queryset.filter(language_id=self.language_id)
+        if self.room_type_id:
+            queryset = queryset.filter(room_type_id=self.room_type_id)
+        rooms = room_list_queryset(queryset).order_by(*RoomCursorPagination.ordering)[:RoomCursorPagination.max_page_size]
+        return RoomSerializer(rooms, many=True).data
@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from . import lobby
+
+logger = logging.getLogger(__name__)
+
+
+def activate_scheduled_rooms(now=None):
+    """
+    Go live with every scheduled room whose started_at has passed. The host
+    joins over the room socket as usual; if nobody does, end_idle_rooms ends
+    the room after the grace period. Returns the activated rooms.
+    """
+    from .models import Room
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        rooms = list(Room.objects.select_for_update(skip_locked=True).filter(
+            status='scheduled', is_deleted=False, started_at__lte=now
+        ).select_related('host'))
+        if not rooms:
+            return []
+        Room.objects.filter(id__in=[room.id for room in rooms]).update(status='live')
+        for room in rooms:
+            room.status = 'live'
+            lobby.room_created(room)
+        transaction.on_commit(lambda: notify_room_live(rooms))
+    return rooms
+
+
+def end_idle_rooms(now=None):
+    """
+    End live rooms that have had nobody in them for longer than the grace
+    period, counted from the last leave, or from the start if nobody ever
+    joined. Returns the number of rooms ended.
+    """
+    from .models import Room, RoomParticipant
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.ROOM_IDLE_GRACE_SECONDS)
+    with transaction.atomic():
+        idle_ids = list(Room.objects.filter(
+            status='live', is_deleted=False
+        ).annotate(
+            active=Count('participants', filter=Q(participants__left_at__isnull=True)),
+            idle_since=Coalesce(Max('participants__left_at'), 'started_at', 'created_at'),
+        ).filter(active=0, idle_since__lt=cutoff).values_list('id', flat=True))
+        if not idle_ids:
+            return 0
+        # Re-check under the row locks so a room someone just joined stays live
+        rooms = list(Room.objects.select_for_update(skip_locked=True).filter(
+            id__in=idle_ids, status='live'
+        ).exclude(id__in=RoomParticipant.objects.filter(left_at__isnull=True).values('room_id')))
+        Room.objects.filter(id__in=[room.id for room in rooms]).update(status='ended', ended_at=now)
+        for room in rooms:
+            lobby.room_ended(room)
+    return len(rooms)
+
+
+def notify_room_live(rooms):
+    """
+    Tell the host's followers who opted into room notifications that the room
+    is live: one bulk insert, then a push to each recipient's socket.
+    """
+    from users.models import Notification, UserProfile
+    from users.utils import send_notification_to_user
+
+    notifications = []
+    for room in rooms:
+        if not room.host_id:
+            continue
+        follower_ids = UserProfile.objects.filter(
+            following__user_id=room.host_id,
+            user__usersettings__room_interest_notifications=True,
+        ).exclude(status=UserProfile.Status.BANNED).values_list('user_id', flat=True)
+        notifications.extend(
+            Notification(
+                user_id=user_id,
+                type=Notification.NotificationType.ROOM_LIVE,
+                title=f"{room.host.username} is live",
+                message=f'"{room.title}" has started.',
+                related_user_id=room.host_id,
+                related_room=room,
+            )
+            for user_id in follower_ids
+        )
+    created = Notification.objects.bulk_create(notifications, batch_size=500)
+
+    for notification in created:
+        try:
+            send_notification_to_user(notification.user_id, {
+                'id': notification.id,
+                'type': notification.type,
+                'title': notification.title,
+                'message': notification.message,
+                'is_read': False,
+                'created_at': notification.created_at.isoformat(),
+                'link': notification.link,
+                'related_user_id': notification.related_user_id,
+                'related_room_id': notification.related_room_id,
+            })
+        except Exception as e:
+            logger.warning("Could not push room notification to user %s: %s", notification.user_id, e)
+    return len(created)
+
+
+def run_lifecycle(now=None):
+    """One scheduler pass. Celery beat calls this through room_lifecycle_task; tests can call it directly."""
+    activated = activate_scheduled_rooms(now)
+    ended = end_idle_rooms(now)
+    return len(activated), ended
@@ -0,0 +1,142 @@
+import json
+import logging
+from django.conf import settings
+from django.db import transaction
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+logger = logging.getLogger(__name__)
+
+LOBBY_GROUP = 'lobby'
+PENDING_KEY = 'lobby:pending'
+PREVIOUS_GROUPS_KEY = 'lobby:previous_groups'
+FLUSH_SCHEDULED_KEY = 'lobby:flush_scheduled'
+
+# Pending changes per room are merged by keeping the strongest one
+COUNT = 1
+UPSERT = 2
+REMOVE = 3
+
+# KEYS: pending, flush flag  ARGV: room id, change
+MERGE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if tonumber(ARGV[2]) > current then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return redis.call('SET', KEYS[2], 1, 'NX', 'EX', 60)
+"""
+
+
+def language_group(language_id):
+    return f"lobby_language_{language_id}"
+
+
+def room_type_group(room_type_id):
+    return f"lobby_room_type_{room_type_id}"
+
+
+def groups_for(language_id, room_type_id):
+    groups = [LOBBY_GROUP]
+    if language_id:
+        groups.append(language_group(language_id))
+    if room_type_id:
+        groups.append(room_type_group(room_type_id))
+    return groups
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def publish_room_change(room_id, change, previous=None):
+    """
+    Record a lobby change for a room; deltas are coalesced and pushed once per
+    tick by flush_lobby_deltas_task. `previous` is the room's former
+    (language_id, room_type_id) when an edit may have moved it between lobbies.
+    """
+    def enqueue():
+        from .tasks import flush_lobby_deltas_task
+        try:
+            redis = _redis()
+            if previous is not None:
+                redis.hsetnx(PREVIOUS_GROUPS_KEY, room_id, json.dumps(groups_for(*previous)))
+            scheduled = redis.eval(MERGE_SCRIPT, 2, PENDING_KEY, FLUSH_SCHEDULED_KEY, room_id, change)
+            if scheduled:
+                flush_lobby_deltas_task.apply_async(countdown=settings.LOBBY_TICK_SECONDS)
+        except Exception as e:
+            logger.warning("Could not publish lobby change for room %s: %s", room_id, e)
+
+    transaction.on_commit(enqueue)
+
+
+def room_created(room):
+    publish_room_change(room.id, UPSERT)
+
+
+def room_updated(room, previous=None):
+    publish_room_change(room.id, UPSERT, previous)
+
+
+def room_ended(room):
+    publish_room_change(room.id, REMOVE)
+
+
+def participants_changed(room_id):
+    publish_room_change(room_id, COUNT)
+
+
+def flush_deltas():
+    """Build the compact deltas for everything pending and send one message per lobby group."""
+    from .models import Room
+    from .queries import room_list_queryset
+    from .recommendations import sync_room_features
+    from .serializers import RoomSerializer
+
+    redis = _redis()
+    pipe = redis.pipeline()
+    pipe.hgetall(PENDING_KEY)
+    pipe.hgetall(PREVIOUS_GROUPS_KEY)
+    pipe.delete(PENDING_KEY, PREVIOUS_GROUPS_KEY, FLUSH_SCHEDULED_KEY)
+    pending, previous_groups, _ = pipe.execute()
+    if not pending:
+        return 0
+
+    changes = {int(room_id): int(change) for room_id, change in pending.items()}
+    previous_groups = {int(room_id): json.loads(groups) for room_id, groups in previous_groups.items()}
+    rooms = room_list_queryset(Room.objects.filter(id__in=changes)).in_bulk()
+
+    deltas = {}
+    for room_id, change in changes.items():
+        room = rooms.get(room_id)
+        if room is None or room.status != 'live' or room.is_deleted:
+            groups = groups_for(room.language_id, room.room_type_id) if room else [LOBBY_GROUP]
+            for group in groups:
+                deltas.setdefault(group, []).append({'op': 'remove', 'id': room_id})
+            continue
+
+        groups = groups_for(room.language_id, room.room_type_id)
+        # Tell lobbies the room moved out of that it is gone
+        for group in previous_groups.get(room_id, []):
+            if group not in groups:
+                deltas.setdefault(group, []).append({'op': 'remove', 'id': room_id})
+
+        if change == COUNT:
+            delta = {'op': 'count', 'id': room_id, 'participant_count': room.active_participant_count}
+        else:
+            delta = {'op': 'upsert', 'room': RoomSerializer(room).data}
+        for group in groups:
+            deltas.setdefault(group, []).append(delta)
+
+    channel_layer = get_channel_layer()
+    for group, group_deltas in deltas.items():
+        async_to_sync(channel_layer.group_send)(group, {
+            'type': 'lobby_delta',
+            'deltas': group_deltas,
+        })
+
+    try:
+        sync_room_features(list(changes), rooms)
+    except Exception as e:
+        logger.warning("Could not sync recommendation features: %s", e)
+    return len(changes)
@@ -0,0 +1,96 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from rooms.models import Room
+from backend.search import uses_postgres_search
+from rooms.search import search_rooms
+from users.search import search_directory, search_users
+
+User = get_user_model()
+
+PREFIX = 'searchbench'
+WORDS = [
+    'english', 'spanish', 'french', 'german', 'hindi', 'japanese', 'casual', 'practice',
+    'debate', 'grammar', 'travel', 'movies', 'music', 'beginners', 'advanced', 'interview',
+    'culture', 'cooking', 'coding', 'books', 'sports', 'news', 'slang', 'pronunciation',
+]
+TERMS = ['grammar', 'travel movies', 'pronunc', 'user12345', 'interview practice']
+
+
+class Command(BaseCommand):
+    help = "Seed users and rooms, then compare icontains scans against the indexed search"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000, help="Rows to seed for both users and rooms")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cleanup', action='store_true', help="Delete the seeded rows and exit")
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            Room.objects.filter(title__startswith=PREFIX).delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
+            self.stdout.write("Removed benchmark rows")
+            return
+
+        self.seed(options['count'], options['batch_size'])
+        if not uses_postgres_search():
+            self.stdout.write(self.style.WARNING("Not on PostgreSQL: the search falls back to icontains"))
+
+        for term in TERMS:
+            # Same ordering the list views use, so only the match strategy differs
+            rooms = Room.objects.order_by('-created_at')
+            users = User.objects.order_by('-date_joined')
+            legacy_rooms = rooms.filter(Q(title__icontains=term) | Q(description__icontains=term))
+            legacy_users = users.filter(Q(username__icontains=term) | Q(email__icontains=term))
+            self.report(f"rooms '{term}'", legacy_rooms, search_rooms(rooms, term), options['repeat'])
+            self.report(f"users '{term}'", legacy_users, search_users(users, term), options['repeat'])
+
+        prefix = f"{PREFIX}_user12"
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            search_directory(prefix)
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(f"{'directory autocomplete':<32} {sorted(timings)[len(timings) // 2] * 1000:8.1f} ms")
+
+    def seed(self, count, batch_size):
+        existing = User.objects.filter(username__startswith=PREFIX).count()
+        for start in range(existing, count, batch_size):
+            User.objects.bulk_create([
+                User(username=f"{PREFIX}_user{i}", email=f"{PREFIX}_user{i}@example.com", password='!')
+                for i in range(start, min(start + batch_size, count))
+            ])
+        self.stdout.write(f"Users seeded: {max(count, existing)}")
+
+        host_ids = list(User.objects.filter(username__startswith=PREFIX).values_list('id', flat=True)[:1000])
+        existing = Room.objects.filter(title__startswith=PREFIX).count()
+        rng = random.Random(existing)
+        for start in range(existing, count, batch_size):
+            Room.objects.bulk_create([
+                Room(
+                    host_id=rng.choice(host_ids),
+                    title=f"{PREFIX} {' '.join(rng.sample(WORDS, 3))}",
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    status='ended',
+                )
+                for _ in range(start, min(start + batch_size, count))
+            ])
+        self.stdout.write(f"Rooms seeded: {max(count, existing)}")
+
+    def report(self, label, legacy, indexed, repeat):
+        legacy_time = self.time_query(legacy, repeat)
+        indexed_time = self.time_query(indexed, repeat)
+        self.stdout.write(
+            f"{label:<32} icontains: {legacy_time * 1000:8.1f} ms   indexed: {indexed_time * 1000:8.1f} ms"
+        )
+
+    def time_query(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset[:20])
+            timings.append(time.perf_counter() - start)
+        return sorted(timings)[len(timings) // 2]
@@ -0,0 +1,19 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rooms.lifecycle import run_lifecycle
+
+
+class Command(BaseCommand):
+    help = "Run the room lifecycle scheduler in-process, without Celery beat"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running every ROOM_LIFECYCLE_INTERVAL_SECONDS")
+
+    def handle(self, *args, **options):
+        while True:
+            activated, ended = run_lifecycle()
+            self.stdout.write(f"activated {activated} scheduled rooms, ended {ended} idle rooms")
+            if not options['loop']:
+                return
+            time.sleep(settings.ROOM_LIFECYCLE_INTERVAL_SECONDS)
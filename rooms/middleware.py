@@ -18,6 +18,9 @@ class JWTAuthMiddleware(BaseMiddleware):
         query_string = scope.get('query_string', b'').decode()
         query_params = parse_qs(query_string)
         token = query_params.get('token', [None])[0]
+        if not token and scope.get('path', '').startswith('/ws/admin/'):
+            # The admin panel only holds its token in an httpOnly cookie
+            token = self.get_cookie(scope, 'admin_access_token')
         
         if token:
             try:
@@ -33,14 +36,28 @@ class JWTAuthMiddleware(BaseMiddleware):
         
         return await super().__call__(scope, receive, send)
     
+    @staticmethod
+    def get_cookie(scope, name):
+        from http.cookies import SimpleCookie
+        for header, value in scope.get('headers', []):
+            if header == b'cookie':
+                morsel = SimpleCookie(value.decode()).get(name)
+                return morsel.value if morsel else None
+        return None
+
     @database_sync_to_async
     def get_user_from_token(self, access_token):
         from django.contrib.auth import get_user_model
         from django.contrib.auth.models import AnonymousUser
+        from users.moderation import is_revoked
         
         User = get_user_model()
         try:
             user_id = access_token['user_id']
-            return User.objects.get(id=user_id)
+            # Banned users are refused before touching the database
+            if is_revoked(user_id):
+                return AnonymousUser()
+            user = User.objects.get(id=user_id)
+            return user if user.is_active else AnonymousUser()
         except User.DoesNotExist:
             return AnonymousUser()
\ No newline at end of file
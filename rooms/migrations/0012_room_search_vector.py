@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:51
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# On PostgreSQL the search_vector column is kept current by a trigger and
+# indexed with GIN; title/description get pg_trgm indexes for icontains.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS rooms_room_search_vector_gin ON rooms_room USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS rooms_room_title_trgm ON rooms_room USING gin (upper(title) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS rooms_room_description_trgm ON rooms_room USING gin (upper(description) gin_trgm_ops)",
+    """
+    CREATE TRIGGER rooms_room_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON rooms_room
+    FOR EACH ROW EXECUTE FUNCTION
+    tsvector_update_trigger(search_vector, 'pg_catalog.simple', title, description)
+    """,
+    "UPDATE rooms_room SET search_vector = to_tsvector('pg_catalog.simple', coalesce(title, '') || ' ' || coalesce(description, ''))",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS rooms_room_search_vector_update ON rooms_room",
+    "DROP INDEX IF EXISTS rooms_room_search_vector_gin",
+    "DROP INDEX IF EXISTS rooms_room_title_trgm",
+    "DROP INDEX IF EXISTS rooms_room_description_trgm",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_alter_message_is_deleted_alter_message_sent_at_and_more'),
+        ('users', '0011_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
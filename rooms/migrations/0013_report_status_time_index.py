@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0012_room_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reportedroom',
+            index=models.Index(fields=['status', 'timestamp'], name='report_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# Weight the title above the description in search_vector, so ts_rank puts
+# title matches ahead of description-only ones. tsvector_update_trigger
+# cannot weight columns, so a plpgsql function replaces it.
+FORWARD_SQL = [
+    "DROP TRIGGER IF EXISTS rooms_room_search_vector_update ON rooms_room",
+    """
+    CREATE OR REPLACE FUNCTION rooms_room_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER rooms_room_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON rooms_room
+    FOR EACH ROW EXECUTE FUNCTION rooms_room_search_vector()
+    """,
+    """
+    UPDATE rooms_room SET search_vector =
+        setweight(to_tsvector('pg_catalog.simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.simple', coalesce(description, '')), 'B')
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS rooms_room_search_vector_update ON rooms_room",
+    "DROP FUNCTION IF EXISTS rooms_room_search_vector()",
+    """
+    CREATE TRIGGER rooms_room_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON rooms_room
+    FOR EACH ROW EXECUTE FUNCTION
+    tsvector_update_trigger(search_vector, 'pg_catalog.simple', title, description)
+    """,
+    "UPDATE rooms_room SET search_vector = to_tsvector('pg_catalog.simple', coalesce(title, '') || ' ' || coalesce(description, ''))",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0013_report_status_time_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
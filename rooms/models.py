@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from users.models import Language
 import uuid
@@ -41,6 +42,8 @@ class Room(models.Model):
     ended_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='live', db_index=True)
     is_deleted = models.BooleanField(default=False, db_index=True)
+    # Maintained by a database trigger on PostgreSQL, see migration 0012
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         indexes = [
@@ -124,6 +127,12 @@ class ReportedRoom(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
 
+    class Meta:
+        indexes = [
+            # The moderation queue filters by status, newest first
+            models.Index(fields=['status', 'timestamp'], name='report_status_time_idx'),
+        ]
+
     def __str__(self):
         return f"Report on {self.reported_user} by {self.reported_by} in {self.room}"
 
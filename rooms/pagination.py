@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+class RoomCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id). Rooms created while a client is
+    scrolling sort ahead of its cursor, so they never shift or repeat pages.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-created_at', '-id')
+
+
+class RoomSearchPagination(PageNumberPagination):
+    """
+    Search results come in relevance order, which has no stable keyset,
+    so they are paged by number instead of by cursor.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
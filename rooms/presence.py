@@ -0,0 +1,114 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import lobby
+
+HEARTBEATS_KEY = 'rooms:heartbeats'
+REAPER_LOCK_KEY = 'rooms:reaper_lock'
+
+# Release the lock only if it still holds our token; a run that outlived the
+# TTL must not delete a lock another node has since taken
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _member(room_id, user_id):
+    return f"{room_id}:{user_id}"
+
+
+def touch_heartbeat(room_id, user_id):
+    """Record that the user's socket in this room is alive."""
+    _redis().zadd(HEARTBEATS_KEY, {_member(room_id, user_id): time.time()})
+
+
+def clear_heartbeat(room_id, user_id):
+    _redis().zrem(HEARTBEATS_KEY, _member(room_id, user_id))
+
+
+def reap_ghost_participants(now=None):
+    """
+    Close participations whose socket stopped sending heartbeats, settle them
+    as of their last heartbeat, hand the host role on and end rooms left
+    empty. A Redis lock keeps one reaper busy at a time, and the rows are
+    claimed with SKIP LOCKED so overlapping runs never settle twice.
+    Returns the number of participations closed.
+    """
+    from .models import RoomParticipant
+    from .sessions import settle_participations
+
+    redis = _redis()
+    token = uuid.uuid4().hex
+    if not redis.set(REAPER_LOCK_KEY, token, nx=True, ex=settings.ROOM_REAPER_INTERVAL_SECONDS):
+        return 0
+    try:
+        now = now or timezone.now()
+        cutoff = now - timedelta(seconds=settings.ROOM_HEARTBEAT_TIMEOUT_SECONDS)
+        candidates = list(RoomParticipant.objects.filter(
+            left_at__isnull=True, joined_at__lt=cutoff
+        ).values_list('id', 'room_id', 'user_id'))
+        if not candidates:
+            return 0
+
+        pipe = redis.pipeline()
+        for _, room_id, user_id in candidates:
+            pipe.zscore(HEARTBEATS_KEY, _member(room_id, user_id))
+        last_seen = {}
+        for (participant_id, _, _), score in zip(candidates, pipe.execute()):
+            if score is None:
+                last_seen[participant_id] = None
+            elif score < cutoff.timestamp():
+                last_seen[participant_id] = datetime.fromtimestamp(score, tz=dt_timezone.utc)
+        if not last_seen:
+            return 0
+
+        with transaction.atomic():
+            ghosts = list(RoomParticipant.objects.select_for_update(
+                skip_locked=True, of=('self',)
+            ).filter(
+                id__in=last_seen, left_at__isnull=True
+            ))
+            for participant in ghosts:
+                participant.left_at = last_seen[participant.id] or participant.joined_at
+            settle_participations(ghosts)
+            if ghosts:
+                _close_rooms({participant.room_id for participant in ghosts}, now)
+
+        if ghosts:
+            redis.zrem(HEARTBEATS_KEY, *[_member(p.room_id, p.user_id) for p in ghosts])
+        return len(ghosts)
+    finally:
+        redis.eval(RELEASE_LOCK_SCRIPT, 1, REAPER_LOCK_KEY, token)
+
+
+def _close_rooms(room_ids, now):
+    """Pass the host role on in rooms that lost their host; end rooms nobody is left in."""
+    from .models import Room, RoomParticipant
+
+    rooms = Room.objects.select_for_update().filter(id__in=room_ids, status='live')
+    for room in rooms:
+        remaining = RoomParticipant.objects.filter(room=room, left_at__isnull=True).order_by('joined_at')
+        if room.host_id and remaining.filter(user_id=room.host_id).exists():
+            continue
+        next_participant = remaining.first()
+        if next_participant:
+            room.host_id = next_participant.user_id
+            room.save(update_fields=['host'])
+            next_participant.role = 'host'
+            next_participant.save(update_fields=['role'])
+        else:
+            room.status = 'ended'
+            room.ended_at = now
+            room.save(update_fields=['status', 'ended_at'])
+            lobby.room_ended(room)
@@ -0,0 +1,42 @@
+from django.db import connection
+from django.db.models import Count, OuterRef, Q, Subquery
+from .models import Room, RoomParticipant
+
+
+def room_list_queryset(queryset=None):
+    """
+    Rooms ready for RoomSerializer: the active participant count is annotated
+    and the host's profile is joined, so serializing N rooms costs a constant
+    number of queries.
+    """
+    if queryset is None:
+        queryset = Room.objects.all()
+    return queryset.select_related(
+        'host__userprofile', 'room_type', 'language'
+    ).prefetch_related('tags').annotate(
+        active_participant_count=active_count_annotation()
+    )
+
+
+def active_count_annotation():
+    return Count('participants', filter=Q(participants__left_at__isnull=True))
+
+
+def room_members(room):
+    """
+    Each user's latest participation in the room, newest first, with the
+    user and profile joined: one query however long the room's history.
+    Postgres picks the rows with DISTINCT ON (user_id); other databases
+    match each user's latest joined_at.
+    """
+    participants = RoomParticipant.objects.filter(room=room).select_related('user__userprofile')
+    if connection.vendor == 'postgresql':
+        latest = participants.order_by('user_id', '-joined_at', '-id').distinct('user_id')
+    else:
+        latest = participants.filter(joined_at=Subquery(
+            RoomParticipant.objects.filter(room=room, user_id=OuterRef('user_id')).order_by('-joined_at').values('joined_at')[:1]
+        ))
+    members = {}
+    for participant in latest:
+        members.setdefault(participant.user_id, participant)
+    return sorted(members.values(), key=lambda participant: participant.joined_at, reverse=True)
@@ -0,0 +1,171 @@
+import json
+import logging
+from django.conf import settings
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+LIVE_ROOMS_KEY = 'rec:live_rooms'
+
+# Scoring weights; every feature is normalised to 0..1 before weighting
+LANGUAGE_WEIGHT = 3.0
+TAG_WEIGHT = 2.0
+FRIENDS_WEIGHT = 2.0
+FILL_WEIGHT = 1.0
+FRIENDS_CAP = 3
+
+
+def room_key(room_id):
+    return f"rec:room:{room_id}"
+
+
+def members_key(room_id):
+    return f"rec:room:{room_id}:members"
+
+
+def user_tags_key(user_id):
+    return f"rec:user:{user_id}:tags"
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _active_members(room_ids):
+    from .models import RoomParticipant
+    members = {room_id: set() for room_id in room_ids}
+    for room_id, user_id in RoomParticipant.objects.filter(
+        room_id__in=room_ids, left_at__isnull=True
+    ).values_list('room_id', 'user_id'):
+        members[room_id].add(user_id)
+    return members
+
+
+def sync_room_features(room_ids, rooms, track_joins=True):
+    """
+    Refresh the stored features of the given rooms. `rooms` maps id -> Room
+    (with tags prefetched) for the rooms that still exist. Users who joined
+    since the last sync get the room's tags added to their affinity.
+    """
+    live = {room_id: room for room_id, room in rooms.items() if room.status == 'live' and not room.is_deleted}
+    gone = [room_id for room_id in room_ids if room_id not in live]
+    members = _active_members(list(live))
+
+    redis = _redis()
+    pipe = redis.pipeline()
+    for room_id in live:
+        pipe.smembers(members_key(room_id))
+    previous_members = dict(zip(live, pipe.execute()))
+
+    pipe = redis.pipeline()
+    if gone:
+        pipe.srem(LIVE_ROOMS_KEY, *gone)
+        pipe.delete(*[room_key(room_id) for room_id in gone], *[members_key(room_id) for room_id in gone])
+    for room_id, room in live.items():
+        tag_ids = [tag.id for tag in room.tags.all()]
+        pipe.sadd(LIVE_ROOMS_KEY, room_id)
+        pipe.hset(room_key(room_id), mapping={
+            'language': room.language_id or 0,
+            'tags': json.dumps(tag_ids),
+            'max': room.max_participants,
+        })
+        pipe.delete(members_key(room_id))
+        if members[room_id]:
+            pipe.sadd(members_key(room_id), *members[room_id])
+        if not track_joins:
+            continue
+        joined = members[room_id] - {int(user_id) for user_id in previous_members[room_id]}
+        for user_id in joined:
+            for tag_id in tag_ids:
+                pipe.hincrby(user_tags_key(user_id), tag_id, 1)
+    pipe.execute()
+
+
+def rebuild_room_features():
+    """Rebuild the feature store for every live room, e.g. after a Redis flush."""
+    from .models import Room
+    rooms = Room.objects.filter(status='live', is_deleted=False).prefetch_related('tags').in_bulk()
+    _redis().delete(LIVE_ROOMS_KEY)
+    if rooms:
+        # Existing members are not new joins; their affinity is seeded from history
+        sync_room_features(list(rooms), rooms, track_joins=False)
+    return len(rooms)
+
+
+def _user_tag_affinity(user):
+    """Tag -> join count; seeded from participation history once per user."""
+    from .models import Room
+    redis = _redis()
+    key = user_tags_key(user.id)
+    stored = redis.hgetall(key)
+    if b'_seeded' in stored:
+        return {int(tag_id): int(count) for tag_id, count in stored.items() if tag_id != b'_seeded'}
+
+    affinity = dict(Room.objects.filter(
+        participants__user=user, tags__isnull=False
+    ).values_list('tags').annotate(joins=Count('id', distinct=True)))
+    pipe = redis.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping={'_seeded': 1, **affinity})
+    pipe.execute()
+    return affinity
+
+
+def _user_context(user):
+    from users.models import UserLanguage
+    profile = user.userprofile
+    learning = set(UserLanguage.objects.filter(
+        user_profile=profile, is_learning=True
+    ).values_list('language_id', flat=True))
+    friends = set(profile.mutual_friends_qs().values_list('user_id', flat=True))
+    return learning, friends, _user_tag_affinity(user)
+
+
+def score_room(features, members, learning, friends, affinity, top_affinity):
+    language = 1.0 if int(features[b'language']) in learning else 0.0
+    tags = json.loads(features[b'tags'])
+    tag = max((affinity.get(tag_id, 0) for tag_id in tags), default=0) / top_affinity if top_affinity else 0.0
+    friends_here = min(len(members & friends), FRIENDS_CAP) / FRIENDS_CAP
+    fill = len(members) / max(int(features[b'max']), 1)
+    return (
+        LANGUAGE_WEIGHT * language
+        + TAG_WEIGHT * tag
+        + FRIENDS_WEIGHT * friends_here
+        + FILL_WEIGHT * fill
+    )
+
+
+def recommend_room_ids(user, limit=None):
+    """
+    Live room ids ranked for `user` by learning language, tag affinity,
+    friends present and fill ratio. Rooms the user is already in and full
+    rooms are skipped.
+    """
+    limit = limit or settings.ROOM_SUGGESTION_LIMIT
+    redis = _redis()
+    if not redis.exists(LIVE_ROOMS_KEY):
+        rebuild_room_features()
+
+    room_ids = [int(room_id) for room_id in redis.smembers(LIVE_ROOMS_KEY)]
+    if not room_ids:
+        return []
+    pipe = redis.pipeline()
+    for room_id in room_ids:
+        pipe.hgetall(room_key(room_id))
+        pipe.smembers(members_key(room_id))
+    results = pipe.execute()
+
+    learning, friends, affinity = _user_context(user)
+    top_affinity = max(affinity.values(), default=0)
+    scored = []
+    for index, room_id in enumerate(room_ids):
+        features, members = results[2 * index], {int(user_id) for user_id in results[2 * index + 1]}
+        if not features or user.id in members:
+            continue
+        if len(members) >= int(features[b'max']):
+            continue
+        score = score_room(features, members, learning, friends, affinity, top_affinity)
+        scored.append((score, room_id))
+    scored.sort(reverse=True)
+    return [room_id for _, room_id in scored[:limit]]
@@ -0,0 +1,10 @@
+from backend.search import text_search
+
+
+def search_rooms(queryset, term, rank=False):
+    """
+    Rooms whose title or description matches `term`, either as a substring
+    or as a full-text query against search_vector. With rank=True title
+    matches sort ahead of description-only ones.
+    """
+    return text_search(queryset, term, ['title', 'description'], vector_field='search_vector', rank=rank)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.utils import timezone
 from .models import Room, RoomParticipant, Message, Tag, RoomType,ReportedRoom
 from users.models import Language
 
@@ -65,6 +66,9 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['host', 'created_at', 'started_at']
     
     def get_participant_count(self, obj):
+        # annotated by rooms.queries.room_list_queryset
+        if hasattr(obj, 'active_participant_count'):
+            return obj.active_participant_count
         return obj.participants.filter(left_at__isnull=True).count()
     
     def get_host_avatar(self, obj):
@@ -84,9 +88,15 @@ class CreateRoomSerializer(serializers.ModelSerializer):
         model = Room
         fields = [
             'title', 'description', 'room_type', 'language',
-            'tag_ids', 'max_participants', 'is_private', 'password'
+            'tag_ids', 'max_participants', 'is_private', 'password', 'started_at'
         ]
+        extra_kwargs = {'started_at': {'required': False}}
     
+    def validate_started_at(self, value):
+        if value and value <= timezone.now():
+            raise serializers.ValidationError("Scheduled start must be in the future")
+        return value
+
     def validate_max_participants(self, value):
         if value < 2 or value > 10:
             raise serializers.ValidationError("Max participants must be between 2 and 10")
@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.utils import timezone
+from users.models import XPEvent
+from users.xp import record_events
+from . import lobby
+from .models import RoomParticipant
+
+
+def session_minutes(joined_at, left_at):
+    """Sessions count for at least one minute."""
+    return max(1, int((left_at - joined_at).total_seconds() // 60))
+
+
+def settle_participations(participants, left_at=None):
+    """
+    Close the given participations and record each session in the XP
+    ledger. A participant whose left_at is already set on the instance is
+    closed at that time, the rest at `left_at` (default now). Rows that were
+    closed concurrently are skipped, so settling twice is harmless.
+
+    Profiles and daily activity are updated by the ledger aggregator, so a
+    leave costs one bulk update and one insert and never locks a profile.
+    Returns the settled participants.
+    """
+    left_at = left_at or timezone.now()
+    requested = {participant.id: participant.left_at or left_at for participant in participants}
+    if not requested:
+        return []
+
+    with transaction.atomic():
+        settled = list(RoomParticipant.objects.select_for_update(of=('self',)).filter(
+            id__in=requested, left_at__isnull=True
+        ))
+        if not settled:
+            return []
+        for participant in settled:
+            participant.left_at = requested[participant.id]
+        RoomParticipant.objects.bulk_update(settled, ['left_at'])
+
+        record_events([
+            XPEvent(
+                user_id=participant.user_id,
+                kind=XPEvent.Kind.ROOM_SESSION,
+                minutes=session_minutes(participant.joined_at, participant.left_at),
+                sessions=1,
+                reference=f"participant:{participant.id}:{participant.left_at.timestamp()}",
+                occurred_at=participant.left_at,
+            )
+            for participant in settled
+        ])
+
+    for room_id in {participant.room_id for participant in settled}:
+        lobby.participants_changed(room_id)
+    return settled
+
+
+def settle_participation(participant, left_at=None):
+    """Settle a single leave. Returns the minutes recorded, or 0 if it was already closed."""
+    settled = settle_participations([participant], left_at)
+    if not settled:
+        return 0
+    participant.left_at = settled[0].left_at
+    return session_minutes(participant.joined_at, participant.left_at)
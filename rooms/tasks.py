@@ -0,0 +1,30 @@
+import logging
+from celery import shared_task
+from .lobby import flush_deltas
+from .presence import reap_ghost_participants
+from .lifecycle import run_lifecycle
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def flush_lobby_deltas_task():
+    """Push the changes coalesced during the last lobby tick to subscribers."""
+    flushed = flush_deltas()
+    if flushed:
+        logger.debug("Pushed lobby deltas for %d rooms", flushed)
+
+
+@shared_task
+def reap_ghost_participants_task():
+    """Close participations whose socket stopped sending heartbeats."""
+    reaped = reap_ghost_participants()
+    if reaped:
+        logger.info("Reaped %d ghost participants", reaped)
+
+
+@shared_task
+def room_lifecycle_task():
+    """Activate due scheduled rooms and end rooms that have sat empty."""
+    activated, ended = run_lifecycle()
+    if activated or ended:
+        logger.info("Room lifecycle: %d activated, %d ended", activated, ended)
@@ -1,3 +1,296 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from unittest import mock
+import fakeredis
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import CustomUser, Language, Notification, XPEvent
+from users.xp import XP_PER_MINUTE, aggregate_pending
+from . import presence
+from .consumers import RoomConsumer
+from .lifecycle import end_idle_rooms, run_lifecycle
+from .models import Room, RoomParticipant, RoomType, Tag, UserActivity
+from .search import search_rooms
+from .sessions import settle_participation, settle_participations
 
-# Create your tests here.
+
+class LobbyQueryTests(TestCase):
+    """The lobby lists cost the same number of queries however many rooms are live."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create(username='viewer', email='viewer@example.com')
+        cls.language = Language.objects.create(name='English', code='en')
+        cls.room_type = RoomType.objects.create(name='Casual')
+        cls.tags = [Tag.objects.create(name='travel'), Tag.objects.create(name='music')]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def create_rooms(self, count):
+        existing = Room.objects.count()
+        for n in range(existing, existing + count):
+            host = CustomUser.objects.create(username=f"host{n}", email=f"host{n}@example.com")
+            room = Room.objects.create(
+                host=host if n % 2 else self.viewer, title=f"Room {n}",
+                language=self.language, room_type=self.room_type,
+            )
+            room.tags.set(self.tags)
+            RoomParticipant.objects.create(room=room, user=host, role='host')
+            for m in range(2):
+                guest = CustomUser.objects.create(username=f"guest{n}_{m}", email=f"guest{n}_{m}@example.com")
+                RoomParticipant.objects.create(room=room, user=guest)
+
+    def assert_constant_queries(self, path, expected):
+        for total in (1, 6):
+            self.create_rooms(total - Room.objects.count())
+            with self.assertNumQueries(expected):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['results'])
+            self.assertTrue(all(room['participant_count'] == 3 for room in response.data['results']))
+
+    def test_live_rooms_queries(self):
+        # rooms with joined host profile, type and language, then their tags
+        self.assert_constant_queries('/api/rooms/live/', 2)
+
+    def test_my_rooms_queries(self):
+        self.assert_constant_queries('/api/rooms/my-rooms/', 2)
+
+
+class RoomSearchTests(TestCase):
+    def setUp(self):
+        self.host = CustomUser.objects.create(username='host', email='host@example.com')
+        self.title_match = Room.objects.create(host=self.host, title='Salsa night', description='Dance and chat')
+        # Newer, so it would come first in the plain lobby order
+        self.description_match = Room.objects.create(host=self.host, title='Friday hangout', description='We talk about salsa')
+        Room.objects.create(host=self.host, title='Book club', description='Novels only')
+
+    def test_title_match_ranks_above_description_match(self):
+        ranked = search_rooms(Room.objects.order_by('-created_at', '-id'), 'salsa', rank=True)
+        self.assertEqual(list(ranked), [self.title_match, self.description_match])
+
+    def test_lobby_search_is_ranked(self):
+        client = APIClient()
+        client.force_authenticate(self.host)
+        response = client.get('/api/rooms/live/', {'search': 'salsa'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['id'] for room in response.data['results']], [self.title_match.id, self.description_match.id])
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    ROOM_HEARTBEAT_TIMEOUT_SECONDS=90,
+)
+class GhostReaperTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('django_redis.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        self.host = CustomUser.objects.create(username='host', email='host@example.com')
+        self.guest = CustomUser.objects.create(username='guest', email='guest@example.com')
+        self.room = Room.objects.create(host=self.host, title='Evening chat')
+
+    def join(self, user, seconds_ago, heartbeat_seconds_ago=None, role='participant'):
+        participant = RoomParticipant.objects.create(room=self.room, user=user, role=role)
+        RoomParticipant.objects.filter(id=participant.id).update(joined_at=self.now - timedelta(seconds=seconds_ago))
+        if heartbeat_seconds_ago is not None:
+            self.redis.zadd(presence.HEARTBEATS_KEY, {
+                f"{self.room.id}:{user.id}": (self.now - timedelta(seconds=heartbeat_seconds_ago)).timestamp()
+            })
+        participant.refresh_from_db()
+        return participant
+
+    def reap(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return presence.reap_ghost_participants(now=self.now)
+
+    def test_lock_held_elsewhere_skips_the_run(self):
+        ghost = self.join(self.guest, 600, heartbeat_seconds_ago=300)
+        self.redis.set(presence.REAPER_LOCK_KEY, 'other-node')
+        self.assertEqual(self.reap(), 0)
+        self.assertEqual(self.redis.get(presence.REAPER_LOCK_KEY), b'other-node')
+        ghost.refresh_from_db()
+        self.assertIsNone(ghost.left_at)
+
+    def test_lock_is_released_after_the_run(self):
+        self.join(self.guest, 600, heartbeat_seconds_ago=300)
+        self.assertEqual(self.reap(), 1)
+        self.assertIsNone(self.redis.get(presence.REAPER_LOCK_KEY))
+
+    def test_lock_taken_over_mid_run_is_left_alone(self):
+        self.join(self.guest, 600, heartbeat_seconds_ago=300)
+
+        def lock_expires_and_another_node_takes_it(*args):
+            self.redis.set(presence.REAPER_LOCK_KEY, 'other-node')
+
+        with mock.patch('rooms.presence._close_rooms', side_effect=lock_expires_and_another_node_takes_it):
+            self.assertEqual(self.reap(), 1)
+        self.assertEqual(self.redis.get(presence.REAPER_LOCK_KEY), b'other-node')
+
+    def test_recent_join_without_heartbeat_is_in_grace(self):
+        newcomer = self.join(self.guest, 30)
+        self.assertEqual(self.reap(), 0)
+        newcomer.refresh_from_db()
+        self.assertIsNone(newcomer.left_at)
+
+    @override_settings(ROOM_HEARTBEAT_INTERVAL_SECONDS=0.01)
+    def test_keepalive_holds_pre_heartbeat_client(self):
+        # Connected long ago and never sends heartbeat frames
+        participant = self.join(self.guest, 600)
+        consumer = RoomConsumer()
+        consumer.room_id, consumer.user, consumer.last_heartbeat = self.room.id, self.guest, 0
+
+        async def run_keepalive():
+            task = asyncio.create_task(consumer.keep_alive())
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        async_to_sync(run_keepalive)()
+        self.assertIsNotNone(self.redis.zscore(presence.HEARTBEATS_KEY, f"{self.room.id}:{self.guest.id}"))
+        self.assertEqual(self.reap(), 0)
+        participant.refresh_from_db()
+        self.assertIsNone(participant.left_at)
+
+    def test_ghost_is_settled_at_last_heartbeat(self):
+        self.join(self.host, 600, heartbeat_seconds_ago=5, role='host')
+        ghost = self.join(self.guest, 600, heartbeat_seconds_ago=300)
+        self.assertEqual(self.reap(), 1)
+        ghost.refresh_from_db()
+        self.assertAlmostEqual(ghost.left_at.timestamp(), (self.now - timedelta(seconds=300)).timestamp(), places=3)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.status, 'live')
+
+    def test_host_role_passes_to_remaining_participant(self):
+        self.join(self.host, 600, heartbeat_seconds_ago=300, role='host')
+        guest = self.join(self.guest, 500, heartbeat_seconds_ago=5)
+        self.assertEqual(self.reap(), 1)
+        self.room.refresh_from_db()
+        guest.refresh_from_db()
+        self.assertEqual((self.room.status, self.room.host_id, guest.role), ('live', self.guest.id, 'host'))
+
+    def test_room_ends_when_last_participant_is_reaped(self):
+        self.join(self.host, 600, heartbeat_seconds_ago=300, role='host')
+        self.join(self.guest, 600, heartbeat_seconds_ago=200)
+        self.assertEqual(self.reap(), 2)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.status, 'ended')
+        self.assertEqual(self.room.ended_at, self.now)
+        self.assertEqual(self.redis.zcard(presence.HEARTBEATS_KEY), 0)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    ROOM_IDLE_GRACE_SECONDS=300,
+)
+class RoomLifecycleTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('django_redis.get_redis_connection', return_value=fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        self.host = CustomUser.objects.create(username='host', email='host@example.com')
+
+    def room(self, title, **fields):
+        return Room.objects.create(host=self.host, title=title, **fields)
+
+    def test_only_due_rooms_are_activated(self):
+        due = self.room('Due', status='scheduled', started_at=self.now - timedelta(minutes=1))
+        future = self.room('Later', status='scheduled', started_at=self.now + timedelta(hours=1))
+        deleted = self.room('Deleted', status='scheduled', started_at=self.now - timedelta(minutes=1), is_deleted=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_lifecycle(self.now), (1, 0))
+        statuses = dict(Room.objects.filter(id__in=[due.id, future.id, deleted.id]).values_list('id', 'status'))
+        self.assertEqual(statuses, {due.id: 'live', future.id: 'scheduled', deleted.id: 'scheduled'})
+
+    def test_room_with_active_participant_is_not_idle(self):
+        long_ago = self.now - timedelta(hours=2)
+        occupied = self.room('Occupied', started_at=long_ago)
+        RoomParticipant.objects.create(room=occupied, user=self.host, role='host')
+        idle = self.room('Idle', started_at=long_ago)
+        participant = RoomParticipant.objects.create(room=idle, user=self.host, left_at=self.now - timedelta(minutes=10))
+        recently_left = self.room('Recently left', started_at=long_ago)
+        RoomParticipant.objects.create(room=recently_left, user=self.host, left_at=self.now - timedelta(minutes=1))
+        RoomParticipant.objects.filter(id=participant.id).update(joined_at=long_ago)
+
+        self.assertEqual(end_idle_rooms(self.now), 1)
+        statuses = dict(Room.objects.values_list('title', 'status'))
+        self.assertEqual(statuses, {'Occupied': 'live', 'Idle': 'ended', 'Recently left': 'live'})
+
+    def test_going_live_notifies_each_follower_once(self):
+        followers = [CustomUser.objects.create(username=f"fan{n}", email=f"fan{n}@example.com") for n in range(3)]
+        for follower in followers:
+            follower.userprofile.follow_user(self.host.userprofile)
+        # Opted out of room notifications
+        followers[2].usersettings.room_interest_notifications = False
+        followers[2].usersettings.save()
+        bystander = CustomUser.objects.create(username='bystander', email='bystander@example.com')
+
+        room = self.room('Going live', status='scheduled', started_at=self.now - timedelta(seconds=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            run_lifecycle(self.now)
+
+        notified = list(Notification.objects.filter(related_room=room).values_list('user_id', flat=True))
+        self.assertCountEqual(notified, [followers[0].id, followers[1].id])
+        self.assertFalse(Notification.objects.filter(user=bystander).exists())
+        self.assertTrue(all(
+            n.type == Notification.NotificationType.ROOM_LIVE for n in Notification.objects.filter(related_room=room)
+        ))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class SessionSettlementTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('django_redis.get_redis_connection', return_value=fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        self.host = CustomUser.objects.create(username='host', email='host@example.com')
+        self.room = Room.objects.create(host=self.host, title='Practice')
+
+    def join(self, user, minutes_ago):
+        participant = RoomParticipant.objects.create(room=self.room, user=user)
+        RoomParticipant.objects.filter(id=participant.id).update(joined_at=self.now - timedelta(minutes=minutes_ago))
+        return RoomParticipant.objects.get(id=participant.id)
+
+    def assert_totals(self, user, minutes, sessions):
+        profile = user.userprofile
+        profile.refresh_from_db()
+        self.assertEqual(profile.xp, minutes * XP_PER_MINUTE)
+        self.assertEqual(profile.total_speak_time, timedelta(minutes=minutes))
+        self.assertEqual(profile.total_rooms_joined, sessions)
+        activity = UserActivity.objects.get(user=user)
+        self.assertEqual((activity.xp_earned, activity.practice_minutes), (minutes * XP_PER_MINUTE, minutes))
+
+    def test_settling_twice_counts_once(self):
+        participant = self.join(self.host, 30)
+        # Two leave paths holding the same open row, e.g. the socket and the reaper
+        stale = RoomParticipant.objects.get(id=participant.id)
+        self.assertEqual(settle_participation(participant, left_at=self.now), 30)
+        self.assertEqual(settle_participation(stale, left_at=self.now), 0)
+        self.assertEqual(settle_participations([stale], left_at=self.now), [])
+
+        self.assertEqual(XPEvent.objects.filter(user=self.host).count(), 1)
+        self.assertEqual(aggregate_pending(), 1)
+        self.assert_totals(self.host, minutes=30, sessions=1)
+
+    def test_concurrent_participants_are_settled_separately(self):
+        guest = CustomUser.objects.create(username='guest', email='guest@example.com')
+        host_participant = self.join(self.host, 20)
+        guest_participant = self.join(guest, 10)
+        stale_guest = RoomParticipant.objects.get(id=guest_participant.id)
+
+        settled = settle_participations([host_participant, guest_participant], left_at=self.now)
+        self.assertEqual(len(settled), 2)
+        # A second leave of one of them, racing the first, changes nothing
+        self.assertEqual(settle_participations([stale_guest], left_at=self.now), [])
+        self.assertFalse(RoomParticipant.objects.filter(room=self.room, left_at__isnull=True).exists())
+
+        self.assertEqual(aggregate_pending(), 2)
+        self.assert_totals(self.host, minutes=20, sessions=1)
+        self.assert_totals(guest, minutes=10, sessions=1)
@@ -8,17 +8,24 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Max
 from django.core.exceptions import ValidationError
 from rest_framework.exceptions import ValidationError as DRFValidationError
-from .models import Room, RoomParticipant, Message, Tag, RoomType,UserActivity
+from .models import Room, RoomParticipant, Message, Tag, RoomType
 from .serializers import (
     RoomSerializer, CreateRoomSerializer, RoomParticipantSerializer,
     MessageSerializer, TagSerializer, RoomTypeSerializer,ReportedRoomSerializer,
     EditRoomSerializer
 
 )
-from datetime import timedelta
+from .queries import room_list_queryset
+from .pagination import RoomCursorPagination, RoomSearchPagination
+from .search import search_rooms
+from .recommendations import recommend_room_ids
+from .sessions import settle_participation
+from . import lobby
+from adminapp import activity
+from adminapp.models import ActivityEvent
 import logging
 logger = logging.getLogger(__name__)
 
@@ -30,14 +37,23 @@ class LiveRoomsListView(generics.ListAPIView):
     """
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RoomCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            # ranked search results can't be paged by the created_at cursor
+            searching = bool(self.request.query_params.get('search'))
+            self._paginator = RoomSearchPagination() if searching else self.pagination_class()
+        return self._paginator
     
     def get_queryset(self):
         logger.info(f"Fetching live rooms for user %s",self.request.user)
-        queryset = Room.objects.filter(
+        queryset = room_list_queryset(Room.objects.filter(
             status='live',
             # is_private=False,
             is_deleted=False
-        ).select_related('host', 'room_type', 'language').prefetch_related('tags')
+        ))
         
         # Filter by language if provided
         language = self.request.query_params.get('language')
@@ -49,14 +65,14 @@ class LiveRoomsListView(generics.ListAPIView):
         if room_type:
             queryset = queryset.filter(room_type_id=room_type)
         
-        # Search by title
+        queryset = queryset.order_by('-created_at', '-id')
+
+        # Search by title or description, best matches first
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
-            )
+            queryset = search_rooms(queryset, search, rank=True)
         
-        return queryset.order_by('-created_at')
+        return queryset
 
 
 
@@ -64,12 +80,19 @@ class CreateRoomView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        if RoomParticipant.objects.filter(user=request.user, left_at__isnull=True).exists():
-            return Response({'error': 'Leave your current room first.'}, status=403)
-
         create_serializer = CreateRoomSerializer(data=request.data)
         create_serializer.is_valid(raise_exception=True)
 
+        # A future started_at schedules the room; the lifecycle task opens it
+        if create_serializer.validated_data.get('started_at'):
+            room = create_serializer.save(host=request.user, status='scheduled')
+            activity.record(ActivityEvent.Kind.ROOM_CREATED, request.user, room.title)
+            response_serializer = RoomSerializer(room_list_queryset().get(id=room.id))
+            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+        if RoomParticipant.objects.filter(user=request.user, left_at__isnull=True).exists():
+            return Response({'error': 'Leave your current room first.'}, status=403)
+
         # Save Room with additional fields
         room = create_serializer.save(
             host=request.user,
@@ -83,10 +106,11 @@ class CreateRoomView(APIView):
             room=room,
             defaults={'role': 'host'}
         )
-
+        lobby.room_created(room)
+        activity.record(ActivityEvent.Kind.ROOM_CREATED, request.user, room.title)
 
         # Now return the full room data
-        response_serializer = RoomSerializer(room)
+        response_serializer = RoomSerializer(room_list_queryset().get(id=room.id))
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 class EditRoomView(generics.UpdateAPIView):
@@ -103,11 +127,13 @@ class EditRoomView(generics.UpdateAPIView):
         is_private = self.request.data.get('is_private', None)
         if is_private and not user.userprofile.is_premium:
             raise DRFValidationError("Only premium users can create private rooms")
-        serializer.save()
+        previous = (serializer.instance.language_id, serializer.instance.room_type_id)
+        room = serializer.save()
+        lobby.room_updated(room, previous)
 
     def patch(self, request, *args, **kwargs):
         response = super().patch(request, *args, **kwargs)
-        room = self.get_object()
+        room = get_object_or_404(room_list_queryset(), id=self.kwargs['room_id'], host=request.user)
         return Response(RoomSerializer(room).data)
 
 
@@ -120,7 +146,7 @@ class RoomDetailView(generics.RetrieveAPIView):
     
     def get_object(self):
         room_id = self.kwargs['room_id']
-        return get_object_or_404(Room, id=room_id, status='live')
+        return get_object_or_404(room_list_queryset(), id=room_id, status='live')
 
 class JoinRoomView(APIView):
     permission_classes = [IsAuthenticated]
@@ -151,6 +177,7 @@ class JoinRoomView(APIView):
         if not created:
             participant.left_at = None  # Reset left_at to "rejoin"
             participant.save()
+        lobby.participants_changed(room.id)
 
         return Response({'message': 'Joined room successfully'}, status=200)
 
@@ -161,12 +188,15 @@ class RecentlyJoinedRoomsView(APIView):
     def get(self, request):
         user = request.user
 
-        participants = RoomParticipant.objects.filter(
+        room_ids = list(RoomParticipant.objects.filter(
             user=user,
             room__status='live',
             room__is_deleted=False
-        ).order_by('-joined_at')[:3]
-        rooms = [p.room for p in participants]
+        ).values('room_id').annotate(
+            last_joined=Max('joined_at')
+        ).order_by('-last_joined').values_list('room_id', flat=True)[:3])
+        rooms_by_id = room_list_queryset(Room.objects.filter(id__in=room_ids)).in_bulk()
+        rooms = [rooms_by_id[room_id] for room_id in room_ids if room_id in rooms_by_id]
         serializer = RoomSerializer(rooms, many=True)
         return Response(serializer.data)
 
@@ -176,15 +206,9 @@ class SuggestedRoomsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        # Exclude rooms the user is already a participant in
-        joined_room_ids = RoomParticipant.objects.filter(
-            user=user
-            ).values_list('room_id', flat=True)
-        rooms = Room.objects.filter(
-            status='live',
-            is_deleted=False
-        ).exclude(id__in=joined_room_ids).order_by('-created_at')[:5]
+        room_ids = recommend_room_ids(request.user)
+        rooms_by_id = room_list_queryset(Room.objects.filter(id__in=room_ids)).in_bulk()
+        rooms = [rooms_by_id[room_id] for room_id in room_ids if room_id in rooms_by_id]
         serializer = RoomSerializer(rooms, many=True)
         return Response(serializer.data)
 
@@ -202,35 +226,8 @@ class LeaveRoomView(generics.CreateAPIView):
                 left_at__isnull=True
             )
             logger.info("RoomParticipant found for user %s in room %s", request.user, room_id)
-            now = timezone.now()
-            participant.left_at = now
-            participant.save()
-            logger.debug("Participant left_at updated for user %s in room %s", request.user, room_id)
-
-            # Calculate session duration
-            session_duration = (participant.left_at - participant.joined_at)
-            minutes = int(session_duration.total_seconds() // 60)
-            if minutes < 1:
-                minutes = 1
-            logger.debug("Session duration for user %s in room %s: %d minutes", request.user, room_id, minutes)
-
-            # Update user profile
-            profile = request.user.userprofile
-            profile.total_speak_time = (profile.total_speak_time or timedelta()) + timedelta(minutes=minutes)
-            profile.xp += minutes * 20
-            profile.level = profile.xp // 1000 + 1
-            profile.total_rooms_joined += 1
-            profile.save()
-            logger.info("User profile updated for user %s after leaving room %s", request.user, room_id)
-
-            # Log daily activity for streaks and stats
-            today = now.date()
-            activity, _ = UserActivity.objects.get_or_create(user=request.user, date=today)
-            activity.xp_earned += minutes * 20
-            activity.practice_minutes += minutes
-            logger.debug("UserActivity updated: XP=%d, Minutes=%d for user %s on %s", activity.xp_earned, activity.practice_minutes, request.user, today)
-            activity.save()
-            logger.info("User %s successfully left room %s and stats updated", request.user, room_id)
+            minutes = settle_participation(participant)
+            logger.info("User %s successfully left room %s after %d minutes, stats updated", request.user, room_id, minutes)
 
             return Response({'message': 'Left room, stats updated.'})
         except RoomParticipant.DoesNotExist:
@@ -274,11 +271,19 @@ class MyRoomsView(generics.ListAPIView):
     """
     serializer_class = RoomSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RoomCursorPagination
     
     def get_queryset(self):
-        return Room.objects.filter(
+        queryset = room_list_queryset(Room.objects.filter(
             host=self.request.user
-        ).order_by('-created_at')
+        ))
+
+        # Filter by status (live/ended/scheduled) if provided
+        status_param = self.request.query_params.get('status')
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+
+        return queryset.order_by('-created_at', '-id')
 
 class EndRoomView(generics.UpdateAPIView):
     """
@@ -298,6 +303,7 @@ class EndRoomView(generics.UpdateAPIView):
         room.status = 'ended'
         room.ended_at = timezone.now()
         room.save()
+        lobby.room_ended(room)
         
         return Response(
             {'message': 'Room ended successfully'},
@@ -346,4 +352,5 @@ class ReportUserView(generics.CreateAPIView):
             reported_user=reported_user,  # Use the User object, not ID
             status='pending'
         )
+        activity.record(ActivityEvent.Kind.ROOM_REPORTED, self.request.user, f'message in {room.title}')
 
@@ -1,5 +1,7 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from .moderation import is_revoked
 from django.contrib.auth.models import AnonymousUser
 import logging
 
@@ -33,4 +35,10 @@ class CookieJWTAuthentication(JWTAuthentication):
         except Exception as e:
             logger.info(f"Cookie auth failed: {e}")
             return None
-        
\ No newline at end of file
+
+    def get_user(self, validated_token):
+        # Covers both the header and the cookie path; checked before the user lookup
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and is_revoked(user_id):
+            raise AuthenticationFailed("User is banned", code="user_revoked")
+        return super().get_user(validated_token)
@@ -0,0 +1,98 @@
+import os
+import uuid
+import logging
+from io import BytesIO
+from pathlib import Path
+from PIL import Image, ImageOps
+import cloudinary.uploader
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZE = (200, 200)
+# Bias the crop towards the upper part of the frame, where faces usually are
+AVATAR_CENTERING = (0.5, 0.35)
+
+
+def stage_avatar_upload(file):
+    """
+    Write the raw upload to the staging area and return its path.
+    The staging directory must be shared by the web and celery workers.
+    """
+    staging_dir = Path(settings.AVATAR_STAGING_DIR)
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    ext = os.path.splitext(getattr(file, 'name', '') or '')[1].lower() or '.img'
+    path = staging_dir / f"{uuid.uuid4().hex}{ext}"
+    with open(path, 'wb') as out:
+        for chunk in file.chunks():
+            out.write(chunk)
+    return str(path)
+
+
+def discard_staged_avatar(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def render_avatar(path):
+    """
+    Resize and crop the staged image to the 200x200 avatar and return JPEG bytes.
+    Raises ValueError if the file is not a readable image.
+    """
+    try:
+        with Image.open(path) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+            avatar = ImageOps.fit(image, AVATAR_SIZE, Image.LANCZOS, centering=AVATAR_CENTERING)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable avatar image: {e}")
+
+    buffer = BytesIO()
+    avatar.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class CloudinaryAvatarStorage:
+    """Uploads the already processed avatar to Cloudinary."""
+
+    folder = 'avatars'
+
+    def save(self, name, content):
+        response = cloudinary.uploader.upload(
+            BytesIO(content),
+            folder=self.folder,
+            public_id=name,
+            overwrite=True,
+            resource_type='image',
+        )
+        url = response.get('secure_url')
+        if not url:
+            raise RuntimeError("Cloudinary upload returned no URL")
+        return url
+
+    def delete(self, name):
+        cloudinary.uploader.destroy(f"{self.folder}/{name}", resource_type='image')
+
+
+class LocalAvatarStorage:
+    """Filesystem stand-in for development, tests and offline benchmarks."""
+
+    def save(self, name, content):
+        avatar_dir = Path(settings.MEDIA_ROOT) / 'avatars'
+        avatar_dir.mkdir(parents=True, exist_ok=True)
+        with open(avatar_dir / f"{name}.jpg", 'wb') as out:
+            out.write(content)
+        return f"{settings.MEDIA_URL}avatars/{name}.jpg"
+
+    def delete(self, name):
+        try:
+            os.remove(Path(settings.MEDIA_ROOT) / 'avatars' / f"{name}.jpg")
+        except FileNotFoundError:
+            pass
+
+
+def get_avatar_storage():
+    return import_string(settings.AVATAR_STORAGE_BACKEND)()
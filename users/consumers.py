@@ -3,10 +3,11 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 import logging
+from .moderation import UserControlMixin
 
 logger = logging.getLogger(__name__)
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(UserControlMixin, AsyncWebsocketConsumer):
     async def connect(self):
         from django.contrib.auth.models import AnonymousUser
         # Check if user is authenticated
@@ -22,6 +23,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.user_group_name,
             self.channel_name
         )
+        await self.join_control_group()
         await self.accept()
 
         # Update online status
@@ -35,6 +37,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.user_group_name,
                 self.channel_name
             )
+            await self.leave_control_group()
         logger.info(f"Chat WebSocket disconnected for user {getattr(self, 'user', 'unknown')}")
     
     async def receive(self, text_data):
@@ -333,7 +336,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(UserControlMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # Check if user is authenticated
         from django.contrib.auth.models import AnonymousUser
@@ -349,6 +352,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.user_group_name,
             self.channel_name
         )
+        await self.join_control_group()
         await self.accept()
         
         logger.info(f"Notification WebSocket connected for user {self.user.username}")
@@ -359,6 +363,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.user_group_name,
                 self.channel_name
             )
+            await self.leave_control_group()
         logger.info(f"Notification WebSocket disconnected for user {getattr(self, 'user', 'unknown')}")
     
     async def receive(self, text_data):
@@ -0,0 +1,135 @@
+import re
+import json
+import time
+import logging
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from google.auth import jwt
+from google.auth.transport import requests
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+CERTS_CACHE_KEY = 'google_oauth2_certs'
+DEFAULT_MAX_AGE = 60 * 60
+# Refresh in the background once less than this many seconds are left
+REFRESH_MARGIN = 5 * 60
+
+
+class GoogleCertsUnavailable(Exception):
+    """Google's signing certificates could not be fetched and none are cached."""
+
+
+def _parse_max_age(cache_control):
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens against locally cached signing certificates.
+    Certificates are kept in process and in the shared cache for as long as
+    Google's Cache-Control max-age allows, and refreshed in a background
+    thread shortly before they expire, so steady-state logins make no
+    outbound HTTP calls.
+    """
+
+    def __init__(self, client_id, certs_file=None):
+        if not client_id:
+            raise ImproperlyConfigured("GOOGLE_CLIENT_ID must be set to verify Google ID tokens")
+        self.client_id = client_id
+        self.certs_file = certs_file
+        self._certs = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def verify(self, token):
+        """Return the verified claims, raising ValueError for an invalid token."""
+        claims = jwt.decode(token, certs=self.get_certs(), audience=self.client_id)
+        if claims.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {claims.get('iss')}")
+        return claims
+
+    def get_certs(self):
+        now = time.time()
+        if self._certs is None or now >= self._expires_at:
+            with self._lock:
+                if self._certs is None or time.time() >= self._expires_at:
+                    self._load_certs()
+        elif self._expires_at - now < REFRESH_MARGIN:
+            self._refresh_in_background()
+        return self._certs
+
+    def _load_certs(self):
+        if self.certs_file:
+            with open(self.certs_file) as f:
+                self._certs = json.load(f)
+            self._expires_at = float('inf')
+            return
+
+        cached = cache.get(CERTS_CACHE_KEY)
+        if cached and cached['expires_at'] > time.time():
+            self._certs = cached['certs']
+            self._expires_at = cached['expires_at']
+            return
+
+        try:
+            self._fetch_certs()
+        except Exception as e:
+            logger.error("Fetching Google certificates failed: %s", e)
+            if self._certs is None:
+                raise GoogleCertsUnavailable(str(e))
+            # keep serving the previous certificates and retry a little later
+            self._expires_at = time.time() + 60
+
+    def _fetch_certs(self):
+        response = requests.Request()(GOOGLE_CERTS_URL, method='GET')
+        if response.status != 200:
+            raise GoogleCertsUnavailable(f"Google certs endpoint returned {response.status}")
+        certs = json.loads(response.data.decode('utf-8'))
+        max_age = _parse_max_age(response.headers.get('cache-control'))
+        expires_at = time.time() + max_age
+
+        cache.set(CERTS_CACHE_KEY, {'certs': certs, 'expires_at': expires_at}, timeout=max_age)
+        self._certs = certs
+        self._expires_at = expires_at
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or self.certs_file:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self._lock:
+                    # another worker may already have refreshed the shared copy
+                    cached = cache.get(CERTS_CACHE_KEY)
+                    if cached and cached['expires_at'] - time.time() > REFRESH_MARGIN:
+                        self._certs = cached['certs']
+                        self._expires_at = cached['expires_at']
+                    else:
+                        self._fetch_certs()
+            except Exception as e:
+                logger.warning("Background refresh of Google certificates failed: %s", e)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+_verifier = None
+
+
+def get_google_token_verifier():
+    global _verifier
+    if _verifier is None:
+        _verifier = GoogleTokenVerifier(
+            client_id=settings.GOOGLE_CLIENT_ID,
+            certs_file=settings.GOOGLE_CERTS_FILE,
+        )
+    return _verifier
@@ -0,0 +1,224 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+ALL_TIME = 'all'
+WEEKLY = 'week'
+DAILY = 'day'
+WINDOWS = (ALL_TIME, WEEKLY, DAILY)
+
+# Windowed boards stay readable a little past their period, then expire
+WINDOW_TTL = {
+    WEEKLY: 14 * 24 * 3600,
+    DAILY: 2 * 24 * 3600,
+}
+
+REBUILD_CHUNK_SIZE = 10000
+
+
+def current_day():
+    # Activity dates are UTC dates, see users.xp
+    return timezone.now().date()
+
+
+def board_key(window, language_id=None, day=None):
+    scope = f"lang:{language_id}:" if language_id else ''
+    if window == ALL_TIME:
+        return f"lb:{scope}all"
+    day = day or current_day()
+    if window == WEEKLY:
+        year, week, _ = day.isocalendar()
+        return f"lb:{scope}week:{year}-{week:02d}"
+    if window == DAILY:
+        return f"lb:{scope}day:{day.isoformat()}"
+    raise ValueError(f"Unknown leaderboard window: {window}")
+
+
+class BaseLeaderboard:
+    """
+    XP leaderboards as sorted sets: all-time, ISO week and day windows, each
+    overall and per learning language. Members are user ids, scores are XP.
+    Backends provide the sorted-set primitives.
+    """
+
+    def _increment(self, increments, ttls):
+        """Apply (key, user_id, amount) increments and set the given key TTLs."""
+        raise NotImplementedError
+
+    def _replace(self, key, scores, ttl=None):
+        """Atomically swap `key` for a board built from a list of (user_id, score)."""
+        raise NotImplementedError
+
+    def _range(self, key, start, stop):
+        """Members by descending score, as (user_id, score), inclusive bounds."""
+        raise NotImplementedError
+
+    def _rank(self, key, user_id):
+        """0-based descending rank and score, or (None, None)."""
+        raise NotImplementedError
+
+    def record(self, per_user, per_day, languages):
+        """
+        Add XP to the boards. `per_user` maps user_id -> XP for the all-time
+        boards, `per_day` maps (user_id, date) -> XP for the windowed boards
+        and `languages` maps user_id -> the language ids they are learning.
+        """
+        increments = []
+        ttls = {}
+        for user_id, xp in per_user.items():
+            for language_id in [None, *languages.get(user_id, ())]:
+                increments.append((board_key(ALL_TIME, language_id), user_id, xp))
+        for (user_id, day), xp in per_day.items():
+            for language_id in [None, *languages.get(user_id, ())]:
+                for window in (WEEKLY, DAILY):
+                    key = board_key(window, language_id, day)
+                    increments.append((key, user_id, xp))
+                    ttls[key] = WINDOW_TTL[window]
+        if increments:
+            self._increment(increments, ttls)
+
+    def top(self, window=ALL_TIME, limit=10, language_id=None):
+        if limit < 1:
+            # A stop of -1 would read the whole sorted set
+            return []
+        return self._range(board_key(window, language_id), 0, limit - 1)
+
+    def rank(self, user_id, window=ALL_TIME, language_id=None):
+        """1-based rank and score of a user, or (None, None) if they are not on the board."""
+        rank, score = self._rank(board_key(window, language_id), user_id)
+        return (None, None) if rank is None else (rank + 1, score)
+
+    def around(self, user_id, window=ALL_TIME, language_id=None, radius=5):
+        """The user's neighbourhood on the board, as (rank, user_id, score) rows."""
+        key = board_key(window, language_id)
+        rank, _ = self._rank(key, user_id)
+        if rank is None:
+            return []
+        start = max(rank - radius, 0)
+        return [
+            (start + offset + 1, member, score)
+            for offset, (member, score) in enumerate(self._range(key, start, rank + radius))
+        ]
+
+    def rebuild(self):
+        """
+        Rebuild every current board from the database: all-time from profile
+        XP, the current week and day from UserActivity. Returns the number of
+        boards written.
+        """
+        from rooms.models import UserActivity
+        from .models import UserLanguage, UserProfile
+
+        languages = defaultdict(list)
+        for user_id, language_id in UserLanguage.objects.filter(
+            is_learning=True
+        ).values_list('user_profile__user_id', 'language_id').iterator(chunk_size=REBUILD_CHUNK_SIZE):
+            languages[user_id].append(language_id)
+
+        today = current_day()
+        week_start = today - timedelta(days=today.weekday())
+        sources = {
+            ALL_TIME: UserProfile.objects.filter(xp__gt=0).values_list('user_id', 'xp'),
+            WEEKLY: UserActivity.objects.filter(date__gte=week_start, date__lte=today, xp_earned__gt=0).values(
+                'user_id'
+            ).annotate(total=Sum('xp_earned')).values_list('user_id', 'total'),
+            DAILY: UserActivity.objects.filter(date=today, xp_earned__gt=0).values_list('user_id', 'xp_earned'),
+        }
+
+        written = 0
+        for window, queryset in sources.items():
+            boards = defaultdict(list)
+            for user_id, score in queryset.iterator(chunk_size=REBUILD_CHUNK_SIZE):
+                for language_id in [None, *languages.get(user_id, ())]:
+                    boards[language_id].append((user_id, score))
+            for language_id, scores in boards.items():
+                self._replace(board_key(window, language_id), scores, WINDOW_TTL.get(window))
+                written += 1
+        return written
+
+
+class RedisLeaderboard(BaseLeaderboard):
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+
+    def _increment(self, increments, ttls):
+        pipe = self.redis.pipeline(transaction=False)
+        for key, user_id, amount in increments:
+            pipe.zincrby(key, amount, user_id)
+        for key, ttl in ttls.items():
+            pipe.expire(key, ttl)
+        pipe.execute()
+
+    def _replace(self, key, scores, ttl=None):
+        if not scores:
+            self.redis.delete(key)
+            return
+        staging = f"{key}:rebuild"
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(staging)
+        for start in range(0, len(scores), REBUILD_CHUNK_SIZE):
+            pipe.zadd(staging, dict(scores[start:start + REBUILD_CHUNK_SIZE]))
+            # Keep pipelines bounded on very large boards
+            pipe.execute()
+        pipe.rename(staging, key)
+        if ttl:
+            pipe.expire(key, ttl)
+        pipe.execute()
+
+    def _range(self, key, start, stop):
+        return [(int(member), int(score)) for member, score in self.redis.zrevrange(key, start, stop, withscores=True)]
+
+    def _rank(self, key, user_id):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        rank, score = pipe.execute()
+        return (None, None) if rank is None else (rank, int(score))
+
+
+class InMemoryLeaderboard(BaseLeaderboard):
+    """Process-local stand-in with the same semantics, for tests and local runs."""
+
+    def __init__(self):
+        self._boards = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def _sorted(self, key):
+        # Same order as ZREVRANGE: score, then member, descending
+        return sorted(self._boards[key].items(), key=lambda item: (item[1], str(item[0])), reverse=True)
+
+    def _increment(self, increments, ttls):
+        with self._lock:
+            for key, user_id, amount in increments:
+                board = self._boards[key]
+                board[user_id] = board.get(user_id, 0) + amount
+
+    def _replace(self, key, scores, ttl=None):
+        with self._lock:
+            self._boards[key] = dict(scores)
+
+    def _range(self, key, start, stop):
+        with self._lock:
+            return self._sorted(key)[start:stop + 1]
+
+    def _rank(self, key, user_id):
+        with self._lock:
+            if user_id not in self._boards[key]:
+                return None, None
+            ordered = self._sorted(key)
+            return [member for member, _ in ordered].index(user_id), self._boards[key][user_id]
+
+
+_leaderboard = None
+
+
+def get_leaderboard():
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = import_string(settings.LEADERBOARD_BACKEND)()
+    return _leaderboard
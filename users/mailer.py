@@ -0,0 +1,192 @@
+import json
+import smtplib
+import logging
+import uuid
+from functools import lru_cache
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+from celery.signals import worker_process_shutdown
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'mail:queue'
+FLUSH_SCHEDULED_KEY = 'mail:flush_scheduled'
+DEAD_LETTER_KEY = 'mail:dead'
+DEAD_LETTER_LIMIT = 1000
+
+_connection = None
+
+
+@lru_cache(maxsize=None)
+def get_compiled_template(name):
+    """Load and compile a template once per process."""
+    return get_template(name)
+
+
+def render_email(template_name, context):
+    html_content = get_compiled_template(template_name).render(context)
+    return html_content, strip_tags(html_content)
+
+
+def get_connection():
+    """
+    Long-lived connection for this worker process. Django's SMTP backend keeps
+    an already open connection alive across send_messages() calls, so the TLS
+    handshake happens once instead of once per email.
+    """
+    global _connection
+    if _connection is None:
+        _connection = mail.get_connection(fail_silently=False)
+        _connection.open()
+    return _connection
+
+
+def reset_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except Exception:
+            pass
+        _connection = None
+
+
+@worker_process_shutdown.connect
+def _close_connection_on_shutdown(**kwargs):
+    reset_connection()
+
+
+def send_messages(messages):
+    """Send over the pooled connection, reconnecting once if the server dropped it."""
+    for attempt in range(2):
+        connection = get_connection()
+        try:
+            return connection.send_messages(messages)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            reset_connection()
+            if attempt:
+                raise
+
+
+def build_message(data):
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['text'],
+        from_email=data.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+        to=data['to'],
+    )
+    if data.get('html'):
+        message.attach_alternative(data['html'], "text/html")
+    return message
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def message_key(message_id):
+    return f"mail:message:{message_id}"
+
+
+def queue_email(subject, to, html, text, from_email=None, ttl=None):
+    """
+    Queue an email for the next batch and make sure a flush is scheduled.
+    The queue only holds a reference; the message itself is stored under
+    its own key for `ttl` seconds, so short-lived content such as OTP codes
+    is gone from Redis once it is sent or no longer useful.
+    """
+    from .tasks import flush_email_queue_task
+
+    message_id = uuid.uuid4().hex
+    redis = _redis()
+    pipe = redis.pipeline()
+    pipe.set(message_key(message_id), json.dumps({
+        'subject': subject,
+        'to': to,
+        'html': html,
+        'text': text,
+        'from_email': from_email,
+    }), ex=ttl or settings.EMAIL_QUEUE_TTL_SECONDS)
+    pipe.rpush(QUEUE_KEY, json.dumps({'id': message_id, 'attempts': 0}))
+    pipe.execute()
+    if redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=60):
+        flush_email_queue_task.apply_async(countdown=settings.EMAIL_BATCH_DELAY_SECONDS)
+
+
+def is_permanent_failure(error):
+    """Failures a retry cannot fix: refused recipients and other 5xx replies about the message."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    # A refused sender or failed login is our configuration, not this message
+    return (
+        isinstance(error, smtplib.SMTPResponseException)
+        and error.smtp_code >= 500
+        and not isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPAuthenticationError))
+    )
+
+
+def dead_letter(redis, ref, data, error):
+    """Park a message that will not be sent. The body is dropped; only who and why are kept."""
+    logger.error("Dropping email %s to %s after %d attempts: %s", ref['id'], data.get('to'), ref['attempts'], error)
+    pipe = redis.pipeline()
+    pipe.lpush(DEAD_LETTER_KEY, json.dumps({
+        'id': ref['id'],
+        'to': data.get('to'),
+        'subject': data.get('subject'),
+        'attempts': ref['attempts'],
+        'error': str(error),
+        'failed_at': timezone.now().isoformat(),
+    }))
+    pipe.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_LIMIT - 1)
+    pipe.delete(message_key(ref['id']))
+    pipe.execute()
+
+
+def drain_queue(batch_size=None):
+    """
+    Send everything queued over one connection, a message at a time so a
+    failure never re-sends what already went out. On a transient failure
+    the failed message and the rest of its batch go back to the front of
+    the queue and the error is raised for the task to retry; messages that
+    fail permanently or too often are dead-lettered. Returns the count sent.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    redis = _redis()
+    # Clear the flag first so anything queued while draining schedules a new flush
+    redis.delete(FLUSH_SCHEDULED_KEY)
+
+    sent = 0
+    while True:
+        raw = redis.lpop(QUEUE_KEY, batch_size)
+        if not raw:
+            return sent
+        refs = [json.loads(item) for item in raw]
+        bodies = redis.mget([message_key(ref['id']) for ref in refs])
+        for index, (ref, body) in enumerate(zip(refs, bodies)):
+            if body is None:
+                # Expired before it could be sent
+                logger.warning("Queued email %s expired unsent", ref['id'])
+                continue
+            data = json.loads(body)
+            try:
+                send_messages([build_message(data)])
+            except Exception as e:
+                ref['attempts'] += 1
+                if is_permanent_failure(e):
+                    dead_letter(redis, ref, data, e)
+                    continue
+                retry = refs[index + 1:]
+                if ref['attempts'] < settings.EMAIL_MAX_ATTEMPTS:
+                    retry = [ref] + retry
+                else:
+                    dead_letter(redis, ref, data, e)
+                if retry:
+                    redis.lpush(QUEUE_KEY, *[json.dumps(item) for item in reversed(retry)])
+                raise
+            redis.delete(message_key(ref['id']))
+            sent += 1
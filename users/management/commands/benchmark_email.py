@@ -0,0 +1,71 @@
+import time
+from types import SimpleNamespace
+from django.conf import settings
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+from users import mailer
+
+TEMPLATE = "emails/otp_email.html"
+
+
+class Command(BaseCommand):
+    help = "Compare per-email connections against queueing and draining through the pooled mailer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument(
+            '--backend',
+            default='django.core.mail.backends.locmem.EmailBackend',
+            help="Email backend to benchmark against, e.g. the filebased or smtp backend",
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        settings.EMAIL_BACKEND = options['backend']
+        mailer.reset_connection()
+
+        context = {
+            'user': SimpleNamespace(username='bench', email='bench@example.com'),
+            'code': '123456',
+            'expires_at': timezone.now(),
+        }
+
+        start = time.perf_counter()
+        for _ in range(count):
+            html = render_to_string(TEMPLATE, context)
+            message = EmailMultiAlternatives(
+                "Your TalkMate OTP code", strip_tags(html), settings.DEFAULT_FROM_EMAIL, ['bench@example.com']
+            )
+            message.attach_alternative(html, "text/html")
+            message.send()
+        per_email = time.perf_counter() - start
+
+        # drain_queue sends whatever is queued, so refuse to mix in real mail
+        redis = mailer._redis()
+        if redis.llen(mailer.QUEUE_KEY):
+            raise CommandError("The email queue is not empty; run the benchmark once it has drained")
+        # Hold the flush flag so queue_email doesn't schedule the Celery task meanwhile
+        redis.set(mailer.FLUSH_SCHEDULED_KEY, 1, ex=600)
+
+        start = time.perf_counter()
+        for _ in range(count):
+            html, text = mailer.render_email(TEMPLATE, context)
+            mailer.queue_email("Your TalkMate OTP code", ['bench@example.com'], html, text)
+        queued = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sent = mailer.drain_queue()
+        drained = time.perf_counter() - start
+        mailer.reset_connection()
+
+        if hasattr(mail, 'outbox'):
+            mail.outbox = []
+
+        self.stdout.write(f"backend: {options['backend']}")
+        self.stdout.write(f"per-email connection: {count / per_email:.0f} emails/s")
+        self.stdout.write(f"queue_email:          {count / queued:.0f} emails/s")
+        self.stdout.write(f"drain_queue (pooled): {sent / drained:.0f} emails/s, {sent} sent")
@@ -0,0 +1,49 @@
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users.leaderboards import get_leaderboard, board_key, ALL_TIME
+
+
+class Command(BaseCommand):
+    help = "Time a leaderboard bulk load at 1M users and the rank/top/around queries against it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--language', type=int, default=999999, help="Language id used for the scratch board")
+        parser.add_argument(
+            '--from-db', action='store_true',
+            help="Also time a full rebuild of every board from the database",
+        )
+
+    def handle(self, *args, **options):
+        board = get_leaderboard()
+        count = options['count']
+        language_id = options['language']
+        self.stdout.write(f"backend: {settings.LEADERBOARD_BACKEND}")
+
+        rng = random.Random(0)
+        scores = [(user_id, rng.randint(0, 500_000)) for user_id in range(1, count + 1)]
+        start = time.perf_counter()
+        board._replace(board_key(ALL_TIME, language_id), scores)
+        self.stdout.write(f"load {count} users:      {time.perf_counter() - start:8.2f} s")
+
+        user_ids = [rng.randint(1, count) for _ in range(options['queries'])]
+        for label, query in (
+            ('rank', lambda user_id: board.rank(user_id, ALL_TIME, language_id)),
+            ('top 10', lambda user_id: board.top(ALL_TIME, 10, language_id)),
+            ('around me', lambda user_id: board.around(user_id, ALL_TIME, language_id)),
+        ):
+            start = time.perf_counter()
+            for user_id in user_ids:
+                query(user_id)
+            elapsed = (time.perf_counter() - start) / len(user_ids)
+            self.stdout.write(f"{label:<22} {elapsed * 1000:8.3f} ms/query")
+
+        board._replace(board_key(ALL_TIME, language_id), [])
+
+        if options['from_db']:
+            start = time.perf_counter()
+            written = board.rebuild()
+            self.stdout.write(f"rebuild from database: {time.perf_counter() - start:8.2f} s ({written} boards)")
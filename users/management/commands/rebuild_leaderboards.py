@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.xp import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the XP leaderboards from profiles and daily activity"
+
+    def handle(self, *args, **options):
+        written = rebuild_leaderboards()
+        self.stdout.write(f"Rebuilt {written} leaderboards")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.stats import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Recompute the profile stats snapshots from daily activity"
+
+    def handle(self, *args, **options):
+        written = rebuild_snapshots()
+        self.stdout.write(f"Rebuilt {written} stats snapshots")
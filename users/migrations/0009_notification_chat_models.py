@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_alter_message_is_deleted_alter_message_sent_at_and_more'),
+        ('users', '0008_alter_customuser_is_google_login_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='related_room',
+            field=models.ForeignKey(blank=True, help_text='Related room for room-specific notifications', null=True, on_delete=django.db.models.deletion.CASCADE, to='rooms.room'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='related_user',
+            field=models.ForeignKey(blank=True, help_text='User who triggered this notification', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sent_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('report', 'New Report'), ('user_registration', 'New User Registration'), ('system_update', 'System Update'), ('friend_request', 'Friend Request'), ('room_invite', 'Room Invite'), ('new_follower', 'New Follower'), ('chat_message', 'New Chat Message'), ('other', 'Other')], db_index=True, default='other', max_length=30),
+        ),
+        migrations.CreateModel(
+            name='ChatRoom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('participants', models.ManyToManyField(related_name='chat_rooms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('message_type', models.CharField(choices=[('text', 'Text'), ('image', 'Image'), ('file', 'File'), ('emoji', 'Emoji')], default='text', max_length=10)),
+                ('sent_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('is_read', models.BooleanField(db_index=True, default=False)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('chat_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='users.chatroom')),
+            ],
+            options={
+                'ordering': ['sent_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_userprofile_avatar_status'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OTP',
+        ),
+    ]
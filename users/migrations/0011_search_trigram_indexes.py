@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:51
+
+from django.db import migrations
+
+# pg_trgm GIN indexes back the icontains lookups used by users.search;
+# other databases (SQLite in tests) skip them.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS users_customuser_username_trgm ON users_customuser USING gin (upper(username) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS users_customuser_email_trgm ON users_customuser USING gin (upper(email) gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS users_customuser_username_trgm",
+    "DROP INDEX IF EXISTS users_customuser_email_trgm",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_delete_otp'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:10
+
+from django.db import migrations
+
+# istartswith renders as UPPER(username::text) LIKE 'AB%'; a text_pattern_ops
+# btree on the same expression serves it for any prefix length.
+FORWARD_SQL = [
+    "CREATE INDEX IF NOT EXISTS users_customuser_username_prefix ON users_customuser (upper(username::text) text_pattern_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS users_customuser_username_prefix",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_username_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('report', 'New Report'), ('user_registration', 'New User Registration'), ('system_update', 'System Update'), ('friend_request', 'Friend Request'), ('room_invite', 'Room Invite'), ('room_live', 'Room Live'), ('new_follower', 'New Follower'), ('chat_message', 'New Chat Message'), ('other', 'Other')], db_index=True, default='other', max_length=30),
+        ),
+    ]
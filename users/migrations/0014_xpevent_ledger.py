@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_baselines(apps, schema_editor):
+    """Carry each profile's existing totals into the ledger as an already-applied baseline event."""
+    UserProfile = apps.get_model('users', 'UserProfile')
+    XPEvent = apps.get_model('users', 'XPEvent')
+    now = django.utils.timezone.now()
+    batch = []
+    for profile in UserProfile.objects.only('user_id', 'xp', 'total_speak_time', 'total_rooms_joined').iterator(chunk_size=2000):
+        batch.append(XPEvent(
+            user_id=profile.user_id,
+            kind='baseline',
+            minutes=int(profile.total_speak_time.total_seconds() // 60) if profile.total_speak_time else 0,
+            sessions=profile.total_rooms_joined,
+            points=profile.xp,
+            reference=f"baseline:{profile.user_id}",
+            occurred_at=now,
+            processed_at=now,
+        ))
+        if len(batch) >= 2000:
+            XPEvent.objects.bulk_create(batch)
+            batch = []
+    XPEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_notification_room_live'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('room_session', 'Room Session'), ('bonus', 'Bonus'), ('baseline', 'Baseline')], db_index=True, max_length=20)),
+                ('minutes', models.IntegerField(default=0)),
+                ('sessions', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('reference', models.CharField(blank=True, max_length=64)),
+                ('occurred_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='xpevent_pending_idx'), models.Index(fields=['user', 'occurred_at'], name='users_xpeve_user_id_796648_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('reference', ''), _negated=True), fields=('kind', 'reference'), name='unique_xpevent_reference')],
+            },
+        ),
+        migrations.RunPython(create_baselines, migrations.RunPython.noop),
+    ]
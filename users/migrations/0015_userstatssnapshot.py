@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_snapshots(apps, schema_editor):
+    from users.stats import snapshot_fields
+
+    UserActivity = apps.get_model('rooms', 'UserActivity')
+    UserStatsSnapshot = apps.get_model('users', 'UserStatsSnapshot')
+    batch = []
+    current_user, days = None, []
+    rows = UserActivity.objects.order_by('user_id', '-date').values_list(
+        'user_id', 'date', 'xp_earned', 'practice_minutes'
+    ).iterator(chunk_size=2000)
+    for user_id, day, xp, minutes in rows:
+        if user_id != current_user and days:
+            batch.append(UserStatsSnapshot(user_id=current_user, **snapshot_fields(days)))
+            days = []
+            if len(batch) >= 2000:
+                UserStatsSnapshot.objects.bulk_create(batch)
+                batch = []
+        current_user = user_id
+        days.append((day, xp, minutes))
+    if days:
+        batch.append(UserStatsSnapshot(user_id=current_user, **snapshot_fields(days)))
+    UserStatsSnapshot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_xpevent_ledger'),
+        ('rooms', '0012_room_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatsSnapshot',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats_snapshot', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_active_date', models.DateField(blank=True, null=True)),
+                ('daily_xp', models.IntegerField(default=0)),
+                ('recent_minutes', models.JSONField(blank=True, default=dict)),
+                ('streak', models.IntegerField(default=0)),
+                ('active_days', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
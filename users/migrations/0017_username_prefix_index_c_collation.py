@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# A text_pattern_ops index serves LIKE 'AB%' but not ORDER BY under the
+# database collation, so directory lookups sorted every match before the
+# LIMIT. A C-collated index on the same expression serves both the prefix
+# scan and the ordering (see users.search.username_prefix).
+FORWARD_SQL = [
+    "DROP INDEX IF EXISTS users_customuser_username_prefix",
+    'CREATE INDEX IF NOT EXISTS users_customuser_username_prefix ON users_customuser ((upper(username::text) COLLATE "C"))',
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS users_customuser_username_prefix",
+    "CREATE INDEX IF NOT EXISTS users_customuser_username_prefix ON users_customuser (upper(username::text) text_pattern_ops)",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_signup_subscription_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres_sql(FORWARD_SQL), run_postgres_sql(REVERSE_SQL)),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_username_prefix_index_c_collation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_upload_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
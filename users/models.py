@@ -19,6 +19,12 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # signup counts filter on join time
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
 
 class Language(models.Model):
     name = models.CharField(max_length=50)
@@ -30,9 +36,16 @@ class UserProfile(models.Model):
         ACTIVE = 'active','Active'
         BANNED = 'banned','Banned'
         FLAGGED = 'flagged','Flagged'
+    class AvatarStatus(models.TextChoices):
+        READY = 'ready','Ready'
+        PENDING = 'pending','Pending'
+        FAILED = 'failed','Failed'
     user = models.OneToOneField(CustomUser,on_delete=models.CASCADE)
     unique_id = models.CharField(max_length=10,unique=True,default=generate_unique_id)
     avatar = models.URLField(blank=True,null=True)
+    avatar_status = models.CharField(max_length=10,choices=AvatarStatus.choices,default=AvatarStatus.READY)
+    # Token of the upload being processed; only that upload's task may finish it
+    avatar_upload_token = models.CharField(max_length=32,blank=True)
     bio = models.TextField(blank=True)
     status = models.CharField(max_length=20,choices=Status.choices,default=Status.ACTIVE, db_index=True)
     is_premium = models.BooleanField(default=False, db_index=True)
@@ -46,7 +59,8 @@ class UserProfile(models.Model):
     following = models.ManyToManyField('self',symmetrical=False,related_name='followers',blank=True)
     
     def update_level(self):
-        self.level = self.xp // 7200 + 1
+        from .xp import level_for
+        self.level = level_for(self.xp)
         self.save()
 
     def follow_user(self,user_profile):
@@ -83,16 +97,6 @@ class UserLanguage(models.Model):
 
 
     
-class OTP(models.Model):
-    user = models.ForeignKey(CustomUser,on_delete=models.CASCADE)
-    code = models.CharField(max_length=50, db_index=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(db_index=True)
-    is_used = models.BooleanField(default=False, db_index=True)
-    
-    def is_expired(self):
-        return timezone.now() > self.expires_at
-    
 class Friendship(models.Model):
     class Status(models.TextChoices):
         PENDING = 'pending', 'Pending'
@@ -143,6 +147,7 @@ class Notification(models.Model):
         SYSTEM_UPDATE = 'system_update', 'System Update'
         FRIEND_REQUEST = 'friend_request', 'Friend Request'
         ROOM_INVITE = 'room_invite', 'Room Invite'
+        ROOM_LIVE = 'room_live', 'Room Live'
         NEW_FOLLOWER = 'new_follower', 'New Follower'
         CHAT_MESSAGE = 'chat_message', 'New Chat Message'
         OTHER = 'other', 'Other'
@@ -202,7 +207,7 @@ class UserSubscription(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='subscription')
     plan = models.ForeignKey(SubscriptionPlan, on_delete=models.SET_NULL, null=True)
     
-    start_date = models.DateTimeField(auto_now_add=True)
+    start_date = models.DateTimeField(auto_now_add=True, db_index=True)
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True, db_index=True)
 
@@ -284,3 +289,75 @@ class ChatMessage(models.Model):
     
 
         
+
+
+class XPEvent(models.Model):
+    """
+    Append-only ledger of what a user did to earn XP. Events hold the raw
+    facts (minutes, sessions, fixed points); users.xp turns them into XP and
+    folds them into profiles and daily activity.
+    """
+    class Kind(models.TextChoices):
+        ROOM_SESSION = 'room_session', 'Room Session'
+        BONUS = 'bonus', 'Bonus'
+        BASELINE = 'baseline', 'Baseline'
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='xp_events')
+    kind = models.CharField(max_length=20, choices=Kind.choices, db_index=True)
+    minutes = models.IntegerField(default=0)
+    sessions = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    reference = models.CharField(max_length=64, blank=True)
+    occurred_at = models.DateTimeField(default=timezone.now, db_index=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'reference'],
+                condition=~models.Q(reference=''),
+                name='unique_xpevent_reference',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='xpevent_pending_idx'),
+            models.Index(fields=['user', 'occurred_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.kind} at {self.occurred_at}"
+
+
+class UserStatsSnapshot(models.Model):
+    """
+    Per-user activity stats kept current by the XP aggregator, so profile
+    serialization reads one joined row instead of scanning UserActivity.
+    Values are as of last_active_date; the read helpers age them to today.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats_snapshot')
+    last_active_date = models.DateField(null=True, blank=True)
+    daily_xp = models.IntegerField(default=0)
+    # Practice minutes by ISO date for the 7 days ending on last_active_date
+    recent_minutes = models.JSONField(default=dict, blank=True)
+    streak = models.IntegerField(default=0)
+    active_days = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.user}"
+
+    def daily_xp_on(self, today):
+        return self.daily_xp if self.last_active_date == today else 0
+
+    def streak_on(self, today):
+        """Today may still be inactive without breaking the streak."""
+        if self.last_active_date and self.last_active_date >= today - timedelta(days=1):
+            return self.streak
+        return 0
+
+    def weekly_minutes_on(self, today):
+        week_start = (today - timedelta(days=6)).isoformat()
+        return sum(
+            minutes for day, minutes in self.recent_minutes.items()
+            if week_start <= day <= today.isoformat()
+        )
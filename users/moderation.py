@@ -0,0 +1,112 @@
+import json
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+REVOKED_USERS_KEY = 'auth:revoked_users'
+
+# WebSocket close code sent to kicked sockets, in the application range
+FORCE_DISCONNECT_CODE = 4003
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def user_control_group(user_id):
+    return f"user_control_{user_id}"
+
+
+def is_revoked(user_id):
+    """
+    Whether the user's tokens are revoked. One SISMEMBER; if Redis is down
+    this answers False and the is_active check on the user still applies.
+    """
+    try:
+        return bool(_redis().sismember(REVOKED_USERS_KEY, user_id))
+    except Exception as e:
+        logger.warning("Could not check token revocation for user %s: %s", user_id, e)
+        return False
+
+
+def revoke(user_id):
+    try:
+        _redis().sadd(REVOKED_USERS_KEY, user_id)
+    except Exception as e:
+        # The user is inactive in the database, which still refuses their tokens
+        logger.warning("Could not revoke tokens of user %s: %s", user_id, e)
+
+
+def unrevoke(user_id):
+    try:
+        _redis().srem(REVOKED_USERS_KEY, user_id)
+    except Exception as e:
+        logger.warning("Could not restore tokens of user %s: %s", user_id, e)
+
+
+def kick(user_id, reason='banned'):
+    """Close every socket the user has open, whichever consumer it is on."""
+    try:
+        async_to_sync(get_channel_layer().group_send)(user_control_group(user_id), {
+            'type': 'force_disconnect',
+            'reason': reason,
+        })
+    except Exception as e:
+        logger.warning("Could not disconnect sockets of user %s: %s", user_id, e)
+
+
+def revoke_and_kick(user_id):
+    revoke(user_id)
+    kick(user_id)
+
+
+def ban_user(user):
+    """
+    Ban a user: mark them banned and inactive and settle their open room
+    sessions in one pass; once committed, revoke their tokens and close
+    their live sockets.
+    """
+    from rooms.models import RoomParticipant
+    from rooms.sessions import settle_participations
+
+    with transaction.atomic():
+        profile = user.userprofile
+        profile.status = profile.Status.BANNED
+        user.is_active = False
+        profile.save()
+        user.save()
+        settle_participations(RoomParticipant.objects.filter(user=user, left_at__isnull=True))
+        transaction.on_commit(lambda: revoke_and_kick(user.id))
+
+
+def unban_user(user):
+    with transaction.atomic():
+        profile = user.userprofile
+        profile.status = profile.Status.ACTIVE
+        user.is_active = True
+        profile.save()
+        user.save()
+        transaction.on_commit(lambda: unrevoke(user.id))
+
+
+class UserControlMixin:
+    """
+    For consumers: join the user's control group once authenticated, so a
+    ban can close the socket through kick().
+    """
+
+    async def join_control_group(self):
+        self.control_group_name = user_control_group(self.scope['user'].id)
+        await self.channel_layer.group_add(self.control_group_name, self.channel_name)
+
+    async def leave_control_group(self):
+        if hasattr(self, 'control_group_name'):
+            await self.channel_layer.group_discard(self.control_group_name, self.channel_name)
+
+    async def force_disconnect(self, event):
+        await self.send(text_data=json.dumps({'type': 'force_disconnect', 'reason': event.get('reason')}))
+        await self.close(code=FORCE_DISCONNECT_CODE)
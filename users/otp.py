@@ -0,0 +1,167 @@
+import hmac
+import time
+import random
+import hashlib
+import threading
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+PURPOSE_VERIFY_EMAIL = 'verify'
+PURPOSE_RESET_PASSWORD = 'reset'
+
+# Results of OTPStore.verify()
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+TOO_MANY_ATTEMPTS = 'too_many_attempts'
+
+
+def generate_code():
+    return f"{random.SystemRandom().randint(100000, 999999)}"
+
+
+def hash_code(code):
+    return hmac.new(settings.SECRET_KEY.encode(), str(code).encode(), hashlib.sha256).hexdigest()
+
+
+class BaseOTPStore:
+    """
+    Keeps one hashed OTP per (purpose, user) with a native TTL, counts verify
+    attempts against it and tracks the resend cooldown.
+    """
+
+    def __init__(self):
+        self.ttl = settings.OTP_TTL_SECONDS
+        self.max_attempts = settings.OTP_MAX_ATTEMPTS
+        self.cooldown = settings.OTP_RESEND_COOLDOWN_SECONDS
+
+    def _key(self, kind, purpose, user_id):
+        return f"otp:{kind}:{purpose}:{user_id}"
+
+    def claim_send(self, user_id, purpose):
+        """
+        Start the resend cooldown. Returns 0 if a new code may be sent, otherwise
+        the number of seconds left before the next one.
+        """
+        raise NotImplementedError
+
+    def issue(self, user_id, purpose):
+        """Store a fresh code, replacing any previous one, and return it."""
+        raise NotImplementedError
+
+    def verify(self, user_id, purpose, code):
+        """Check a code, consuming it on success. Returns one of the result constants."""
+        raise NotImplementedError
+
+
+class RedisOTPStore(BaseOTPStore):
+    # KEYS: code, attempts  ARGV: hash, max_attempts, ttl
+    VERIFY_SCRIPT = """
+    local stored = redis.call('GET', KEYS[1])
+    if not stored then
+        return 'expired'
+    end
+    local attempts = redis.call('INCR', KEYS[2])
+    if attempts == 1 then
+        redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+    end
+    if attempts > tonumber(ARGV[2]) then
+        return 'too_many_attempts'
+    end
+    if stored == ARGV[1] then
+        redis.call('DEL', KEYS[1], KEYS[2])
+        return 'valid'
+    end
+    return 'invalid'
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        super().__init__()
+        self.redis = get_redis_connection('default')
+        self._verify = self.redis.register_script(self.VERIFY_SCRIPT)
+
+    def claim_send(self, user_id, purpose):
+        key = self._key('cooldown', purpose, user_id)
+        if self.redis.set(key, 1, nx=True, ex=self.cooldown):
+            return 0
+        return max(self.redis.ttl(key), 1)
+
+    def issue(self, user_id, purpose):
+        code = generate_code()
+        pipe = self.redis.pipeline()
+        pipe.set(self._key('code', purpose, user_id), hash_code(code), ex=self.ttl)
+        pipe.delete(self._key('attempts', purpose, user_id))
+        pipe.execute()
+        return code
+
+    def verify(self, user_id, purpose, code):
+        result = self._verify(
+            keys=[self._key('code', purpose, user_id), self._key('attempts', purpose, user_id)],
+            args=[hash_code(code), self.max_attempts, self.ttl],
+        )
+        return result.decode() if isinstance(result, bytes) else result
+
+
+class InMemoryOTPStore(BaseOTPStore):
+    """Process-local stand-in with the same semantics, for tests and local runs."""
+
+    def __init__(self):
+        super().__init__()
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            return None
+        if value[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return value[0]
+
+    def _set(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + ttl)
+
+    def claim_send(self, user_id, purpose):
+        key = self._key('cooldown', purpose, user_id)
+        with self._lock:
+            if self._get(key) is not None:
+                return max(int(self._data[key][1] - time.monotonic()), 1)
+            self._set(key, 1, self.cooldown)
+            return 0
+
+    def issue(self, user_id, purpose):
+        code = generate_code()
+        with self._lock:
+            self._set(self._key('code', purpose, user_id), hash_code(code), self.ttl)
+            self._data.pop(self._key('attempts', purpose, user_id), None)
+        return code
+
+    def verify(self, user_id, purpose, code):
+        code_key = self._key('code', purpose, user_id)
+        attempts_key = self._key('attempts', purpose, user_id)
+        with self._lock:
+            stored = self._get(code_key)
+            if stored is None:
+                return EXPIRED
+            attempts = (self._get(attempts_key) or 0) + 1
+            expires_at = self._data[attempts_key][1] if attempts > 1 else time.monotonic() + self.ttl
+            self._data[attempts_key] = (attempts, expires_at)
+            if attempts > self.max_attempts:
+                return TOO_MANY_ATTEMPTS
+            if hmac.compare_digest(stored, hash_code(code)):
+                self._data.pop(code_key, None)
+                self._data.pop(attempts_key, None)
+                return VALID
+            return INVALID
+
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.OTP_STORE_BACKEND)()
+    return _store
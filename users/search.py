@@ -0,0 +1,78 @@
+import re
+from django.conf import settings
+from django.db.models.functions import Collate, Upper
+from backend.search import text_search, uses_postgres_search
+
+
+def search_users(queryset, term):
+    """Users whose username or email contains `term`."""
+    return text_search(queryset, term, ['username', 'email'])
+
+
+UNIQUE_ID_PATTERN = re.compile(r'^TM\d{8}$', re.IGNORECASE)
+DIRECTORY_CARD_FIELDS = (
+    'id', 'username', 'userprofile__id', 'userprofile__unique_id', 'userprofile__avatar',
+    'userprofile__level', 'userprofile__is_premium', 'userprofile__is_online', 'usersettings__show_online_status',
+)
+
+
+def directory_queryset():
+    """Users that may appear in the directory: active, not banned, public profile."""
+    from .models import CustomUser, UserProfile
+    return CustomUser.objects.filter(
+        is_active=True,
+        is_superuser=False,
+    ).exclude(
+        userprofile__status=UserProfile.Status.BANNED,
+    ).exclude(
+        usersettings__public_profile=False,
+    )
+
+
+def search_directory(term, exclude_user_id=None, limit=10):
+    """
+    Autocomplete lookup: an exact match on a "TM########" unique_id, otherwise a
+    username prefix match served by the upper(username) prefix index.
+    Returns lightweight card dicts.
+    """
+    term = (term or '').strip()
+    queryset = directory_queryset()
+    if exclude_user_id:
+        queryset = queryset.exclude(id=exclude_user_id)
+
+    if UNIQUE_ID_PATTERN.match(term):
+        queryset = queryset.filter(userprofile__unique_id=term.upper())
+    elif len(term) >= settings.USER_SEARCH_MIN_PREFIX:
+        queryset = username_prefix(queryset, term)
+    else:
+        return []
+
+    return [_directory_card(row) for row in queryset.values(*DIRECTORY_CARD_FIELDS)[:limit]]
+
+
+def username_prefix(queryset, term):
+    """
+    Users whose username starts with `term`, case-insensitively, ordered by
+    the same upper(username) key. On PostgreSQL the key is C-collated to
+    match the users_customuser_username_prefix index, so one index range
+    scan serves both the prefix and the ORDER BY ... LIMIT instead of
+    sorting every match.
+    """
+    key = Upper('username')
+    if uses_postgres_search():
+        key = Collate(key, 'C')
+    return queryset.annotate(username_key=key).filter(username_key__startswith=term.upper()).order_by('username_key')
+
+
+def _directory_card(row):
+    show_online = row['usersettings__show_online_status'] is not False
+    return {
+        'user_id': row['id'],
+        'profile_id': row['userprofile__id'],
+        'unique_id': row['userprofile__unique_id'],
+        'username': row['username'],
+        'avatar': row['userprofile__avatar'],
+        'level': row['userprofile__level'],
+        'is_premium': row['userprofile__is_premium'],
+        'is_online': bool(row['userprofile__is_online']) and show_online,
+    }
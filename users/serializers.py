@@ -1,12 +1,17 @@
 import re
+import uuid
 import logging
 from .models import *
 from django.db.models import Q
-from datetime import timedelta,date
-from rooms.models import UserActivity
+from django.db import transaction
+from django.core.cache import cache
+from django.utils import timezone
 from rest_framework import serializers
 from django.utils.timesince import timesince
-from .utils import upload_avatar_to_cloudinary
+from .avatars import discard_staged_avatar,stage_avatar_upload
+from .tasks import process_avatar_task
+from . import otp
+from .otp import get_otp_store,PURPOSE_RESET_PASSWORD
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -16,6 +21,12 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 logger = logging.getLogger(__name__)
 
+OTP_ERRORS = {
+    otp.INVALID: "Invalid OTP.",
+    otp.EXPIRED: "OTP expired.",
+    otp.TOO_MANY_ATTEMPTS: "Too many attempts. Please request a new OTP.",
+}
+
 class CustomUserSerializer(serializers.ModelSerializer):
     profile_summary = serializers.SerializerMethodField()
     class Meta:
@@ -213,7 +224,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = [
-            'id', 'user', 'unique_id', 'avatar', 'bio', 'native_languages',
+            'id', 'user', 'unique_id', 'avatar', 'avatar_status', 'bio', 'native_languages',
             'learning_languages', 'status', 'is_premium', 'xp', 'level', 'streak',
             'total_speak_time', 'total_rooms_joined', 'is_online', 'last_seen', 
             'last_seen_display', 'following', 'followers_count', 'following_count',
@@ -251,42 +262,27 @@ class UserProfileSerializer(serializers.ModelSerializer):
         except UserSubscription.DoesNotExist:
             return None
     
+    def _stats(self, obj):
+        # Select user__stats_snapshot on list querysets to keep this a join
+        try:
+            return obj.user.stats_snapshot
+        except UserStatsSnapshot.DoesNotExist:
+            return None
+
     def get_current_streak(self, obj):
-        user = obj.user
-        today = date.today()
-        streak = 0
-        for i in range(0, 100):  # reasonable max streak
-            day = today - timedelta(days=i)
-            if UserActivity.objects.filter(user=user, date=day).exists():
-                streak += 1
-            else:
-                if i == 0:
-                    continue  # allow for today being inactive so far
-                break
-        return streak
+        stats = self._stats(obj)
+        return stats.streak_on(timezone.now().date()) if stats else 0
 
     def get_daily_xp(self, obj):
-        user = obj.user
-        today = date.today()
-        activity = UserActivity.objects.filter(user=user, date=today).first()
-        return activity.xp_earned if activity else 0
+        stats = self._stats(obj)
+        return stats.daily_xp_on(timezone.now().date()) if stats else 0
 
     def get_weekly_practice_hours(self, obj):
-        user = obj.user
-        today = date.today()
-        week_ago = today - timedelta(days=6)
-        activities = UserActivity.objects.filter(user=user, date__gte=week_ago, date__lte=today)
-        total_minutes = sum(a.practice_minutes for a in activities)
+        stats = self._stats(obj)
+        total_minutes = stats.weekly_minutes_on(timezone.now().date()) if stats else 0
         return round(total_minutes / 60, 1)
     
     
-class OTPSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = OTP
-        fields = ['id','user','code','created_at','expires_at']
-        read_only_fields = ['created_at']
-        
-        
 class ResendOTPSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
@@ -318,16 +314,11 @@ class PasswordResetOTPVerifySerializer(serializers.Serializer):
         except CustomUser.DoesNotExist:
             raise serializers.ValidationError("User not found.")
 
-        try:
-            otp_obj = OTP.objects.filter(user=user, code=code, is_used=False).latest('created_at')
-        except OTP.DoesNotExist:
-            raise serializers.ValidationError("Invalid OTP.")
-
-        if otp_obj.is_expired():
-            raise serializers.ValidationError("OTP expired.")
+        result = get_otp_store().verify(user.id, PURPOSE_RESET_PASSWORD, code)
+        if result != otp.VALID:
+            raise serializers.ValidationError(OTP_ERRORS[result])
 
         data['user'] = user
-        data['otp_obj'] = otp_obj
         return data
 
 class PasswordResetResendOTPSerializer(serializers.Serializer):
@@ -376,42 +367,93 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         avatar_file = validated_data.pop('avatar', None)
+        staged_avatar = None
         if avatar_file:
-            avatar_url = upload_avatar_to_cloudinary(avatar_file)
-            instance.avatar = avatar_url
+            # processed in the background by process_avatar_task
+            staged_avatar = stage_avatar_upload(avatar_file)
+            instance.avatar_status = UserProfile.AvatarStatus.PENDING
+            instance.avatar_upload_token = uuid.uuid4().hex
 
         # Update bio
         bio = validated_data.pop('bio', None)
         if bio is not None:
             instance.bio = bio
 
-        # Update native languages
         native_langs = validated_data.pop('native_languages', None)
-        if native_langs is not None:
-            instance.userlanguage_set.filter(is_learning=False).delete()
-            for lang in native_langs:
-                UserLanguage.objects.create(
-                    user_profile=instance,
-                    language_id=lang['language'],
-                    is_learning=False,
-                    proficiency=lang['proficiency']
-                )
-
-        # Update learning languages
         learning_langs = validated_data.pop('learning_languages', None)
-        if learning_langs is not None:
-            instance.userlanguage_set.filter(is_learning=True).delete()
-            for lang in learning_langs:
-                UserLanguage.objects.create(
-                    user_profile=instance,
-                    language_id=lang['language'],
-                    is_learning=True,
-                    proficiency=lang['proficiency']
-                )
-
-        instance.save()
+
+        try:
+            self._save(instance, native_langs, learning_langs, staged_avatar)
+        except Exception:
+            # Nothing will process the staged file if the update rolled back
+            if staged_avatar:
+                discard_staged_avatar(staged_avatar)
+            raise
         return instance
 
+    def _save(self, instance, native_langs, learning_langs, staged_avatar):
+        with transaction.atomic():
+            languages_changed = False
+            if native_langs is not None:
+                languages_changed |= self._sync_languages(instance, native_langs, is_learning=False)
+            if learning_langs is not None:
+                languages_changed |= self._sync_languages(instance, learning_langs, is_learning=True)
+
+            instance.save()
+
+            if staged_avatar:
+                profile_id, token = instance.id, instance.avatar_upload_token
+                transaction.on_commit(lambda: process_avatar_task.delay(profile_id, staged_avatar, token))
+
+            if languages_changed:
+                # bulk operations skip signals, so drop the cached profile once
+                user_id = instance.user_id
+                transaction.on_commit(lambda: cache.delete(f"user_profile_{user_id}"))
+
+    def _sync_languages(self, instance, languages, is_learning):
+        """
+        Diff the submitted languages against the stored rows for one group
+        (native or learning) and apply the inserts, updates and deletes in bulk.
+        Returns True if anything changed.
+        """
+        wanted = {}
+        for lang in languages:
+            wanted[int(lang['language'])] = lang['proficiency']
+
+        existing = {}
+        to_delete = []
+        for row in instance.userlanguage_set.filter(is_learning=is_learning).order_by('id'):
+            if row.language_id in existing or row.language_id not in wanted:
+                to_delete.append(row.id)
+            else:
+                existing[row.language_id] = row
+
+        to_update = []
+        for language_id, row in existing.items():
+            if row.proficiency != wanted[language_id]:
+                row.proficiency = wanted[language_id]
+                to_update.append(row)
+
+        to_create = [
+            UserLanguage(
+                user_profile=instance,
+                language_id=language_id,
+                is_learning=is_learning,
+                proficiency=proficiency
+            )
+            for language_id, proficiency in wanted.items()
+            if language_id not in existing
+        ]
+
+        if to_delete:
+            UserLanguage.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            UserLanguage.objects.bulk_update(to_update, ['proficiency'])
+        if to_create:
+            UserLanguage.objects.bulk_create(to_create)
+
+        return bool(to_delete or to_update or to_create)
+
 
 
 class UserSettingsSerializer(serializers.ModelSerializer):
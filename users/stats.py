@@ -0,0 +1,136 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import UserStatsSnapshot
+
+RECENT_DAYS = 7
+REBUILD_CHUNK_SIZE = 2000
+
+
+def snapshot_fields(days):
+    """
+    Snapshot values from a user's activity days, given as (date, xp, minutes)
+    rows newest first. Pure, so the backfill migration can use it too.
+    """
+    if not days:
+        return {'last_active_date': None, 'daily_xp': 0, 'recent_minutes': {}, 'streak': 0, 'active_days': 0}
+    last_active = days[0][0]
+    streak = 0
+    for day, _, _ in days:
+        if day != last_active - timedelta(days=streak):
+            break
+        streak += 1
+    window_start = last_active - timedelta(days=RECENT_DAYS - 1)
+    return {
+        'last_active_date': last_active,
+        'daily_xp': days[0][1],
+        'recent_minutes': {day.isoformat(): minutes for day, _, minutes in days if day >= window_start},
+        'streak': streak,
+        'active_days': len(days),
+    }
+
+
+def _apply_day(snapshot, day, xp, minutes):
+    """Fold one day's added activity into the snapshot. False if it needs a rebuild."""
+    last_active = snapshot.last_active_date
+    if last_active and day < last_active:
+        # A late write for an earlier day can close a gap in the streak
+        return False
+    if day == last_active:
+        snapshot.daily_xp += xp
+    else:
+        snapshot.streak = snapshot.streak + 1 if last_active == day - timedelta(days=1) else 1
+        snapshot.active_days += 1
+        snapshot.daily_xp = xp
+        snapshot.last_active_date = day
+    key = day.isoformat()
+    window_start = (day - timedelta(days=RECENT_DAYS - 1)).isoformat()
+    recent = {d: m for d, m in snapshot.recent_minutes.items() if d >= window_start}
+    recent[key] = recent.get(key, 0) + minutes
+    snapshot.recent_minutes = recent
+    return True
+
+
+def update_snapshots(per_day):
+    """
+    Fold (xp, minutes) per (user_id, date), as just added to UserActivity,
+    into the users' snapshots. Call inside the transaction that wrote the
+    activity; the rows are locked so concurrent aggregator batches queue up.
+    """
+    if not per_day:
+        return
+    by_user = defaultdict(list)
+    for (user_id, day), (xp, minutes) in per_day.items():
+        by_user[user_id].append((day, xp, minutes))
+
+    with transaction.atomic():
+        UserStatsSnapshot.objects.bulk_create(
+            [UserStatsSnapshot(user_id=user_id) for user_id in by_user], ignore_conflicts=True
+        )
+        snapshots = list(UserStatsSnapshot.objects.select_for_update().filter(user_id__in=by_user))
+        stale = []
+        now = timezone.now()
+        for snapshot in snapshots:
+            snapshot.updated_at = now
+            for day, xp, minutes in sorted(by_user[snapshot.user_id]):
+                if not _apply_day(snapshot, day, xp, minutes):
+                    stale.append(snapshot.user_id)
+                    break
+        UserStatsSnapshot.objects.bulk_update(
+            [snapshot for snapshot in snapshots if snapshot.user_id not in stale],
+            ['last_active_date', 'daily_xp', 'recent_minutes', 'streak', 'active_days', 'updated_at'],
+        )
+        if stale:
+            rebuild_snapshots(stale)
+        user_ids = list(by_user)
+        transaction.on_commit(lambda: cache.delete_many([f"user_profile_{user_id}" for user_id in user_ids]))
+
+
+def rebuild_snapshots(user_ids=None):
+    """Recompute snapshots from UserActivity, for the given users or everyone. Returns the number written."""
+    from rooms.models import UserActivity
+
+    activity = UserActivity.objects.order_by('user_id', '-date')
+    if user_ids is not None:
+        activity = activity.filter(user_id__in=user_ids)
+
+    written = 0
+    batch = []
+    seen = set()
+
+    def flush():
+        nonlocal written, batch
+        UserStatsSnapshot.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['last_active_date', 'daily_xp', 'recent_minutes', 'streak', 'active_days', 'updated_at'],
+        )
+        written += len(batch)
+        batch = []
+
+    rows = activity.values_list('user_id', 'date', 'xp_earned', 'practice_minutes').iterator(chunk_size=REBUILD_CHUNK_SIZE)
+    current_user, days = None, []
+    for user_id, day, xp, minutes in rows:
+        if user_id != current_user and days:
+            seen.add(current_user)
+            batch.append(UserStatsSnapshot(user_id=current_user, **snapshot_fields(days)))
+            days = []
+            if len(batch) >= REBUILD_CHUNK_SIZE:
+                flush()
+        current_user = user_id
+        days.append((day, xp, minutes))
+    if days:
+        seen.add(current_user)
+        batch.append(UserStatsSnapshot(user_id=current_user, **snapshot_fields(days)))
+
+    # Users whose activity was all removed get an empty snapshot
+    if user_ids is not None:
+        UserStatsSnapshot.objects.filter(user_id__in=user_ids).exclude(user_id__in=seen).update(
+            updated_at=timezone.now(), **snapshot_fields([])
+        )
+    if batch:
+        flush()
+    return written
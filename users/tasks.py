@@ -1,10 +1,105 @@
+import logging
 from celery import shared_task
-from .models import CustomUser
+from django.db import transaction
+from .models import CustomUser,UserProfile
 from .utils import generate_and_send_otp
+from .otp import PURPOSE_VERIFY_EMAIL
 from django.shortcuts import get_object_or_404
+from .mailer import drain_queue
+from .xp import aggregate_pending
+from .avatars import render_avatar,get_avatar_storage,discard_staged_avatar
+
+logger = logging.getLogger(__name__)
 
 @shared_task
-def send_otp_email_task(user_id):
+def send_otp_email_task(user_id, purpose=PURPOSE_VERIFY_EMAIL):
     user = get_object_or_404(CustomUser,id=user_id)
-    generate_and_send_otp(user)
+    generate_and_send_otp(user, purpose)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def flush_email_queue_task(self):
+    """Drain queued emails in batches over this worker's pooled connection."""
+    try:
+        sent = drain_queue()
+    except Exception as e:
+        logger.error("Sending queued emails failed: %s", e)
+        raise self.retry(exc=e)
+    if sent:
+        logger.info("Sent %d queued emails", sent)
+
+
+
+@shared_task
+def aggregate_xp_events_task():
+    """Fold pending XP ledger events into profiles and daily activity, batch by batch."""
+    from django_redis import get_redis_connection
+    from .xp import AGGREGATE_SCHEDULED_KEY
+    # Clear the flag first so events recorded while we run schedule another pass
+    get_redis_connection('default').delete(AGGREGATE_SCHEDULED_KEY)
+    folded = 0
+    while True:
+        batch = aggregate_pending()
+        folded += batch
+        if not batch:
+            break
+    if folded:
+        logger.info("Aggregated %d XP events", folded)
+
+
+def _finish_avatar(profile_id, token, **fields):
+    """
+    Write the outcome of an avatar upload, unless a newer upload has taken
+    over the profile since. Returns whether the write happened.
+    """
+    with transaction.atomic():
+        profile = UserProfile.objects.select_for_update().filter(id=profile_id).first()
+        if profile is None or (token is not None and profile.avatar_upload_token != token):
+            return False
+        for field, value in fields.items():
+            setattr(profile, field, value)
+        profile.avatar_upload_token = ''
+        # save() fires the post_save signal that drops the cached profile
+        profile.save(update_fields=[*fields, 'avatar_upload_token'])
+        return True
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_avatar_task(self, profile_id, staged_path, token=None):
+    """
+    Crop the staged upload to the avatar size, push it to the avatar storage
+    and swap it onto the profile. A task whose upload was superseded by a
+    newer one leaves the profile alone.
+    """
+    if not UserProfile.objects.filter(id=profile_id).exists():
+        discard_staged_avatar(staged_path)
+        return
+
+    try:
+        content = render_avatar(staged_path)
+    except (ValueError, FileNotFoundError) as e:
+        logger.warning("Avatar processing failed for profile %s: %s", profile_id, e)
+        _finish_avatar(profile_id, token, avatar_status=UserProfile.AvatarStatus.FAILED)
+        discard_staged_avatar(staged_path)
+        return
+
+    # Each upload gets its own name so a late, older task cannot overwrite a newer image
+    name = f"profile_{profile_id}_{token}" if token else f"profile_{profile_id}"
+    storage = get_avatar_storage()
+    try:
+        url = storage.save(name, content)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        logger.error("Avatar upload failed for profile %s: %s", profile_id, e)
+        _finish_avatar(profile_id, token, avatar_status=UserProfile.AvatarStatus.FAILED)
+        discard_staged_avatar(staged_path)
+        return
 
+    if not _finish_avatar(profile_id, token, avatar=url, avatar_status=UserProfile.AvatarStatus.READY):
+        logger.info("Avatar upload for profile %s was superseded, discarding it", profile_id)
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logger.warning("Could not delete superseded avatar %s: %s", name, e)
+    discard_staged_avatar(staged_path)
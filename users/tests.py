@@ -1,3 +1,418 @@
-from django.test import TestCase
+import os
+import time
+from datetime import timedelta
+import tempfile
+from io import BytesIO
+from unittest import mock
+import fakeredis
+from PIL import Image
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from google.auth import crypt, jwt
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rooms.middleware import JWTAuthMiddleware
+from rooms.models import UserActivity
+from .authentication import CookieJWTAuthentication
+from .consumers import NotificationConsumer
+from .google_auth import GoogleTokenVerifier
+from .leaderboards import InMemoryLeaderboard
+from .models import CustomUser, UserProfile, XPEvent
+from . import otp
+from .moderation import FORCE_DISCONNECT_CODE, ban_user, is_revoked, kick, unban_user, unrevoke
+from .serializers import UserProfileUpdateSerializer
+from .tasks import process_avatar_task
+from .xp import XP_PER_LEVEL, XP_PER_MINUTE, aggregate_pending, level_for, record_events, replay_ledger
 
-# Create your tests here.
+TESTDATA_DIR = os.path.join(os.path.dirname(__file__), 'testdata')
+GOOGLE_CERTS_FILE = os.path.join(TESTDATA_DIR, 'google_certs.json')
+GOOGLE_CLIENT_ID = 'fixture-client.apps.googleusercontent.com'
+
+
+class LeaderboardLimitTests(TestCase):
+    def setUp(self):
+        self.users = [CustomUser.objects.create(username=f"player{n}", email=f"player{n}@example.com") for n in range(5)]
+        self.board = InMemoryLeaderboard()
+        self.board.record({user.id: 10 * (n + 1) for n, user in enumerate(self.users)}, {}, {})
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def get(self, limit):
+        with mock.patch('users.views.get_leaderboard', return_value=self.board):
+            return self.client.get('/api/users/leaderboard/', {'limit': limit})
+
+    def test_top_with_non_positive_limit_is_empty(self):
+        self.assertEqual(self.board.top(limit=0), [])
+        self.assertEqual(self.board.top(limit=-3), [])
+
+    def test_non_positive_limit_is_clamped_to_one(self):
+        for limit in ('0', '-1', '-100'):
+            response = self.get(limit)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['xp'] for row in response.data['results']], [50])
+
+    def test_invalid_limit_falls_back_to_default(self):
+        response = self.get('abc')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_limit_is_capped_at_page_size(self):
+        with self.settings(LEADERBOARD_PAGE_SIZE=2):
+            response = self.get('1000')
+        self.assertEqual([row['xp'] for row in response.data['results']], [50, 40])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ModerationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='offender', email='offender@example.com')
+        self.token = AccessToken.for_user(self.user)
+
+    def tearDown(self):
+        unrevoke(self.user.id)
+
+    def ban(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ban_user(self.user)
+
+    def middleware_user(self):
+        scopes = []
+
+        async def app(scope, receive, send):
+            scopes.append(scope)
+
+        scope = {'type': 'websocket', 'path': '/ws/notifications/', 'query_string': f"token={self.token}".encode(), 'headers': []}
+        async_to_sync(JWTAuthMiddleware(app))(scope, None, None)
+        return scopes[0]['user']
+
+    def test_ban_revokes_tokens(self):
+        self.assertEqual(self.middleware_user(), self.user)
+        self.ban()
+        self.assertTrue(is_revoked(self.user.id))
+        with self.assertRaises(AuthenticationFailed):
+            CookieJWTAuthentication().get_user(self.token)
+        self.assertIsInstance(self.middleware_user(), AnonymousUser)
+
+    def test_inactive_user_refused_without_revocation_entry(self):
+        self.ban()
+        # As if Redis had lost the set
+        unrevoke(self.user.id)
+        with self.assertRaises(AuthenticationFailed):
+            CookieJWTAuthentication().get_user(self.token)
+        self.assertIsInstance(self.middleware_user(), AnonymousUser)
+
+    def test_unban_restores_tokens(self):
+        self.ban()
+        with self.captureOnCommitCallbacks(execute=True):
+            unban_user(self.user)
+        self.assertFalse(is_revoked(self.user.id))
+        self.assertEqual(CookieJWTAuthentication().get_user(self.token), self.user)
+
+    def test_force_disconnect_closes_socket(self):
+        async def run():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+            communicator.scope['user'] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await sync_to_async(kick)(self.user.id)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'force_disconnect')
+            self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': FORCE_DISCONNECT_CODE})
+            await communicator.wait()
+
+        async_to_sync(run)()
+
+
+def image_upload(color):
+    buffer = BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, format='PNG')
+    return SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+
+
+class AvatarUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = self.settings(
+            MEDIA_ROOT=self.media.name,
+            AVATAR_STAGING_DIR=os.path.join(self.media.name, 'staging'),
+            AVATAR_STORAGE_BACKEND='users.avatars.LocalAvatarStorage',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.profile = CustomUser.objects.create(username='painter', email='painter@example.com').userprofile
+
+    def upload(self, color):
+        """Save an avatar and return the task call it queued, without running it."""
+        with mock.patch('users.serializers.process_avatar_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer = UserProfileUpdateSerializer(self.profile, data={'avatar': image_upload(color)}, partial=True)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+        return delay.call_args.args
+
+    def staged_files(self):
+        staging = os.path.join(self.media.name, 'staging')
+        return os.listdir(staging) if os.path.isdir(staging) else []
+
+    def test_older_upload_finishing_last_is_discarded(self):
+        older = self.upload('red')
+        newer = self.upload('blue')
+        process_avatar_task.apply(args=newer)
+        process_avatar_task.apply(args=older)
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar_status, UserProfile.AvatarStatus.READY)
+        self.assertIn(newer[2], self.profile.avatar)
+        self.assertEqual(self.profile.avatar_upload_token, '')
+        # The superseded image and both staged files are gone
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'avatars')), [f"profile_{self.profile.id}_{newer[2]}.jpg"])
+        self.assertEqual(self.staged_files(), [])
+
+    def test_rolled_back_update_discards_staged_file(self):
+        serializer = UserProfileUpdateSerializer(self.profile, data={'avatar': image_upload('red')}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with mock.patch.object(UserProfile, 'save', side_effect=RuntimeError('database went away')):
+            with self.assertRaises(RuntimeError):
+                serializer.save()
+        self.assertEqual(self.staged_files(), [])
+
+
+class GoogleTokenVerifierTests(TestCase):
+    """Tokens signed with the fixture key, checked against the fixture certificates."""
+
+    def setUp(self):
+        with open(os.path.join(TESTDATA_DIR, 'google_fixture_key.pem')) as f:
+            self.signer = crypt.RSASigner.from_string(f.read(), key_id='fixture-key')
+        self.verifier = GoogleTokenVerifier(client_id=GOOGLE_CLIENT_ID, certs_file=GOOGLE_CERTS_FILE)
+
+    def token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com',
+            'aud': GOOGLE_CLIENT_ID,
+            'sub': '1234567890',
+            'email': 'learner@example.com',
+            'given_name': 'Learner',
+            'iat': now,
+            'exp': now + 3600,
+        }
+        payload.update(claims)
+        return jwt.encode(self.signer, payload).decode()
+
+    def test_valid_token(self):
+        claims = self.verifier.verify(self.token())
+        self.assertEqual(claims['email'], 'learner@example.com')
+        self.assertEqual(claims['aud'], GOOGLE_CLIENT_ID)
+
+    def test_wrong_audience(self):
+        with self.assertRaisesMessage(ValueError, 'wrong audience'):
+            self.verifier.verify(self.token(aud='someone-else.apps.googleusercontent.com'))
+
+    def test_wrong_issuer(self):
+        with self.assertRaisesMessage(ValueError, 'Wrong issuer'):
+            self.verifier.verify(self.token(iss='https://evil.example.com'))
+
+    def test_expired_token(self):
+        issued = int(time.time()) - 7200
+        with self.assertRaisesMessage(ValueError, 'Token expired'):
+            self.verifier.verify(self.token(iat=issued, exp=issued + 3600))
+
+    def test_missing_client_id_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            GoogleTokenVerifier(client_id='', certs_file=GOOGLE_CERTS_FILE)
+
+    def test_login_with_valid_token(self):
+        verifier = GoogleTokenVerifier(client_id=GOOGLE_CLIENT_ID, certs_file=GOOGLE_CERTS_FILE)
+        with self.settings(GOOGLE_CLIENT_ID=GOOGLE_CLIENT_ID), \
+                mock.patch('users.views.get_google_token_verifier', return_value=verifier):
+            response = APIClient().post('/api/users/google-login/', {'id_token': self.token()}, format='json')
+            refused = APIClient().post('/api/users/google-login/', {'id_token': self.token(exp=0, iat=0)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(CustomUser.objects.get(email='learner@example.com').is_google_login)
+        self.assertEqual(refused.status_code, 400)
+
+
+class FakeClock:
+    """Drives both time.time and time.monotonic, so code TTLs can be skipped past."""
+
+    def __init__(self, test):
+        self.now = time.time()
+        for name in ('time', 'monotonic'):
+            patcher = mock.patch(f"time.{name}", side_effect=lambda: self.now)
+            patcher.start()
+            test.addCleanup(patcher.stop)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+OTP_STORE_SETTINGS = {'OTP_TTL_SECONDS': 120, 'OTP_MAX_ATTEMPTS': 3, 'OTP_RESEND_COOLDOWN_SECONDS': 60}
+
+
+class OTPStoreTestsMixin:
+    """The same contract for every OTP store."""
+
+    def setUp(self):
+        self.store = self.make_store()
+        self.clock = FakeClock(self)
+
+    def test_valid_code_is_consumed(self):
+        code = self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, code), otp.VALID)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, code), otp.EXPIRED)
+
+    def test_codes_are_per_purpose(self):
+        code = self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_RESET_PASSWORD, code), otp.EXPIRED)
+
+    def test_attempt_limit(self):
+        code = self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        for _ in range(3):
+            self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, 'wrong'), otp.INVALID)
+        # Once the limit is hit even the right code is refused
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, code), otp.TOO_MANY_ATTEMPTS)
+
+    def test_new_code_resets_attempts(self):
+        self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        for _ in range(4):
+            self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, 'wrong')
+        code = self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, code), otp.VALID)
+
+    def test_code_expires(self):
+        code = self.store.issue(1, otp.PURPOSE_VERIFY_EMAIL)
+        self.clock.advance(119)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, 'wrong'), otp.INVALID)
+        self.clock.advance(2)
+        self.assertEqual(self.store.verify(1, otp.PURPOSE_VERIFY_EMAIL, code), otp.EXPIRED)
+
+    def test_claim_send_cooldown(self):
+        self.assertEqual(self.store.claim_send(1, otp.PURPOSE_VERIFY_EMAIL), 0)
+        self.clock.advance(20)
+        self.assertEqual(self.store.claim_send(1, otp.PURPOSE_VERIFY_EMAIL), 40)
+        # Other users and purposes have their own cooldown
+        self.assertEqual(self.store.claim_send(2, otp.PURPOSE_VERIFY_EMAIL), 0)
+        self.assertEqual(self.store.claim_send(1, otp.PURPOSE_RESET_PASSWORD), 0)
+        self.clock.advance(41)
+        self.assertEqual(self.store.claim_send(1, otp.PURPOSE_VERIFY_EMAIL), 0)
+
+
+@override_settings(**OTP_STORE_SETTINGS)
+class InMemoryOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    def make_store(self):
+        return otp.InMemoryOTPStore()
+
+
+@override_settings(**OTP_STORE_SETTINGS)
+class RedisOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    """Runs the Lua verify script under fakeredis."""
+
+    def make_store(self):
+        with mock.patch('django_redis.get_redis_connection', return_value=fakeredis.FakeRedis()):
+            return otp.RedisOTPStore()
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3, OTP_RESEND_COOLDOWN_SECONDS=60)
+class OTPViewTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='newcomer', email='newcomer@example.com')
+        self.store = otp.InMemoryOTPStore()
+        patcher = mock.patch('users.views.get_otp_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def verify(self, code):
+        return self.client.post('/api/users/verify-otp/', {'email': self.user.email, 'code': code}, format='json')
+
+    def test_verify(self):
+        code = self.store.issue(self.user.id, otp.PURPOSE_VERIFY_EMAIL)
+        self.assertEqual(self.verify('000000').status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+    def test_verify_lockout_is_429(self):
+        code = self.store.issue(self.user.id, otp.PURPOSE_VERIFY_EMAIL)
+        for _ in range(3):
+            self.assertEqual(self.verify('000000').status_code, 400)
+        response = self.verify(code)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_verified)
+
+    def test_resend_cooldown_is_429(self):
+        with mock.patch('users.views.send_otp_email_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post('/api/users/resend-otp/', {'email': self.user.email}, format='json')
+            second = self.client.post('/api/users/resend-otp/', {'email': self.user.email}, format='json')
+        self.assertEqual(first.status_code, 200)
+        delay.assert_called_once_with(self.user.id)
+        self.assertEqual(second.status_code, 429)
+        self.assertTrue(0 < int(second['Retry-After']) <= 60)
+        self.assertEqual(second.data['retry_after'], int(second['Retry-After']))
+
+
+class XPLedgerTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('django_redis.get_redis_connection', return_value=fakeredis.FakeRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create(username='learner', email='learner@example.com')
+        self.yesterday = timezone.now() - timedelta(days=1)
+
+    def record(self):
+        record_events([
+            XPEvent(user=self.user, kind=XPEvent.Kind.ROOM_SESSION, minutes=30, sessions=1,
+                    reference='participant:1', occurred_at=self.yesterday),
+            XPEvent(user=self.user, kind=XPEvent.Kind.ROOM_SESSION, minutes=45, sessions=1,
+                    reference='participant:2'),
+            XPEvent(user=self.user, kind=XPEvent.Kind.BONUS, points=250, reference='streak:7'),
+        ])
+
+    def totals(self):
+        profile = UserProfile.objects.get(user=self.user)
+        activity = dict(UserActivity.objects.filter(user=self.user).values_list('date', 'xp_earned'))
+        return profile.xp, profile.level, profile.total_speak_time, profile.total_rooms_joined, activity
+
+    def test_events_are_folded_once(self):
+        self.record()
+        # Retried recording with the same references adds nothing to the ledger
+        self.record()
+        self.assertEqual(XPEvent.objects.count(), 3)
+
+        self.assertEqual(aggregate_pending(), 3)
+        xp = 75 * XP_PER_MINUTE + 250
+        xp_, level, speak_time, rooms_joined, activity = self.totals()
+        self.assertEqual((xp_, level, speak_time, rooms_joined), (xp, level_for(xp), timedelta(minutes=75), 2))
+        self.assertEqual(sum(activity.values()), xp)
+        self.assertEqual(activity[self.yesterday.date()], 30 * XP_PER_MINUTE)
+        self.assertFalse(XPEvent.objects.filter(processed_at__isnull=True).exists())
+
+        # Nothing pending, so a second run is a no-op
+        self.assertEqual(aggregate_pending(), 0)
+        self.assertEqual(self.totals(), (xp_, level, speak_time, rooms_joined, activity))
+
+    def test_replay_rebuilds_the_same_totals(self):
+        self.record()
+        aggregate_pending()
+        folded = self.totals()
+
+        UserProfile.objects.filter(user=self.user).update(xp=0, level=1, total_speak_time=timedelta(), total_rooms_joined=0)
+        UserActivity.objects.filter(user=self.user).update(xp_earned=0, practice_minutes=0)
+        self.assertEqual(replay_ledger([self.user.id]), 1)
+        self.assertEqual(self.totals(), folded)
+
+    def test_level_boundaries(self):
+        self.assertEqual(level_for(0), 1)
+        self.assertEqual(level_for(XP_PER_LEVEL - 1), 1)
+        self.assertEqual(level_for(XP_PER_LEVEL), 2)
+        self.assertEqual(level_for(2 * XP_PER_LEVEL - 1), 2)
+        self.assertEqual(level_for(2 * XP_PER_LEVEL), 3)
@@ -46,6 +46,8 @@ urlpatterns = [
     path('followers/', MyFollowersView.as_view(), name='my-followers'),
     path('following/', MyFollowingView.as_view(), name='my-following'),
     #social
+    path('search/', UserDirectorySearchView.as_view(), name='user-directory-search'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('social/followers/', FollowersListView.as_view(), name='social-followers'),
     path('social/following/', FollowingListView.as_view(), name='social-following'),
     path('social/friends/', FriendsListView.as_view(), name='social-friends'),
@@ -1,41 +1,30 @@
 from django.utils import timezone
 from datetime import timedelta
-import random
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import OTP,Notification
-import cloudinary.uploader
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from .models import Notification
+from .otp import get_otp_store,PURPOSE_VERIFY_EMAIL
+from .mailer import render_email,queue_email
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import json
     
-def generate_and_send_otp(user):
-    code = f"{random.randint(100000, 999999)}"
-    expires_at = timezone.now() + timedelta(minutes=2)
-    
-    OTP.objects.create(
-        user=user,
-        code=code,
-        expires_at=expires_at
-    )
-    subject = "Your TalkMate OTP code"
-    html_content = render_to_string("emails/otp_email.html",{
+def generate_and_send_otp(user, purpose=PURPOSE_VERIFY_EMAIL):
+    code = get_otp_store().issue(user.id, purpose)
+    expires_at = timezone.now() + timedelta(seconds=settings.OTP_TTL_SECONDS)
+
+    html_content, text_content = render_email("emails/otp_email.html", {
         "user": user,
         "code": code,
         "expires_at": expires_at,
     })
-    text_content = strip_tags(html_content)
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=text_content,
-        from_email=settings.DEFAULT_FROM_EMAIL,
+    queue_email(
+        subject="Your TalkMate OTP code",
         to=[user.email],
+        html=html_content,
+        text=text_content,
+        # The code is useless once it expires, so don't keep it queued longer
+        ttl=settings.OTP_TTL_SECONDS,
     )
-    email.attach_alternative(html_content, "text/html")
-    email.send()
 
 
 
@@ -112,39 +101,6 @@ def clear_auth_cookies(response):
 
 
     
-def upload_avatar_to_cloudinary(file, folder='avatars'):
-    """
-    Uploads an avatar image to Cloudinary and returns the URL.
-    """
-    print("=== upload_avatar_to_cloudinary called ===")
-    if not file:
-        print("No file provided to upload_avatar_to_cloudinary.")
-        return None
-
-    # print(f"Uploading file: {file} to Cloudinary in folder: {folder}")
-    try:
-        response = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            allowed_formats=['jpg', 'jpeg', 'png'],
-            overwrite=True,
-            resource_type='image',
-            transformation=[
-                {'width': 200, 'height': 200, 'crop': 'fill', 'gravity': 'face'}
-            ]
-        )
-        # print("Cloudinary upload response:", response)
-        url = response.get('secure_url')
-        if url:
-            print("Successfully uploaded to Cloudinary. URL:")
-        else:
-            print("Upload to Cloudinary succeeded but no URL returned.")
-        return url
-    except Exception as e:
-        print(f"Error uploading to Cloudinary: {e}")
-        return None
-
-
 def send_notification(user, notif_type, title, message, link=None):
     Notification.objects.create(
         user=user,
@@ -1,16 +1,20 @@
 import razorpay
 from .models import *
 from .serializers import *
-from decouple import config
 from datetime import timedelta
 from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from google.oauth2 import id_token
 from .tasks import send_otp_email_task
+from . import otp
+from .otp import get_otp_store,PURPOSE_VERIFY_EMAIL,PURPOSE_RESET_PASSWORD
+from .search import search_directory
+from .leaderboards import get_leaderboard,WINDOWS,ALL_TIME
+from adminapp import activity
+from adminapp.models import ActivityEvent
+from .google_auth import get_google_token_verifier,GoogleCertsUnavailable
 from django.core.cache import cache
 from rest_framework.views import APIView
-from google.auth.transport import requests
 from decimal import Decimal, ROUND_HALF_UP
 from rest_framework import status,viewsets
 from rest_framework.response import Response
@@ -33,6 +37,15 @@ logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+
+def otp_cooldown_response(retry_after, error='Please wait before requesting another OTP.'):
+    response = Response(
+        {'error': error, 'retry_after': retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
   
 class GoogleLoginView(APIView):
     permission_classes = [AllowAny]
@@ -44,10 +57,9 @@ class GoogleLoginView(APIView):
             return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
-            idinfo = id_token.verify_oauth2_token(id_token_str, requests.Request(), GOOGLE_CLIENT_ID)
+            idinfo = get_google_token_verifier().verify(id_token_str)
 
-            if idinfo['aud'] != GOOGLE_CLIENT_ID:
+            if idinfo['aud'] != settings.GOOGLE_CLIENT_ID:
                 raise AuthenticationFailed('Invalid audience')
 
             email = idinfo.get('email')
@@ -89,6 +101,8 @@ class GoogleLoginView(APIView):
 
         except ValueError as e:
             return Response({'error': f'Invalid token: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        except GoogleCertsUnavailable:
+            return Response({'error': 'Google sign-in is temporarily unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except AuthenticationFailed as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -120,6 +134,7 @@ class RegisterView(APIView):
                     link=f"/admin/users/"
                 )
 
+            get_otp_store().claim_send(user.id, PURPOSE_VERIFY_EMAIL)
             transaction.on_commit(lambda: send_otp_email_task.delay(user.id))
 
             user_data = serializer.data
@@ -303,24 +318,22 @@ class OTPVerifyView(APIView):
         # logger.debug(f"Received email:{email}, code:{code}")
         try:
             user = CustomUser.objects.get(email=email)
-            logger.debug(f"found user:{user}")
-            otp_obj = OTP.objects.filter(user=user,code=code,is_used=False).latest('created_at')
-            logger.debug(f"found otp_obj:{otp_obj}")
-            if otp_obj.is_expired():
-                logger.warning("otp is expired")
-                return Response({'error':'OTP expired'},status=400)
-            otp_obj.is_used = True
-            otp_obj.save()
-            user.is_verified = True
-            user.save()
-            logger.info("otp verified")
-            return Response({'message':'OTP verified Successfully'})
         except CustomUser.DoesNotExist:
             logger.warning("User not found")
-            return Response({'error':'User not found'},status=400)  
-        except OTP.DoesNotExist:
-            logger.warning("invalid otp")
-            return Response({'error':'Invalid OTP'},status=400)
+            return Response({'error':'User not found'},status=400)
+        logger.debug(f"found user:{user}")
+        result = get_otp_store().verify(user.id, PURPOSE_VERIFY_EMAIL, code)
+        if result == otp.TOO_MANY_ATTEMPTS:
+            logger.warning("otp verification locked out")
+            # the code is spent; a new one can be requested once the resend cooldown allows
+            return otp_cooldown_response(settings.OTP_RESEND_COOLDOWN_SECONDS, OTP_ERRORS[result].rstrip('.'))
+        if result != otp.VALID:
+            logger.warning("otp verification failed: %s", result)
+            return Response({'error':OTP_ERRORS[result].rstrip('.')},status=400)
+        user.is_verified = True
+        user.save(update_fields=['is_verified'])
+        logger.info("otp verified")
+        return Response({'message':'OTP verified Successfully'})
         
         
 class ResendOTPView(APIView):
@@ -329,7 +342,10 @@ class ResendOTPView(APIView):
         serializer = ResendOTPSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.context['user']
-            
+            retry_after = get_otp_store().claim_send(user.id, PURPOSE_VERIFY_EMAIL)
+            if retry_after:
+                return otp_cooldown_response(retry_after)
+
             transaction.on_commit(lambda: send_otp_email_task.delay(user.id))  
 
             return Response({"message": "OTP sent successfully."}, status=status.HTTP_200_OK)
@@ -357,10 +373,7 @@ class PasswordResetOTPVerifyView(APIView):
     def post(self, request):
         serializer = PasswordResetOTPVerifySerializer(data=request.data)
         if serializer.is_valid():
-            otp_obj = serializer.validated_data['otp_obj']
             user = serializer.validated_data['user']
-            otp_obj.is_used = True
-            otp_obj.save()
             # Optionally, set a flag on user to allow password reset
             return Response({'message': 'OTP verified successfully. You can now reset your password.'})
         return Response({'message':serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -372,7 +385,10 @@ class PasswordResetResendOTPView(APIView):
         serializer = PasswordResetResendOTPSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.context['user']
-            transaction.on_commit(lambda: send_otp_email_task.delay(user.id))
+            retry_after = get_otp_store().claim_send(user.id, PURPOSE_RESET_PASSWORD)
+            if retry_after:
+                return otp_cooldown_response(retry_after)
+            transaction.on_commit(lambda: send_otp_email_task.delay(user.id, PURPOSE_RESET_PASSWORD))
             return Response({'message': 'OTP resent successfully.'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -422,7 +438,7 @@ class UpdateUserProfileView(APIView):
             # cache.delete(cache_key)
             new_data = UserProfileSerializer(profile).data
             cache.set(cache_key, new_data, timeout=60*10)
-            return Response(new_data)
+            return Response(new_data, status=self._response_status(profile))
         return Response(serializer.errors, status=400)
     
     def put(self, request):
@@ -439,7 +455,13 @@ class UpdateUserProfileView(APIView):
         # cache.delete(cache_key)
         new_data = UserProfileSerializer(profile).data
         cache.set(cache_key, new_data, timeout=60*10)
-        return Response({'profile': new_data})
+        return Response({'profile': new_data}, status=self._response_status(profile))
+
+    def _response_status(self, profile):
+        # The avatar is still being processed in the background
+        if profile.avatar_status == UserProfile.AvatarStatus.PENDING:
+            return status.HTTP_202_ACCEPTED
+        return status.HTTP_200_OK
         
 class ProficiencyChoicesView(APIView):
     permission_classes = [IsAuthenticated]
@@ -636,6 +658,8 @@ class VerifyRazorpayPayment(APIView):
                 }
             )
 
+            activity.record(ActivityEvent.Kind.SUBSCRIPTION_STARTED, request.user, new_plan.name)
+
             # Update is_premium flag
             profile = get_object_or_404(UserProfile, user=request.user)
             profile.is_premium = new_plan.price > 0
@@ -716,7 +740,7 @@ class MyFollowersView(APIView):
 
     def get(self, request):
         profile = request.user.userprofile
-        followers = profile.followers.all()
+        followers = profile.followers.select_related('user__stats_snapshot')
         serializer = UserProfileSerializer(followers, many=True)
         return Response(serializer.data)
 
@@ -726,7 +750,7 @@ class MyFollowingView(APIView):
 
     def get(self, request):
         profile = request.user.userprofile
-        following = profile.following.all()
+        following = profile.following.select_related('user__stats_snapshot')
         serializer = UserProfileSerializer(following, many=True)
         return Response(serializer.data)        
         
@@ -759,6 +783,64 @@ class BaseSocialListView(APIView):
         serializer = FollowCardSerializer(page, many=True, context={'viewer_profile': request.user.userprofile})
         return paginator.get_paginated_response(serializer.data)
 
+class UserDirectorySearchView(APIView):
+    """Autocomplete over public profiles by username prefix or exact TM unique_id (?q=)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        results = search_directory(
+            request.query_params.get('q'),
+            exclude_user_id=request.user.id,
+            limit=settings.USER_SEARCH_LIMIT,
+        )
+        return Response({'results': results})
+
+class LeaderboardView(APIView):
+    """
+    XP leaderboard. ?window=all|week|day, optional ?language=<id> for a
+    learning-language board and ?around=1 for the caller's neighbourhood.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        window = request.query_params.get('window', ALL_TIME)
+        language = request.query_params.get('language')
+        if window not in WINDOWS or (language and not language.isdigit()):
+            return Response({'detail': 'Invalid window or language.'}, status=status.HTTP_400_BAD_REQUEST)
+        language_id = int(language) if language else None
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, settings.LEADERBOARD_PAGE_SIZE))
+
+        board = get_leaderboard()
+        top = [(index + 1, user_id, xp) for index, (user_id, xp) in enumerate(board.top(window, limit, language_id))]
+        rank, xp = board.rank(request.user.id, window, language_id)
+        around = board.around(request.user.id, window, language_id) if request.query_params.get('around') else []
+
+        profiles = UserProfile.objects.filter(
+            user_id__in={user_id for _, user_id, _ in top + around}
+        ).select_related('user').in_bulk(field_name='user_id')
+
+        def rows(entries):
+            return [{
+                'rank': position,
+                'user_id': user_id,
+                'username': profiles[user_id].user.username,
+                'avatar': profiles[user_id].avatar,
+                'level': profiles[user_id].level,
+                'xp': score,
+            } for position, user_id, score in entries if user_id in profiles]
+
+        return Response({
+            'window': window,
+            'language': language_id,
+            'results': rows(top),
+            'me': {'rank': rank, 'xp': xp or 0},
+            'around': rows(around),
+        })
+
 class FollowersListView(BaseSocialListView):
     relation_attr = 'followers'
 
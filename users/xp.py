@@ -0,0 +1,205 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import UserLanguage, UserProfile, XPEvent
+from .stats import rebuild_snapshots, update_snapshots
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_SCHEDULED_KEY = 'xp:aggregate_scheduled'
+
+XP_PER_MINUTE = 20
+XP_PER_LEVEL = 1000
+
+
+def xp_for(kind, minutes, points):
+    """The reward rules. Changing them and calling replay_ledger backfills every user."""
+    if kind == XPEvent.Kind.ROOM_SESSION:
+        return minutes * XP_PER_MINUTE + points
+    return points
+
+
+def level_for(xp):
+    return xp // XP_PER_LEVEL + 1
+
+
+def level_expression(xp_expression):
+    """level_for as a database expression, for UPDATE statements."""
+    return xp_expression / XP_PER_LEVEL + 1
+
+
+def record_events(events):
+    """
+    Append events to the ledger with one insert and schedule aggregation once
+    the transaction commits. Events with a reference already recorded are
+    ignored, so recording is safe to retry.
+    """
+    if not events:
+        return
+    XPEvent.objects.bulk_create(events, ignore_conflicts=True)
+    transaction.on_commit(schedule_aggregation)
+
+
+def schedule_aggregation():
+    from .tasks import aggregate_xp_events_task
+    try:
+        from django_redis import get_redis_connection
+        scheduled = get_redis_connection('default').set(
+            AGGREGATE_SCHEDULED_KEY, 1, nx=True, ex=60
+        )
+        if scheduled:
+            aggregate_xp_events_task.apply_async(countdown=settings.XP_AGGREGATE_DELAY_SECONDS)
+    except Exception as e:
+        # The periodic aggregation run picks the events up
+        logger.warning("Could not schedule XP aggregation: %s", e)
+
+
+def aggregate_pending(batch_size=None):
+    """
+    Fold one batch of unprocessed events into profiles, daily activity and
+    stats snapshots. The batch is claimed with SKIP LOCKED and marked
+    processed in the same transaction as the increments, so each event is
+    applied exactly once. Returns the number of events folded.
+    """
+    batch_size = batch_size or settings.XP_AGGREGATE_BATCH_SIZE
+    with transaction.atomic():
+        events = list(XPEvent.objects.select_for_update(skip_locked=True).filter(
+            processed_at__isnull=True
+        ).order_by('id')[:batch_size])
+        if not events:
+            return 0
+
+        per_user = defaultdict(lambda: [0, 0, 0])
+        per_day = defaultdict(lambda: [0, 0])
+        for event in events:
+            xp = xp_for(event.kind, event.minutes, event.points)
+            totals = per_user[event.user_id]
+            totals[0] += xp
+            totals[1] += event.minutes
+            totals[2] += event.sessions
+            if event.kind != XPEvent.Kind.BASELINE:
+                day = per_day[(event.user_id, event.occurred_at.date())]
+                day[0] += xp
+                day[1] += event.minutes
+
+        for user_id, (xp, minutes, sessions) in per_user.items():
+            UserProfile.objects.filter(user_id=user_id).update(
+                xp=F('xp') + xp,
+                level=level_expression(F('xp') + xp),
+                total_speak_time=F('total_speak_time') + timedelta(minutes=minutes),
+                total_rooms_joined=F('total_rooms_joined') + sessions,
+            )
+        add_activity(per_day)
+        update_snapshots(per_day)
+        XPEvent.objects.filter(id__in=[event.id for event in events]).update(processed_at=timezone.now())
+
+        board_totals = {user_id: totals[0] for user_id, totals in per_user.items() if totals[0]}
+        board_days = {key: day[0] for key, day in per_day.items() if day[0]}
+        transaction.on_commit(lambda: update_leaderboards(board_totals, board_days))
+    return len(events)
+
+
+def update_leaderboards(per_user, per_day):
+    from .leaderboards import get_leaderboard
+    if not per_user:
+        return
+    languages = defaultdict(list)
+    for user_id, language_id in UserLanguage.objects.filter(
+        user_profile__user_id__in=per_user, is_learning=True
+    ).values_list('user_profile__user_id', 'language_id'):
+        languages[user_id].append(language_id)
+    try:
+        get_leaderboard().record(per_user, per_day, languages)
+    except Exception as e:
+        # A rebuild restores anything missed here
+        logger.warning("Could not update leaderboards: %s", e)
+
+
+def add_activity(per_day):
+    """Add (xp, minutes) per (user_id, date) to UserActivity in one upsert."""
+    from rooms.models import UserActivity
+    if not per_day:
+        return
+    table = connection.ops.quote_name(UserActivity._meta.db_table)
+    rows = [(user_id, day, xp, minutes) for (user_id, day), (xp, minutes) in per_day.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, date, xp_earned, practice_minutes) VALUES {placeholders} "
+                f"ON CONFLICT (user_id, date) DO UPDATE SET "
+                f"xp_earned = {table}.xp_earned + EXCLUDED.xp_earned, "
+                f"practice_minutes = {table}.practice_minutes + EXCLUDED.practice_minutes",
+                [value for row in chunk for value in row],
+            )
+
+
+def replay_ledger(user_ids=None, since=None):
+    """
+    Recompute totals from the processed ledger with the current rules.
+    Profiles are rebuilt in full. UserActivity rows on or after `since` are
+    rebuilt too; the default is the first non-baseline event, so daily
+    history from before the ledger is kept. Returns the number of profiles
+    rewritten.
+    """
+    from rooms.models import UserActivity
+
+    events = XPEvent.objects.filter(processed_at__isnull=False)
+    if user_ids is not None:
+        events = events.filter(user_id__in=user_ids)
+    if since is None:
+        first = events.exclude(kind=XPEvent.Kind.BASELINE).order_by('occurred_at').values_list('occurred_at', flat=True).first()
+        since = first.date() if first else None
+
+    with transaction.atomic():
+        totals = defaultdict(lambda: [0, 0, 0])
+        rows = events.values('user_id', 'kind').annotate(
+            minutes_total=Sum('minutes'), sessions_total=Sum('sessions'), points_total=Sum('points'),
+        )
+        for row in rows:
+            user_totals = totals[row['user_id']]
+            user_totals[0] += xp_for(row['kind'], row['minutes_total'], row['points_total'])
+            user_totals[1] += row['minutes_total']
+            user_totals[2] += row['sessions_total']
+
+        profiles = list(UserProfile.objects.select_for_update().filter(user_id__in=totals))
+        for profile in profiles:
+            xp, minutes, sessions = totals[profile.user_id]
+            profile.xp = xp
+            profile.level = level_for(xp)
+            profile.total_speak_time = timedelta(minutes=minutes)
+            profile.total_rooms_joined = sessions
+        UserProfile.objects.bulk_update(
+            profiles, ['xp', 'level', 'total_speak_time', 'total_rooms_joined'], batch_size=1000
+        )
+
+        if since is not None:
+            activity = UserActivity.objects.filter(date__gte=since)
+            if user_ids is not None:
+                activity = activity.filter(user_id__in=user_ids)
+            activity.delete()
+            per_day = defaultdict(lambda: [0, 0])
+            daily = events.exclude(kind=XPEvent.Kind.BASELINE).filter(
+                occurred_at__gte=datetime.combine(since, time.min, tzinfo=dt_timezone.utc)
+            ).annotate(day=TruncDate('occurred_at', tzinfo=dt_timezone.utc)).values('user_id', 'day', 'kind').annotate(
+                minutes_total=Sum('minutes'), points_total=Sum('points'),
+            )
+            for row in daily:
+                day = per_day[(row['user_id'], row['day'])]
+                day[0] += xp_for(row['kind'], row['minutes_total'], row['points_total'])
+                day[1] += row['minutes_total']
+            add_activity(per_day)
+            rebuild_snapshots(user_ids)
+        transaction.on_commit(rebuild_leaderboards)
+    return len(profiles)
+
+
+def rebuild_leaderboards():
+    from .leaderboards import get_leaderboard
+    return get_leaderboard().rebuild()